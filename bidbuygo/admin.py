@@ -91,3 +91,13 @@ class ProductSizeAdmin(admin.ModelAdmin):
     list_filter = ('size',)
     search_fields = ('product__product_name',)
     list_editable = ('stock', 'price_adjustment')
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'to', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('to', 'subject')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    # Pending bodies hold one-time codes
+    exclude = ('body',)
+    ordering = ('-created_at',)
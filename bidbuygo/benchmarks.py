@@ -0,0 +1,75 @@
+"""Helpers shared by the bench_* management commands."""
+import statistics
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import connection
+
+WORDS = [
+    'cotton', 'denim', 'leather', 'silk', 'linen', 'wool', 'vintage', 'slim',
+    'classic', 'oversized', 'floral', 'striped', 'designer', 'casual', 'formal',
+    'jacket', 'shirt', 'dress', 'jeans', 'skirt', 'hoodie', 'sweater', 'sneakers',
+    'bag', 'scarf', 'blazer', 'shorts', 'kurta', 'saree', 'coat', 'boots',
+]
+
+
+@contextmanager
+def throwaway_database(verbosity=0):
+    """
+    Run the block against a freshly migrated test database that is destroyed
+    afterwards, so benchmarks never touch the real data
+    """
+    old_name = connection.creation.create_test_db(
+        verbosity=verbosity, autoclobber=True, serialize=False
+    )
+    try:
+        yield connection
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)
+
+
+def timed(func, repeat=5):
+    """
+    Run func repeat times and return the median wall time in milliseconds
+    """
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def product_rows(count, start=0, product_type='regular', **overrides):
+    """
+    Build unsaved Product instances with deterministic ids and names
+    """
+    from .models import Product
+
+    for i in range(start, start + count):
+        fields = {
+            'product_id': f'B{i:09d}',
+            'product_name': f'{WORDS[i % 15]} {WORDS[15 + (i // 15) % 16]} {i}',
+            'description': ' '.join(WORDS[(i * k) % len(WORDS)] for k in (3, 5, 7, 11)),
+            'product_type': product_type,
+            'product_condition': 'new',
+            'price': Decimal(100 + i % 900),
+            'quantity': 10,
+        }
+        fields.update(overrides)
+        yield Product(**fields)
+
+
+def bulk_create_products(count, batch_size=5000, **overrides):
+    """
+    Insert count synthetic products in batches, bypassing model signals
+    """
+    from .models import Product
+
+    rows = product_rows(count, **overrides)
+    while True:
+        batch = [row for _, row in zip(range(batch_size), rows)]
+        if not batch:
+            break
+        Product.objects.bulk_create(batch, batch_size=batch_size)
@@ -0,0 +1,22 @@
+"""
+Whether a cache is seen by every worker process
+
+Entries that are kept correct by deleting or replacing keys when the data
+changes (the cart badge count, the page cache generations) are only correct
+in the workers whose cache saw the delete. With a per-process cache such as
+LocMemCache, the default when CACHES is not configured, other workers keep
+serving what they stored until it expires.
+"""
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+PER_PROCESS_BACKENDS = (LocMemCache, DummyCache)
+
+
+def is_shared(alias='default'):
+    """
+    Whether every worker reads and writes the same entries in the cache
+    (Redis, Memcached, database, files), rather than each holding its own
+    """
+    return not isinstance(caches[alias], PER_PROCESS_BACKENDS)
@@ -1,12 +1,13 @@
-from .models import Cart, CartItem
+from django.utils.functional import SimpleLazyObject
+from .services.cart_service import CartService
 
 def cart_count(request):
-    if request.user.is_authenticated:
-        try:
-            cart = Cart.objects.get(user=request.user)
-            cart_count = CartItem.objects.filter(cart=cart).count()
-        except Cart.DoesNotExist:
-            cart_count = 0
-    else:
-        cart_count = 0
-    return {'cart_count': cart_count} 
\ No newline at end of file
+    """
+    Cart badge count, only computed when a template actually renders it and
+    then served from the per-user cache
+    """
+    def count():
+        if request.user.is_authenticated:
+            return CartService.item_count(request.user)
+        return 0
+    return {'cart_count': SimpleLazyObject(count)}
@@ -1,210 +1,96 @@
-from django.db import connection
-from django.db.models import F
-from .models import Product, Order, Bidding
+"""
+Database views kept alongside the ORM schema
 
-def create_database_objects():
-    with connection.cursor() as cursor:
-        # Function to calculate total order amount
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS order_totals (
-            order_id INTEGER PRIMARY KEY,
-            total_amount DECIMAL(10,2)
-        );
-        """)
-
-        # Function to check product availability
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS product_availability (
-            product_id INTEGER PRIMARY KEY,
-            is_available BOOLEAN
-        );
-        """)
-
-        # Function to get auction status
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS auction_status (
-            product_id INTEGER PRIMARY KEY,
-            status TEXT,
-            last_bid_time TIMESTAMP
-        );
-        """)
-
-        # Trigger to update product quantity after payment
-        cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS update_quantity_after_payment
-        AFTER UPDATE OF status ON bidbuygo_order
-        WHEN NEW.status = 'PAID' AND OLD.status != 'PAID'
-        BEGIN
-            UPDATE bidbuygo_product
-            SET quantity = quantity - 1
-            WHERE id = NEW.product_id;
-            
-            UPDATE bidbuygo_product
-            SET is_available = CASE 
-                WHEN quantity = 0 THEN 0
-                ELSE 1
-            END
-            WHERE id = NEW.product_id;
-        END;
-        """)
+They are created by migration 0022_database_objects (which keeps its own copy
+of this SQL, so a change here needs a new migration), never at process start.
+The init_db and setup_db_objects commands recreate them for databases that
+were built without running migrations. The SQL is plain enough for both
+SQLite and PostgreSQL.
+"""
+from django.db import connection as default_connection, transaction
 
-        # Add a check to ensure tables exist before creating the trigger
-        cursor.execute("""
-        SELECT name FROM sqlite_master 
-        WHERE type='table' AND name IN ('bidbuygo_product', 'bidbuygo_order');
-        """)
-        tables = cursor.fetchall()
-        if len(tables) == 2:
-            cursor.execute("""
-            DROP TRIGGER IF EXISTS update_quantity_after_payment;
-            """)
-            cursor.execute("""
-            CREATE TRIGGER update_quantity_after_payment
-            AFTER UPDATE OF status ON bidbuygo_order
-            WHEN NEW.status = 'PAID' AND OLD.status != 'PAID'
-            BEGIN
-                UPDATE bidbuygo_product
-                SET quantity = quantity - 1
-                WHERE id = NEW.product_id;
-                
-                UPDATE bidbuygo_product
-                SET is_available = CASE 
-                    WHEN quantity = 0 THEN 0
-                    ELSE 1
-                END
-                WHERE id = NEW.product_id;
-            END;
-            """)
-
-        # Trigger to update product bid information
-        cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS update_bid_info
-        AFTER INSERT ON bidbuygo_bidding
-        BEGIN
-            UPDATE bidbuygo_product
-            SET current_bid = NEW.bid_amt,
-                last_bid_time = NEW.bid_time
-            WHERE id = NEW.product_id;
-        END;
-        """)
-
-        # Trigger to handle auction ending
-        cursor.execute("""
-        CREATE TRIGGER IF NOT EXISTS check_auction_ending
-        AFTER UPDATE OF last_bid_time ON bidbuygo_product
-        WHEN datetime('now') > datetime(NEW.last_bid_time, '+24 hours')
-        BEGIN
-            -- Mark the highest bid as won
-            UPDATE bidbuygo_bidding
-            SET bid_status = 'Won'
-            WHERE product_id = NEW.id
-            AND bid_amt = (
-                SELECT MAX(bid_amt) 
-                FROM bidbuygo_bidding 
-                WHERE product_id = NEW.id
-            );
-            
-            -- Mark other bids as lost
-            UPDATE bidbuygo_bidding
-            SET bid_status = 'Lost'
-            WHERE product_id = NEW.id
-            AND bid_amt < (
-                SELECT MAX(bid_amt) 
-                FROM bidbuygo_bidding 
-                WHERE product_id = NEW.id
-            );
-            
-            -- Update product status
-            UPDATE bidbuygo_product
-            SET auction_status = 'Ended'
-            WHERE id = NEW.id;
-        END;
-        """)
-
-        # Create views for procedures
-        cursor.execute("""
-        CREATE VIEW IF NOT EXISTS payment_processing AS
-        SELECT 
-            o.id as order_id,
-            o.status as order_status,
-            o.razorpay_order_id,
+VIEWS = {
+    # Orders with their payment transactions
+    'payment_processing': """
+        SELECT
+            o.id AS order_id,
+            o.status AS order_status,
+            o.payment_method,
             t.payment_id,
             t.amount,
-            t.status as transaction_status
-        FROM bidbuygo_order o
-        LEFT JOIN bidbuygo_transaction t ON o.id = t.order_id;
-        """)
-
-        cursor.execute("""
-        CREATE VIEW IF NOT EXISTS auction_management AS
-        SELECT 
-            p.id as product_id,
+            t.status AS transaction_status
+        FROM "bidbuygo_order" o
+        LEFT JOIN "bidbuygo_transaction" t ON t.order_id = o.id
+    """,
+    # Every bid placed on every product
+    'auction_management': """
+        SELECT
+            p.product_id,
             p.auction_status,
             p.last_bid_time,
             b.bid_amt,
             b.bid_status,
             b.user_id
-        FROM bidbuygo_product p
-        LEFT JOIN bidbuygo_bidding b ON p.id = b.product_id;
-        """)
-
-        cursor.execute("""
-        CREATE VIEW IF NOT EXISTS inventory_management AS
-        SELECT 
-            id as product_id,
+        FROM "PRODUCT" p
+        LEFT JOIN "BIDDING" b ON b.product_id = p.product_id
+    """,
+    # Products whose availability flag disagrees with their quantity
+    'inventory_management': """
+        SELECT
+            product_id,
             quantity,
             is_available,
-            CASE 
-                WHEN quantity <= 0 THEN 0
-                ELSE 1
-            END as should_be_available
-        FROM bidbuygo_product;
-        """)
-
-        # Create function to calculate cart total
-        cursor.execute("""
-        CREATE FUNCTION IF NOT EXISTS calculate_cart_total(cart_id INTEGER)
-        RETURNS DECIMAL(10,2)
-        BEGIN
-            DECLARE total DECIMAL(10,2);
-            SELECT COALESCE(SUM(p.price * ci.quantity), 0)
-            INTO total
-            FROM bidbuygo_cartitem ci
-            JOIN bidbuygo_product p ON ci.product_id = p.product_id
-            WHERE ci.cart_id = cart_id;
-            RETURN total;
-        END;
-        """)
-        
-        # Create view for cart totals
-        cursor.execute("""
-        CREATE VIEW IF NOT EXISTS cart_totals AS
-        SELECT 
-            c.id as cart_id,
+            quantity > 0 AS should_be_available
+        FROM "PRODUCT"
+    """,
+    # Cart totals priced like CartService.price_cart (size adjustments included)
+    'cart_totals': """
+        SELECT
+            c.id AS cart_id,
             c.user_id,
-            calculate_cart_total(c.id) as total_price
-        FROM bidbuygo_cart c;
-        """)
+            COALESCE(SUM((p.price + COALESCE(ps.price_adjustment, 0)) * ci.quantity), 0) AS total_price
+        FROM "CART" c
+        LEFT JOIN "bidbuygo_cartitem" ci ON ci.cart_id = c.id
+        LEFT JOIN "PRODUCT" p ON p.product_id = ci.product_id
+        LEFT JOIN "PRODUCT_SIZE" ps ON ps.product_id = ci.product_id AND ps.size = ci.size
+        GROUP BY c.id, c.user_id
+    """,
+}
+
+# Triggers created by earlier versions of this module. They targeted tables
+# that no longer exist (bidbuygo_product, bidbuygo_bidding) or duplicated
+# what BiddingService and the auction scheduler now do, so they are dropped
+# wherever they were created.
+OBSOLETE_TRIGGERS = [
+    'update_quantity_after_payment',
+    'update_bid_info',
+    'check_auction_ending',
+    'update_order_status',
+]
 
-def create_triggers(apps, schema_editor):
-    with connection.cursor() as cursor:
-        # Create trigger for updating order status
-        cursor.execute("""
-            CREATE TRIGGER IF NOT EXISTS update_order_status
-            AFTER UPDATE ON bidbuygo_order
-            FOR EACH ROW
-            BEGIN
-                IF NEW.status = 'Delivered' AND OLD.status != 'Delivered' THEN
-                    UPDATE bidbuygo_orderitem
-                    SET status = 'Delivered'
-                    WHERE order_id = NEW.id;
-                END IF;
-            END;
-        """)
 
-def drop_triggers(apps, schema_editor):
+def create_database_objects(connection=None):
+    """
+    Create (or replace) the views and drop obsolete triggers. Idempotent.
+    """
+    connection = connection or default_connection
+    # One transaction where DDL is transactional (PostgreSQL), so a failed
+    # CREATE never leaves a view dropped
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            for name in OBSOLETE_TRIGGERS:
+                cursor.execute(f'DROP TRIGGER IF EXISTS {name}')
+        for name, sql in VIEWS.items():
+            cursor.execute(f'DROP VIEW IF EXISTS {name}')
+            cursor.execute(f'CREATE VIEW {name} AS {sql}')
+
+
+def drop_database_objects(connection=None):
+    connection = connection or default_connection
     with connection.cursor() as cursor:
-        cursor.execute("DROP TRIGGER IF EXISTS update_order_status")
+        for name in VIEWS:
+            cursor.execute(f'DROP VIEW IF EXISTS {name}')
+
 
 def setup_database():
     """Function to be called from Django shell to set up database objects"""
@@ -212,4 +98,4 @@ def setup_database():
         create_database_objects()
         print("Successfully created database objects")
     except Exception as e:
-        print(f"Error creating database objects: {str(e)}") 
\ No newline at end of file
+        print(f"Error creating database objects: {str(e)}")
@@ -211,6 +211,17 @@ class BidForm(forms.Form):
             'step': '0.01'
         })
     )
+    auto_bid_limit = forms.DecimalField(
+        label='Auto-bid Limit',
+        required=False,
+        min_value=Decimal('0.01'),
+        decimal_places=2,
+        widget=forms.NumberInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Highest amount to auto-bid up to',
+            'step': '0.01'
+        })
+    )
     
     def clean_bid_amt(self):
         bid_amt = self.cleaned_data['bid_amt']
@@ -218,6 +229,12 @@ class BidForm(forms.Form):
             raise forms.ValidationError("Bid amount must be greater than 0")
         return bid_amt
 
+    def clean(self):
+        cleaned_data = super().clean()
+        if not self.data.get('is_auto_bid'):
+            cleaned_data['auto_bid_limit'] = None
+        return cleaned_data
+
 class UserProfileForm(forms.ModelForm):
     class Meta:
         model = UserProfile
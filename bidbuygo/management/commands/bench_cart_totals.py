@@ -0,0 +1,68 @@
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection
+from bidbuygo.benchmarks import throwaway_database, timed, bulk_create_products
+from bidbuygo.models import Cart, CartItem, Product, ProductSize, User
+from bidbuygo.services.cart_service import CartService
+
+SIZES = ['S', 'M', 'L', 'XL']
+
+class Command(BaseCommand):
+    help = 'Benchmarks cart pricing: per-item Python summation vs one annotated SQL query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, nargs='+', default=[1, 50, 500],
+                            help='Cart sizes to benchmark')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def count_queries(self, func):
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            result = func()
+        return len(queries), result
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            largest = max(options['items'])
+            bulk_create_products(largest)
+            products = list(Product.objects.order_by('pk')[:largest])
+            ProductSize.objects.bulk_create(
+                ProductSize(product=product, size=size, stock=10, price_adjustment=Decimal('12.50') * n)
+                for product in products
+                for n, size in enumerate(SIZES)
+            )
+
+            for count in sorted(options['items']):
+                user = User.objects.create(email=f'cart{count}@example.com')
+                cart = Cart.objects.create(user=user)
+                CartItem.objects.bulk_create(
+                    CartItem(cart=cart, product=product, size=SIZES[i % len(SIZES)], quantity=1 + i % 3)
+                    for i, product in enumerate(products[:count])
+                )
+
+                def python_sum():
+                    # What Cart.total_price used to do
+                    cart_items = cart.items.all()
+                    if not cart_items.exists():
+                        return 0
+                    return sum(float(item.product.price) * item.quantity for item in cart_items)
+
+                def sql_priced():
+                    return CartService.price_cart(cart)[1]
+
+                old_queries, old_total = self.count_queries(python_sum)
+                new_queries, new_total = self.count_queries(sql_priced)
+                old_ms = timed(python_sum, options['repeat'])
+                new_ms = timed(sql_priced, options['repeat'])
+                self.stdout.write(
+                    f'{count:>4} items   python {old_ms:8.2f} ms / {old_queries:3} queries '
+                    f'(total {old_total:.2f}, no size adjustments)   '
+                    f'sql {new_ms:7.2f} ms / {new_queries} query (total {new_total})   '
+                    f'x{old_ms / new_ms:.1f}'
+                )
+        self.stdout.write(self.style.SUCCESS('Cart totals benchmark completed'))
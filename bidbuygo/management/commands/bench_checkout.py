@@ -0,0 +1,155 @@
+import threading
+import time
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+from bidbuygo.benchmarks import throwaway_database, bulk_create_products
+from bidbuygo.models import Cart, CartItem, Order, OrderItem, Product, ProductSize, Transaction, User
+from bidbuygo.services.cart_service import CartService
+from bidbuygo.services.checkout_service import CheckoutService
+
+SHIPPING = {
+    'full_name': 'Bench Buyer', 'phone_number': '9999999999', 'address_line1': '1 Bench Road',
+    'address_line2': '', 'city': 'Chennai', 'state': 'TN', 'postal_code': '600001', 'country': 'India',
+}
+
+# Attempts per checkout when SQLite reports the database as locked
+LOCK_RETRIES = 20
+
+def legacy_checkout(user, cart, shipping):
+    """
+    The previous views.checkout body: one round of queries per cart item
+    """
+    cart_items, total_amount = CartService.price_cart(cart)
+    with transaction.atomic():
+        order = Order.objects.create(user=user, amount=total_amount, status='PENDING',
+                                     payment_method='COD', **shipping)
+        for cart_item in cart_items:
+            OrderItem.objects.create(order=order, product=cart_item.product, quantity=cart_item.quantity,
+                                     price=cart_item.unit_price, size=cart_item.size)
+            product_size = ProductSize.objects.select_for_update().get(
+                product=cart_item.product, size=cart_item.size
+            )
+            if product_size.stock < cart_item.quantity:
+                raise ValidationError("Out of stock")
+            product_size.stock -= cart_item.quantity
+            product_size.save()
+            if product_size.stock <= 0:
+                cart_item.product.is_available = False
+                cart_item.product.save()
+        Transaction.objects.create(order=order, amount=total_amount, status='SUCCESS',
+                                   payment_id=f'COD-{order.order_id}')
+        cart.items.all().delete()
+        cart.delete()
+    return order
+
+class Command(BaseCommand):
+    help = 'Benchmarks parallel checkouts contending for the same product sizes: per-item loop vs batched'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--checkouts', type=int, default=10, help='Checkouts per thread')
+        parser.add_argument('--items', type=int, default=30, help='Lines per cart')
+        parser.add_argument('--stock', type=int, default=60,
+                            help='Initial stock per size (below demand, so some checkouts sell out)')
+
+    def prepare(self, products, options, run):
+        ProductSize.objects.filter(product__in=products).update(stock=options['stock'])
+        Product.objects.filter(pk__in=[p.pk for p in products]).update(is_available=True)
+        carts = []
+        for t in range(options['threads']):
+            mine = []
+            for c in range(options['checkouts']):
+                user = User.objects.create(email=f'buyer-{run}-{t}-{c}@example.com')
+                cart = Cart.objects.create(user=user)
+                # Every cart wants the same hot sizes, in a different order
+                shift = (t * options['checkouts'] + c) % len(products)
+                CartItem.objects.bulk_create(
+                    CartItem(cart=cart, product=product, size='M', quantity=1)
+                    for product in (products[shift:] + products[:shift])[:options['items']]
+                )
+                mine.append((user, cart))
+            carts.append(mine)
+        return carts
+
+    def run(self, checkout, carts):
+        stats = {'orders': 0, 'sold_out': 0, 'lock_retries': 0, 'failed': 0, 'queries': 0}
+        lock = threading.Lock()
+        start = threading.Barrier(len(carts) + 1)
+
+        def worker(mine):
+            local = dict.fromkeys(stats, 0)
+
+            def count(execute, sql, params, many, context):
+                local['queries'] += 1
+                return execute(sql, params, many, context)
+
+            start.wait()
+            try:
+                with connection.execute_wrapper(count):
+                    for user, cart in mine:
+                        for attempt in range(LOCK_RETRIES):
+                            try:
+                                checkout(user, cart, SHIPPING)
+                                local['orders'] += 1
+                            except ValidationError:
+                                local['sold_out'] += 1
+                            except OperationalError:
+                                local['lock_retries'] += 1
+                                time.sleep(0.002 * (attempt + 1))
+                                continue
+                            break
+                        else:
+                            local['failed'] += 1
+            finally:
+                connection.close()
+                with lock:
+                    for key, value in local.items():
+                        stats[key] += value
+
+        threads = [threading.Thread(target=worker, args=(mine,)) for mine in carts]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        stats['seconds'] = time.perf_counter() - began
+        return stats
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            bulk_create_products(options['items'])
+            products = list(Product.objects.order_by('pk'))
+            ProductSize.objects.bulk_create(
+                ProductSize(product=product, size='M', stock=0, price_adjustment=Decimal('0.00'))
+                for product in products
+            )
+            attempts = options['threads'] * options['checkouts']
+            self.stdout.write(
+                f"{options['threads']} threads x {options['checkouts']} checkouts of "
+                f"{options['items']} items, {options['stock']} units per size"
+            )
+
+            for run, (label, checkout) in enumerate((
+                ('per-item loop', legacy_checkout),
+                ('batched', CheckoutService.place_cod_order),
+            )):
+                carts = self.prepare(products, options, run)
+                OrderItem.objects.all().delete()
+                stats = self.run(checkout, carts)
+
+                sold = OrderItem.objects.aggregate(total=Sum('quantity'))['total'] or 0
+                left = ProductSize.objects.aggregate(total=Sum('stock'))['total']
+                negative = ProductSize.objects.filter(stock__lt=0).count()
+                consistent = sold + left == options['stock'] * len(products) and not negative
+                self.stdout.write(
+                    f"  {label:14} {stats['seconds']:7.2f} s   {stats['orders']:4} orders   "
+                    f"{stats['sold_out']:4} sold out   {stats['lock_retries']:5} lock retries   "
+                    f"{stats['failed']} gave up   "
+                    f"{stats['queries'] / attempts:6.1f} queries/checkout   "
+                    f"stock {'consistent' if consistent else 'INCONSISTENT'}"
+                )
+        self.stdout.write(self.style.SUCCESS('Checkout benchmark completed'))
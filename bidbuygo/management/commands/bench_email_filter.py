@@ -0,0 +1,64 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+from bidbuygo.benchmarks import throwaway_database, timed
+from bidbuygo.models import User
+from bidbuygo.services.bloom_filter import BloomFilter
+from bidbuygo.services.email_registry import ERROR_RATE, HEADROOM, RegisteredEmails
+
+def email(i):
+    return f'user{i}@example.com'
+
+class Command(BaseCommand):
+    help = 'Benchmarks the check_email Bloom filter: memory, false positive rate and lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000_000, 10_000_000],
+                            help='Registered users to size filters for')
+        parser.add_argument('--probes', type=int, default=1_000_000,
+                            help='Unregistered addresses probed to measure false positives')
+        parser.add_argument('--db-users', type=int, default=100_000,
+                            help='Users inserted for the end-to-end check_email comparison')
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            bloom = BloomFilter(int(size * HEADROOM), ERROR_RATE)
+            began = time.perf_counter()
+            bloom.update(email(i) for i in range(size))
+            build_s = time.perf_counter() - began
+
+            probes = options['probes']
+            began = time.perf_counter()
+            false_positives = sum(bloom.might_contain(email(size + i)) for i in range(probes))
+            lookup_us = (time.perf_counter() - began) / probes * 1e6
+            missed = sum(not bloom.might_contain(email(i)) for i in range(0, size, max(1, size // 100_000)))
+
+            # A plain set of the same addresses, measured on a sample
+            sample = {email(i) for i in range(100_000)}
+            set_bytes = (sys.getsizeof(sample) + sum(sys.getsizeof(e) for e in sample)) * size / 100_000
+
+            self.stdout.write(
+                f'{size:>11,} users   filter {bloom.nbytes / 2**20:6.1f} MiB '
+                f'({bloom.size / size:.1f} bits/user, {bloom.hashes} hashes) vs set ~{set_bytes / 2**20:,.0f} MiB   '
+                f'false positives {false_positives / probes:.4%} (expected {bloom.expected_error_rate():.4%})   '
+                f'{missed} false negatives   build {build_s:5.1f} s   lookup {lookup_us:.2f} us'
+            )
+
+        with throwaway_database():
+            count = options['db_users']
+            User.objects.bulk_create((User(email=email(i), password='!') for i in range(count)), batch_size=5000)
+            registry = RegisteredEmails()
+            began = time.perf_counter()
+            registry.build()
+            scan_s = time.perf_counter() - began
+
+            probe = iter(range(count, 10 * count))
+            query_ms = timed(lambda: User.objects.filter(email=email(next(probe))).exists(), 200)
+            filter_ms = timed(lambda: registry.is_registered(email(next(probe))), 200)
+            taken_ms = timed(lambda: registry.is_registered(email(count // 2)), 200)
+            self.stdout.write(
+                f'{count:,} users in the database: streaming build {scan_s:.2f} s   '
+                f'free address: query {query_ms * 1000:.0f} us vs filter {filter_ms * 1000:.1f} us   '
+                f'taken address (filter + query) {taken_ms * 1000:.0f} us'
+            )
+        self.stdout.write(self.style.SUCCESS('Email filter benchmark completed'))
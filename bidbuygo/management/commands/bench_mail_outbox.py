@@ -0,0 +1,83 @@
+import time
+from django.core.mail import send_mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from bidbuygo.benchmarks import throwaway_database
+from bidbuygo.models import OutgoingEmail
+from bidbuygo.services.mail_service import MailService
+
+class SimulatedSMTPBackend(EmailBackend):
+    """
+    locmem backend with the latency of a remote SMTP server: a handshake
+    (connect, STARTTLS, AUTH) per connection and a round trip per message
+    """
+    handshake = 0.0
+    per_message = 0.0
+
+    def open(self):
+        if getattr(self, 'is_open', False):
+            return False
+        time.sleep(self.handshake)
+        self.is_open = True
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        opened = self.open()
+        try:
+            time.sleep(self.per_message * len(messages))
+            return super().send_messages(messages)
+        finally:
+            if opened:
+                self.close()
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks outbound email: send_mail in the request vs the outbox and run_mail_worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=2000, help='Emails sent through the outbox')
+        parser.add_argument('--inline-count', type=int, default=50, help='Emails sent inline with send_mail')
+        parser.add_argument('--handshake-ms', type=float, default=150.0,
+                            help='Simulated connect + STARTTLS + AUTH time')
+        parser.add_argument('--message-ms', type=float, default=20.0, help='Simulated time per message')
+        parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 10, 100, 500])
+
+    def handle(self, *args, **options):
+        SimulatedSMTPBackend.handshake = options['handshake_ms'] / 1000
+        SimulatedSMTPBackend.per_message = options['message_ms'] / 1000
+        backend = f'{__name__}.SimulatedSMTPBackend'
+        self.stdout.write(
+            f"SMTP handshake {options['handshake_ms']:.0f} ms, {options['message_ms']:.0f} ms per message"
+        )
+
+        with throwaway_database(), override_settings(EMAIL_BACKEND=backend):
+            count = options['inline_count']
+            began = time.perf_counter()
+            for i in range(count):
+                send_mail('Your OTP', f'Your OTP is: {i:06d}', 'shop@example.com', [f'user{i}@example.com'])
+            elapsed = time.perf_counter() - began
+            self.stdout.write(
+                f'  send_mail in the request   {elapsed / count * 1000:8.2f} ms/request   '
+                f'{count / elapsed:8.1f} emails/s'
+            )
+
+            for batch_size in options['batch_sizes']:
+                OutgoingEmail.objects.all().delete()
+                count = options['count']
+                began = time.perf_counter()
+                for i in range(count):
+                    MailService.enqueue('Your OTP', f'Your OTP is: {i:06d}', [f'user{i}@example.com'])
+                enqueue_ms = (time.perf_counter() - began) / count * 1000
+
+                began = time.perf_counter()
+                sent, failed = MailService.drain(batch_size)
+                elapsed = time.perf_counter() - began
+                self.stdout.write(
+                    f'  outbox, batches of {batch_size:<5}  {enqueue_ms:8.2f} ms/request   '
+                    f'{sent / elapsed:8.1f} emails/s   ({sent} sent, {failed} failed)'
+                )
+        self.stdout.write(self.style.SUCCESS('Mail outbox benchmark completed'))
@@ -0,0 +1,134 @@
+import random
+import threading
+import time
+from collections import Counter
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.urls import reverse
+from bidbuygo.benchmarks import throwaway_database, bulk_create_products
+from bidbuygo.models import Category, Product, ProductReview, ProductSize, User
+from bidbuygo.services import page_cache
+
+VIEWS = ['home', 'product_list', 'auction_list', 'product_detail']
+
+class Command(BaseCommand):
+    help = 'Load test of the anonymous catalog pages with the page cache off and on'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=10000, help='Catalog size')
+        parser.add_argument('--reviews', type=int, default=200, help='Reviews on each visited product')
+        parser.add_argument('--pages', type=int, default=50, help='Distinct product pages visited')
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+
+    def urls(self, products):
+        urls = [reverse('bidbuygo:home'), reverse('bidbuygo:auctions')]
+        urls += [reverse('bidbuygo:products') + query for query in ('', '?category=men', '?sort=rating')]
+        urls += [reverse('bidbuygo:product_detail', args=[product.pk]) for product in products]
+        return urls
+
+    def load(self, urls, threads, seconds):
+        """
+        Anonymous visitors requesting random pages for seconds
+
+        Returns:
+            tuple: (requests per second, Counter of X-Page-Cache outcomes)
+        """
+        outcomes = Counter()
+        lock = threading.Lock()
+        start = threading.Barrier(threads + 1)
+
+        def visitor(seed):
+            rng = random.Random(seed)
+            client = Client()
+            seen = Counter()
+            start.wait()
+            try:
+                while time.perf_counter() < deadline:
+                    response = client.get(rng.choice(urls))
+                    seen[response.get('X-Page-Cache', 'off')] += 1
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(seen)
+
+        workers = [threading.Thread(target=visitor, args=(i,)) for i in range(threads)]
+        for worker in workers:
+            worker.start()
+        deadline = time.perf_counter() + seconds
+        start.wait()
+        for worker in workers:
+            worker.join()
+        return sum(outcomes.values()) / seconds, outcomes
+
+    def stampede(self, url, product, threads):
+        """
+        Invalidate one cached page and send threads requests for it at once
+
+        Returns:
+            Counter: X-Page-Cache outcomes
+        """
+        outcomes = Counter()
+        start = threading.Barrier(threads)
+        Client().get(url)
+        page_cache.bump([f'product:{product.pk}'])
+
+        def visitor():
+            start.wait()
+            try:
+                outcomes[Client().get(url)['X-Page-Cache']] += 1
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=visitor) for _ in range(threads)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return outcomes
+
+    def handle(self, *args, **options):
+        with throwaway_database(), override_settings(ALLOWED_HOSTS=['testserver']):
+            men = Category.objects.create(name='men')
+            bulk_create_products(options['products'], category=men)
+            products = list(Product.objects.order_by('pk')[:options['pages']])
+            users = User.objects.bulk_create(
+                User(email=f'bench{i}@example.com', password='!') for i in range(options['reviews'])
+            )
+            for product in products:
+                ProductSize.objects.bulk_create(ProductSize(product=product, size=size, stock=5) for size in 'SML')
+                ProductReview.objects.bulk_create(
+                    ProductReview(user=user, product=product, rating=i % 5 + 1, review_text='Bench review')
+                    for i, user in enumerate(users)
+                )
+            urls = self.urls(products)
+            self.stdout.write(
+                f"{options['products']:,} products, {len(urls)} URLs, {options['threads']} threads, "
+                f"{options['seconds']:.0f} s per run"
+            )
+
+            results = {}
+            for enabled in (False, True):
+                cache.clear()
+                with override_settings(PAGE_CACHE={'ENABLED': enabled}):
+                    results[enabled] = self.load(urls, options['threads'], options['seconds'])
+            for enabled, (rate, outcomes) in results.items():
+                detail = ', '.join(f'{outcome} {n}' for outcome, n in sorted(outcomes.items()))
+                self.stdout.write(f"  cache {'on ' if enabled else 'off'}  {rate:8.1f} requests/s   ({detail})")
+            self.stdout.write(f'  speedup  {results[True][0] / results[False][0]:.1f}x')
+
+            hits = page_cache.stats(VIEWS)
+            for view, counts in hits.items():
+                total = sum(counts.values())
+                if total:
+                    self.stdout.write(f"  {view:<15} hit rate {100 * counts['hit'] / total:5.1f}% of {total}")
+
+            url = reverse('bidbuygo:product_detail', args=[products[0].pk])
+            outcomes = self.stampede(url, products[0], options['threads'])
+            self.stdout.write(
+                f"  stampede: {options['threads']} requests right after an invalidation, "
+                f"{outcomes['MISS']} render(s), {outcomes['STALE']} served stale, {outcomes['HIT']} hits"
+            )
+        self.stdout.write(self.style.SUCCESS('Page cache benchmark completed'))
@@ -0,0 +1,57 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from bidbuygo.benchmarks import throwaway_database, timed, bulk_create_products
+from bidbuygo.models import Product
+from bidbuygo.pagination import KeysetPaginator
+
+PER_PAGE = 12
+
+class Command(BaseCommand):
+    help = 'Benchmarks product_list pagination: Paginator (COUNT + OFFSET) vs keyset cursors'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=1_000_000, help='Catalog size')
+        parser.add_argument('--pages', type=int, nargs='+', default=[1, 5000],
+                            help='Page numbers to benchmark')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            bulk_create_products(options['size'])
+            products = Product.objects.filter(is_available=True)
+            keyset = KeysetPaginator(products, ['product_name'], per_page=PER_PAGE)
+            self.stdout.write(f"{options['size']:,} products, {PER_PAGE} per page")
+
+            for number in options['pages']:
+                # The cursor a visitor would hold after clicking through to
+                # this page: the key of the previous page's last row
+                token = None
+                if number > 1:
+                    offset = (number - 1) * PER_PAGE - 1
+                    last = products.order_by(*keyset.order_by())[offset]
+                    token = keyset.encode(keyset.key_of(last), 'n')
+
+                def offset_page():
+                    page = Paginator(products.order_by('product_name'), PER_PAGE).get_page(number)
+                    list(page)
+
+                def cursor_page():
+                    list(keyset.get_page(token))
+
+                def cursor_page_with_total():
+                    page = keyset.get_page(token)
+                    list(page)
+                    page.total
+
+                offset_ms = timed(offset_page, options['repeat'])
+                cursor_ms = timed(cursor_page, options['repeat'])
+                cache.clear()
+                cold_total_ms = timed(lambda: (cache.clear(), cursor_page_with_total()), options['repeat'])
+                warm_total_ms = timed(cursor_page_with_total, options['repeat'])
+                self.stdout.write(
+                    f'  page {number:>5}   paginator {offset_ms:8.2f} ms   '
+                    f'keyset {cursor_ms:6.2f} ms   '
+                    f'keyset+total {cold_total_ms:8.2f} ms cold / {warm_total_ms:6.2f} ms cached'
+                )
+        self.stdout.write(self.style.SUCCESS('Pagination benchmark completed'))
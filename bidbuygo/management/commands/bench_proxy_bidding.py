@@ -0,0 +1,99 @@
+import random
+import time
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from bidbuygo.benchmarks import throwaway_database, product_rows
+from bidbuygo.models import Product, Bidding, User
+from bidbuygo.services.bidding_service import BiddingService
+from bidbuygo.services.order_book import order_books
+
+INCREMENT = Decimal('1.00')
+
+class Command(BaseCommand):
+    help = 'Benchmarks proxy bidding wars: increment-by-increment replies vs single-pass resolution'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bidders', type=int, nargs='+', default=[100, 300, 1000],
+                            help='Numbers of competing proxy bidders')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def new_auction(self, n):
+        product = next(product_rows(1, start=n, product_type='auction', price=Decimal('100.00')))
+        product.save()
+        return product
+
+    def incremental_war(self, product, bidder, limit):
+        """
+        The old behaviour: every outbid proxy answers one increment at a time
+        """
+        now = timezone.now()
+        product.refresh_from_db(fields=['current_bid'])
+        amount = BiddingService.minimum_bid(product, INCREMENT)
+        if amount > limit:
+            return
+        Bidding.objects.create(user=bidder, product=product, bid_amt=amount, is_auto_bid=True,
+                               auto_bid_limit=limit, bid_status='Pending', bid_time=now)
+        leader, current = bidder.pk, amount
+        while True:
+            challenger = Bidding.objects.filter(
+                product=product, is_auto_bid=True, bid_status='Pending',
+                auto_bid_limit__gte=current + INCREMENT
+            ).exclude(user_id=leader).order_by('-auto_bid_limit', 'bid_time').values_list(
+                'user_id', 'auto_bid_limit'
+            ).first()
+            if challenger is None:
+                break
+            leader, current = challenger[0], current + INCREMENT
+            Bidding.objects.create(user_id=leader, product=product, bid_amt=current, is_auto_bid=True,
+                                   auto_bid_limit=challenger[1], bid_status='Pending',
+                                   bid_time=timezone.now())
+        Product.objects.filter(pk=product.pk).update(current_bid=current, last_bid_time=now)
+
+    def single_pass(self, product, bidder, limit):
+        product.refresh_from_db(fields=['current_bid'])
+        amount = BiddingService.minimum_bid(product, INCREMENT)
+        if amount > limit:
+            return
+        BiddingService.place_bid(bidder, product, amount, auto_bid_limit=limit, min_increment=INCREMENT)
+
+    def run(self, product, strategy, bidders, limits):
+        order_books.clear()
+        queries = []
+
+        def count(execute, sql, params, many, context):
+            queries.append(sql)
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            start = time.perf_counter()
+            for bidder, limit in zip(bidders, limits):
+                strategy(product, bidder, limit)
+            elapsed = time.perf_counter() - start
+        product.refresh_from_db()
+        rows = Bidding.objects.filter(product=product).count()
+        return elapsed, len(queries), rows, product.current_bid
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        with throwaway_database():
+            for n, count in enumerate(sorted(options['bidders'])):
+                bidders = User.objects.bulk_create(
+                    User(email=f'proxy{n}-{i}@example.com') for i in range(count)
+                )
+                limits = [Decimal(rng.randint(150, 5000)) for _ in bidders]
+                top, second = sorted(limits)[-1], sorted(limits)[-2]
+                expected = min(top, second + INCREMENT)
+
+                self.stdout.write(f'\n{count:,} proxy bidders (expected price {expected})')
+                for label, strategy in (('incremental', self.incremental_war), ('single-pass', self.single_pass)):
+                    with transaction.atomic():
+                        product = self.new_auction(n)
+                        elapsed, queries, rows, price = self.run(product, strategy, bidders, limits)
+                        transaction.set_rollback(True)
+                    self.stdout.write(
+                        f'  {label:12} {elapsed:8.3f} s   {queries:7,} queries   '
+                        f'{rows:7,} bid rows   final price {price}'
+                    )
+        self.stdout.write(self.style.SUCCESS('Proxy bidding benchmark completed'))
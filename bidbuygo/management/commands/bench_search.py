@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from bidbuygo.benchmarks import throwaway_database, timed, bulk_create_products
+from bidbuygo.models import Product
+from bidbuygo.services.search_service import SearchService
+
+QUERIES = ['denim', 'vint', 'leather jacket', 'floral silk dress', '4242']
+
+class Command(BaseCommand):
+    help = 'Benchmarks product_list search latency: icontains scan vs full-text index'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                            help='Catalog sizes to benchmark')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            loaded = 0
+            for size in sorted(options['sizes']):
+                bulk_create_products(size - loaded, start=loaded)
+                loaded = size
+                SearchService.rebuild_index()
+
+                self.stdout.write(f'\n{size:,} products')
+                for query in QUERIES:
+                    base = Product.objects.filter(is_available=True)
+
+                    def scan():
+                        qs = base.filter(
+                            Q(product_name__icontains=query) | Q(description__icontains=query)
+                        ).order_by('product_name')
+                        qs.count()
+                        list(qs[:12])
+
+                    def indexed():
+                        qs = SearchService.search(base, query)
+                        qs.count()
+                        list(qs[:12])
+
+                    scan_ms = timed(scan, options['repeat'])
+                    index_ms = timed(indexed, options['repeat'])
+                    self.stdout.write(
+                        f'  {query!r:22} icontains {scan_ms:9.2f} ms   '
+                        f'fts {index_ms:9.2f} ms   x{scan_ms / max(index_ms, 0.001):.1f}'
+                    )
+        self.stdout.write(self.style.SUCCESS('Search benchmark completed'))
@@ -0,0 +1,62 @@
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from bidbuygo.benchmarks import throwaway_database, bulk_create_products
+from bidbuygo.models import Product, Bidding, User
+from bidbuygo.services.bidding_service import BiddingService
+from bidbuygo.services.order_book import order_books
+
+class Command(BaseCommand):
+    help = 'Benchmarks ending many auctions: per-product end_auction loop vs bulk end_auctions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 10_000],
+                            help='Numbers of expiring auctions to settle')
+        parser.add_argument('--bids', type=int, default=5, help='Bids per auction')
+
+    def run_rolled_back(self, func):
+        order_books.clear()
+        start = time.perf_counter()
+        with transaction.atomic():
+            func()
+            elapsed = time.perf_counter() - start
+            transaction.set_rollback(True)
+        return elapsed
+
+    def handle(self, *args, **options):
+        with throwaway_database():
+            bidders = User.objects.bulk_create(
+                User(email=f'bidder{i}@example.com') for i in range(options['bids'])
+            )
+            loaded = 0
+            for size in sorted(options['sizes']):
+                expired = timezone.now() - timedelta(days=2)
+                bulk_create_products(size - loaded, start=loaded, product_type='auction',
+                                     last_bid_time=expired)
+                Bidding.objects.bulk_create((
+                    Bidding(user=bidder, product_id=f'B{i:09d}', bid_amt=Decimal(100 + n),
+                            bid_status='Pending', bid_time=expired + timedelta(seconds=n))
+                    for i in range(loaded, size)
+                    for n, bidder in enumerate(bidders)
+                ), batch_size=5000)
+                loaded = size
+
+                auctions = Product.objects.filter(product_type='auction', auction_status='Active')
+
+                def loop():
+                    for product in auctions:
+                        BiddingService.end_auction(product)
+
+                def bulk():
+                    BiddingService.end_auctions(auctions)
+
+                loop_s = self.run_rolled_back(loop)
+                bulk_s = self.run_rolled_back(bulk)
+                self.stdout.write(
+                    f'{size:>7,} auctions x {options["bids"]} bids   '
+                    f'loop {loop_s:8.3f} s   bulk {bulk_s:8.3f} s   x{loop_s / bulk_s:.1f}'
+                )
+        self.stdout.write(self.style.SUCCESS('Settlement benchmark completed'))
@@ -0,0 +1,172 @@
+import random
+import threading
+import time
+from collections import Counter
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, close_old_connections, connection
+from bidbuygo.benchmarks import throwaway_database, bulk_create_products
+from bidbuygo.models import Cart, CartItem, Product, ProductSize, User
+from bidbuygo.services.bidding_service import BiddingService
+from bidbuygo.services.checkout_service import CheckoutService
+from bidbuygo.services.order_book import order_books
+
+SHIPPING = {
+    'full_name': 'Bench Buyer', 'phone_number': '9999999999', 'address_line1': '1 Bench Road',
+    'address_line2': '', 'city': 'Chennai', 'state': 'TN', 'postal_code': '600001', 'country': 'India',
+}
+
+# Share of bids, checkouts and product page reads in the workload
+MIX = (('bid', 4), ('checkout', 2), ('read', 4))
+
+# SQLite as Django opens it without OPTIONS: rollback journal, full sync,
+# a 5 second busy timeout, deferred transactions, a connection per request
+STOCK_PROFILE = {
+    'OPTIONS': {'init_command': 'PRAGMA journal_mode=DELETE;PRAGMA synchronous=FULL', 'timeout': 5},
+    'CONN_MAX_AGE': 0,
+}
+
+class Command(BaseCommand):
+    help = 'Concurrent bids, checkouts and reads against SQLite with the stock and the configured profile'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0, help='Duration of each run')
+        parser.add_argument('--auctions', type=int, default=5, help='Auctions the bids contend for')
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--carts', type=int, default=300, help='Carts prepared per thread and run')
+
+    def profiles(self):
+        configured = settings.DATABASES['default']
+        options = dict(configured.get('OPTIONS', {}))
+        # As on a deployment's own database file (SQLITE_PATH); the
+        # committed demo database keeps its rollback journal
+        options['init_command'] = 'PRAGMA journal_mode=WAL;' + options.get('init_command', '')
+        return [
+            ('stock', STOCK_PROFILE),
+            ('tuned', {'OPTIONS': options, 'CONN_MAX_AGE': configured.get('CONN_MAX_AGE', 0)}),
+        ]
+
+    def use_profile(self, profile):
+        """
+        Make new connections in every thread open with profile; the
+        connection settings dict is shared by all of them
+        """
+        connection.close()
+        connection.settings_dict.update(profile)
+        with connection.cursor() as cursor:
+            # journal_mode persists in the file; report what it is now
+            return cursor.execute('PRAGMA journal_mode').fetchone()[0]
+
+    def prepare(self, products, options, run):
+        carts = []
+        for t in range(options['threads']):
+            user = User.objects.create(email=f'writer-{run}-{t}@example.com')
+            users = User.objects.bulk_create(
+                User(email=f'buyer-{run}-{t}-{c}@example.com', password='!') for c in range(options['carts'])
+            )
+            mine = Cart.objects.bulk_create(Cart(user=buyer) for buyer in users)
+            CartItem.objects.bulk_create(
+                CartItem(cart=cart, product=product, size='M', quantity=1)
+                for cart in mine for product in random.sample(products, 2)
+            )
+            carts.append((user, list(zip(users, mine))))
+        return carts
+
+    def run(self, auctions, products, carts, seconds):
+        outcomes = Counter()
+        latencies = []
+        lock = threading.Lock()
+        start = threading.Barrier(len(carts) + 1)
+        operations = [name for name, weight in MIX for _ in range(weight)]
+
+        def bid(user, pending):
+            product = Product.objects.get(pk=random.choice(auctions))
+            BiddingService.place_bid(user, product, BiddingService.minimum_bid(product))
+
+        def checkout(user, pending):
+            buyer, cart = pending.pop()
+            CheckoutService.place_cod_order(buyer, cart, SHIPPING)
+
+        def read(user, pending):
+            product = Product.objects.select_related('category').get(pk=random.choice(products).pk)
+            list(product.sizes.all())
+
+        handlers = {'bid': bid, 'checkout': checkout, 'read': read}
+
+        def worker(seed, user, pending):
+            rng = random.Random(seed)
+            seen = Counter()
+            times = []
+            start.wait()
+            try:
+                while time.perf_counter() < deadline:
+                    name = rng.choice(operations)
+                    if name == 'checkout' and not pending:
+                        name = 'read'
+                    # As around a request: reconnect unless CONN_MAX_AGE allows reuse
+                    close_old_connections()
+                    began = time.perf_counter()
+                    try:
+                        handlers[name](user, pending)
+                        seen[name] += 1
+                    except ValidationError:
+                        # Outbid or sold out: answered, just not accepted
+                        seen[name] += 1
+                    except OperationalError:
+                        seen['locked'] += 1
+                    times.append(time.perf_counter() - began)
+                    close_old_connections()
+            finally:
+                connection.close()
+                with lock:
+                    outcomes.update(seen)
+                    latencies.extend(times)
+
+        workers = [
+            threading.Thread(target=worker, args=(i, user, pending)) for i, (user, pending) in enumerate(carts)
+        ]
+        for worker_thread in workers:
+            worker_thread.start()
+        deadline = time.perf_counter() + seconds
+        start.wait()
+        for worker_thread in workers:
+            worker_thread.join()
+        latencies.sort()
+        p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0
+        return outcomes, p99
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('This benchmark compares SQLite profiles; the database is ' + connection.vendor)
+        with throwaway_database():
+            bulk_create_products(options['products'])
+            bulk_create_products(
+                options['auctions'], start=options['products'], product_type='auction', price=Decimal('100.00'),
+                auction_status='Active'
+            )
+            products = list(Product.objects.filter(product_type='regular'))
+            auctions = list(Product.objects.filter(product_type='auction').values_list('pk', flat=True))
+            ProductSize.objects.bulk_create(
+                ProductSize(product=product, size='M', stock=1000000, price_adjustment=Decimal('0.00'))
+                for product in products
+            )
+            self.stdout.write(
+                f"{options['threads']} threads, {options['seconds']:.0f} s per run, bids on "
+                f"{options['auctions']} auctions, checkouts and reads of {options['products']} products"
+            )
+
+            for run, (label, profile) in enumerate(self.profiles()):
+                journal = self.use_profile(profile)
+                carts = self.prepare(products, options, run)
+                order_books.clear()
+                outcomes, p99 = self.run(auctions, products, carts, options['seconds'])
+                done = sum(outcomes[name] for name, _ in MIX)
+                detail = '  '.join(f'{name} {outcomes[name]}' for name, _ in MIX)
+                self.stdout.write(
+                    f"  {label:6} ({journal:6}) {done / options['seconds']:8.1f} ops/s   p99 {p99:7.1f} ms   "
+                    f"{outcomes['locked']:4} database is locked   ({detail})"
+                )
+        self.stdout.write(self.style.SUCCESS('SQLite profile benchmark completed'))
@@ -0,0 +1,145 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Modules a worker should not load until a payment is taken
+PAYMENT_SDKS = ['stripe', 'razorpay']
+
+# Runs in a fresh interpreter so nothing is already imported. Every
+# AppConfig is timed through the three phases of apps.populate(), and any
+# query issued while starting up is counted. The worker then loads the
+# URLconf (and with it every view module), as it does before its first
+# request. With a second argument the payment SDKs are imported up front,
+# as views.py used to.
+PROBE = r'''
+import json, os, sys, time
+began = time.perf_counter()
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', sys.argv[1])
+eager = [name for name in sys.argv[2].split(',') if name]
+import django
+from django.apps import AppConfig
+from django.db import connections
+
+timings = {}
+
+def phase(config, name, func):
+    def timed(*args, **kwargs):
+        began = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            timings.setdefault(config.label, {})[name] = (time.perf_counter() - began) * 1000
+
+    return timed
+
+create = AppConfig.create.__func__
+
+def timed_create(cls, entry):
+    began = time.perf_counter()
+    config = create(cls, entry)
+    timings.setdefault(config.label, {})['import'] = (time.perf_counter() - began) * 1000
+    config.import_models = phase(config, 'models', config.import_models)
+    config.ready = phase(config, 'ready', config.ready)
+    return config
+
+AppConfig.create = classmethod(timed_create)
+
+queries = []
+import django.db.backends.base.base as base
+connect = base.BaseDatabaseWrapper.connect
+
+def counted_connect(self):
+    connect(self)
+    self.execute_wrappers.append(lambda execute, sql, *args: queries.append(sql) or execute(sql, *args))
+
+base.BaseDatabaseWrapper.connect = counted_connect
+
+def rss_mb():
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+before_setup = time.perf_counter()
+django.setup()
+done = time.perf_counter()
+from importlib import import_module
+from django.conf import settings
+for module in eager:
+    import_module(module)
+import_module(settings.ROOT_URLCONF)
+print(json.dumps({
+    'apps': timings,
+    'setup_ms': (done - before_setup) * 1000,
+    'worker_ms': (time.perf_counter() - began) * 1000,
+    'rss_mb': rss_mb(),
+    'loaded': sorted(name for name in sys.argv[3:] if name in sys.modules),
+    'connections': sum(1 for alias in connections if connections[alias].connection is not None),
+    'queries': queries,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks process start: import, models and ready() time per installed app'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5, help='Fresh processes to start')
+        parser.add_argument('--eager-payment-sdks', action='store_true',
+                            help='Also start workers that import the payment SDKs up front, for comparison')
+
+    def probe(self, eager=()):
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, os.environ.get('DJANGO_SETTINGS_MODULE', 'mysite.settings'),
+             ','.join(eager), *PAYMENT_SDKS],
+            capture_output=True, text=True, cwd=settings.BASE_DIR
+        )
+        if result.returncode:
+            raise CommandError(f'Startup probe failed:\n{result.stderr}')
+        return json.loads(result.stdout)
+
+    def handle(self, *args, **options):
+        runs = [self.probe() for _ in range(options['repeat'])]
+
+        def median(values):
+            return statistics.median(values) if values else 0.0
+
+        self.stdout.write(f"{'app':28} {'import':>9} {'models':>9} {'ready':>9}   (median of {len(runs)} processes, ms)")
+        for label in runs[0]['apps']:
+            phases = [
+                median([run['apps'][label].get(name, 0.0) for run in runs])
+                for name in ('import', 'models', 'ready')
+            ]
+            self.stdout.write(f'{label:28} ' + ' '.join(f'{ms:9.2f}' for ms in phases))
+
+        queries = max(len(run['queries']) for run in runs)
+        apps_ms = median([sum(sum(phases.values()) for phases in run['apps'].values()) for run in runs])
+        self.stdout.write(
+            f"django.setup() {median([run['setup_ms'] for run in runs]):.1f} ms "
+            f"(installed apps {apps_ms:.1f} ms, the rest is settings and logging); "
+            f"{max(run['connections'] for run in runs)} database connections, {queries} queries"
+        )
+        for sql in runs[0]['queries']:
+            self.stdout.write(f'    {sql}')
+
+        variants = [('worker', runs)]
+        if options['eager_payment_sdks']:
+            variants.append(('eager SDKs', [self.probe(PAYMENT_SDKS) for _ in range(options['repeat'])]))
+        for label, variant in variants:
+            self.stdout.write(
+                f"{label:10} up to URLconf loaded {median([run['worker_ms'] for run in variant]):7.1f} ms   "
+                f"RSS {median([run['rss_mb'] for run in variant]):6.1f} MB   "
+                f"payment SDKs loaded: {', '.join(variant[0]['loaded']) or 'none'}"
+            )
+        if queries:
+            self.stdout.write(self.style.WARNING('Start-up queries the database'))
+        else:
+            self.stdout.write(self.style.SUCCESS('Startup benchmark completed'))
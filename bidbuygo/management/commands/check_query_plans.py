@@ -0,0 +1,37 @@
+from contextlib import nullcontext
+from django.core.management.base import BaseCommand, CommandError
+from bidbuygo.benchmarks import throwaway_database
+from bidbuygo.query_plans import HOT_QUERIES, explain
+
+class Command(BaseCommand):
+    help = 'Explains every registered hot query and fails if any of them reads a whole table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--fresh', action='store_true',
+                            help='Check a freshly migrated throwaway database instead of the configured one')
+        parser.add_argument('--strict', action='store_true',
+                            help='Also fail when an ORDER BY is not served by an index')
+        parser.add_argument('--plans', action='store_true', help='Print every plan, not just the failures')
+
+    def handle(self, *args, **options):
+        failures = []
+        with throwaway_database() if options['fresh'] else nullcontext():
+            for name, build in HOT_QUERIES.items():
+                lines, full_scans, sorts = explain(build(), using=options['database'])
+                problems = [f'full scan of {table}' for table in full_scans]
+                if sorts:
+                    problems.append('sorts outside an index')
+                failed = full_scans or (sorts and options['strict'])
+                if failed:
+                    failures.append(name)
+
+                style = self.style.ERROR if failed else self.style.WARNING if problems else self.style.SUCCESS
+                self.stdout.write(style(f"{name}: {', '.join(problems) or 'ok'}"))
+                if failed or options['plans']:
+                    for line in lines:
+                        self.stdout.write(f'    {line}')
+
+        if failures:
+            raise CommandError(f"{len(failures)} hot queries need an index: {', '.join(failures)}")
+        self.stdout.write(self.style.SUCCESS(f'All {len(HOT_QUERIES)} hot queries use an index'))
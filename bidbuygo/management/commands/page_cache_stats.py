@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from bidbuygo.services import page_cache
+from bidbuygo.urls import urlpatterns
+
+class Command(BaseCommand):
+    help = 'Shows the anonymous page cache hit rate of each cached view'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true', help='Zero the counters after showing them')
+
+    def handle(self, *args, **options):
+        views = [
+            pattern.callback.page_cache_view for pattern in urlpatterns
+            if hasattr(pattern.callback, 'page_cache_view')
+        ]
+        for view, counts in page_cache.stats(views).items():
+            total = sum(counts.values())
+            rate = 100 * counts[page_cache.HIT] / total if total else 0
+            self.stdout.write(
+                f'{view:<15} {total:>9} requests   hit rate {rate:5.1f}%   '
+                f'(hit {counts[page_cache.HIT]}, stale {counts[page_cache.STALE]}, miss {counts[page_cache.MISS]})'
+            )
+        if options['reset']:
+            page_cache.reset_stats(views)
+            self.stdout.write(self.style.SUCCESS('Counters reset'))
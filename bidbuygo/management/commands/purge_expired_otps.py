@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from bidbuygo.services.otp_store import get_store
+
+class Command(BaseCommand):
+    help = 'Deletes expired one-time passwords and abandoned registrations'
+
+    def handle(self, *args, **options):
+        for purpose in ('registration', 'email'):
+            deleted = get_store(purpose).purge()
+            self.stdout.write(f'{purpose}: deleted {deleted} expired codes')
+        self.stdout.write(self.style.SUCCESS('Expired OTPs purged'))
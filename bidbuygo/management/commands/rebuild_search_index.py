@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bidbuygo.models import Product
+from bidbuygo.services.search_service import SearchService
+
+class Command(BaseCommand):
+    help = 'Rebuilds the product full-text search index from the PRODUCT table'
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                SearchService.rebuild_index()
+            self.stdout.write(self.style.SUCCESS(
+                f'Successfully indexed {Product.objects.count()} products'
+            ))
+        except Exception as e:
+            self.stdout.write(self.style.ERROR(f'Error rebuilding search index: {str(e)}'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from bidbuygo.services.review_service import RECONCILE_BATCH_SIZE, ReviewService
+
+class Command(BaseCommand):
+    help = ("Recomputes every product's stored rating aggregates and every review's helpful vote count, "
+            "and fixes any drift")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RECONCILE_BATCH_SIZE,
+                            help='Products or reviews checked per transaction')
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it')
+
+    def handle(self, *args, **options):
+        checked, drifted = ReviewService.reconcile(options['batch_size'], options['dry_run'])
+        self.report(checked, drifted, 'products', 'rating aggregates', options['dry_run'])
+        checked, drifted = ReviewService.reconcile_helpful_votes(options['batch_size'], options['dry_run'])
+        self.report(checked, drifted, 'reviews', 'helpful vote counts', options['dry_run'])
+
+    def report(self, checked, drifted, rows, what, dry_run):
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS(f'All {checked} {rows} have correct {what}'))
+        elif dry_run:
+            self.stdout.write(self.style.WARNING(f'{drifted} of {checked} {rows} have drifted {what}'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Fixed the {what} of {drifted} of {checked} {rows}'))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from bidbuygo.services.auction_scheduler import AuctionScheduler
+
+class Command(BaseCommand):
+    help = 'Runs the auction scheduler, ending each auction as soon as its deadline passes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--poll-interval', type=float, default=5.0,
+                            help='Maximum seconds between checks for new bids')
+        parser.add_argument('--once', action='store_true',
+                            help='Load deadlines, end the auctions that are due and exit')
+
+    def handle(self, *args, **options):
+        scheduler = AuctionScheduler(poll_interval=options['poll_interval'])
+        if options['once']:
+            scheduler.load()
+            ended = scheduler.tick()
+            self.stdout.write(self.style.SUCCESS(f'Ended {ended} auctions'))
+            return
+
+        self.stdout.write(f'Scheduling {scheduler.load()} running auctions')
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Auction scheduler stopped'))
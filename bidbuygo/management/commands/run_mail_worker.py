@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from bidbuygo.services.mail_service import BATCH_SIZE, MailService
+
+class Command(BaseCommand):
+    help = 'Sends queued emails from the outbox in batches, retrying failures with backoff'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Emails claimed and sent per batch')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds between checks for new emails')
+        parser.add_argument('--once', action='store_true',
+                            help='Send everything that is due and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            sent, failed = MailService.drain(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Sent {sent} emails, {failed} failed'))
+            return
+
+        self.stdout.write('Mail worker started')
+        try:
+            MailService.run_forever(options['batch_size'], options['poll_interval'])
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Mail worker stopped'))
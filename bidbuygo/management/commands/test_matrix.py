@@ -0,0 +1,83 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+ENGINES = ['sqlite', 'postgresql']
+
+class Command(BaseCommand):
+    help = 'Runs the test suite once per database engine, PostgreSQL on a throwaway local server'
+
+    def add_arguments(self, parser):
+        parser.add_argument('labels', nargs='*', help='Test labels, as for the test command')
+        parser.add_argument('--engines', nargs='+', choices=ENGINES, default=ENGINES)
+        parser.add_argument('--pg-bin', help='Directory holding initdb and pg_ctl (default: found on PATH)')
+        parser.add_argument('--pg-existing', action='store_true',
+                            help='Use the server in the DB_* environment variables instead of starting one')
+
+    def find(self, program, directory):
+        found = shutil.which(program, path=directory) if directory else shutil.which(program)
+        if found is None:
+            raise CommandError(f'{program} not found; install PostgreSQL or pass --pg-bin')
+        return found
+
+    @contextmanager
+    def throwaway_postgres(self, directory):
+        """
+        Start a PostgreSQL server in a temporary directory, listening only on
+        a Unix socket there, and remove it afterwards
+
+        Yields:
+            dict: The DB_* environment variables that reach it
+        """
+        initdb, pg_ctl = self.find('initdb', directory), self.find('pg_ctl', directory)
+        with tempfile.TemporaryDirectory(prefix='bidbuygo-pg-') as root:
+            data = os.path.join(root, 'data')
+            created = subprocess.run(
+                [initdb, '-D', data, '-U', 'bidbuygo', '--auth=trust', '--no-sync'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+            )
+            if created.returncode:
+                # initdb refuses to run as root, for one
+                raise CommandError(
+                    f'initdb failed: {created.stderr.strip()}\n'
+                    'Start a server as another user and pass --pg-existing with the DB_* variables'
+                )
+            # No TCP: the socket in root cannot clash with another server.
+            # fsync off: the data is thrown away, and the suite runs faster.
+            port = '5432'
+            options = f"-p {port} -k {root} -c listen_addresses='' -c fsync=off"
+            subprocess.run(
+                [pg_ctl, '-D', data, '-l', os.path.join(root, 'server.log'), '-o', options, '-w', 'start'],
+                check=True, stdout=subprocess.DEVNULL
+            )
+            try:
+                yield {'DB_HOST': root, 'DB_PORT': port, 'DB_USER': 'bidbuygo', 'DB_NAME': 'postgres'}
+            finally:
+                subprocess.run([pg_ctl, '-D', data, '-m', 'fast', '-w', 'stop'], stdout=subprocess.DEVNULL)
+
+    def run_suite(self, engine, labels, extra_env):
+        env = {**os.environ, **extra_env, 'DB_ENGINE': engine}
+        command = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'test', '--noinput', *labels]
+        self.stdout.write(self.style.MIGRATE_HEADING(f'== {engine} =='))
+        return subprocess.run(command, env=env).returncode == 0
+
+    def handle(self, *args, **options):
+        results = {}
+        for engine in options['engines']:
+            if engine == 'postgresql' and not options['pg_existing']:
+                with self.throwaway_postgres(options['pg_bin']) as env:
+                    results[engine] = self.run_suite(engine, options['labels'], env)
+            else:
+                results[engine] = self.run_suite(engine, options['labels'], {})
+
+        for engine, passed in results.items():
+            style = self.style.SUCCESS if passed else self.style.ERROR
+            self.stdout.write(style(f"{engine:<12} {'passed' if passed else 'FAILED'}"))
+        failed = [engine for engine, passed in results.items() if not passed]
+        if failed:
+            raise CommandError(f"Tests failed on {', '.join(failed)}")
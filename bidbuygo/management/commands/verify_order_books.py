@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from bidbuygo.models import Product
+from bidbuygo.services.bidding_service import BiddingService
+
+class Command(BaseCommand):
+    help = 'Checks the in-memory auction order books against the Bidding table'
+
+    def handle(self, *args, **options):
+        inconsistent = 0
+        for product in Product.objects.filter(product_type='auction', auction_status='Active').iterator():
+            errors = BiddingService.verify_order_book(product)
+            if errors:
+                inconsistent += 1
+                self.stdout.write(self.style.WARNING(f'{product.product_id}: {"; ".join(errors)}'))
+        if inconsistent:
+            self.stdout.write(self.style.ERROR(f'{inconsistent} order books were inconsistent and have been reloaded'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All order books are consistent'))
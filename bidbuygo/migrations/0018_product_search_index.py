@@ -0,0 +1,87 @@
+from django.db import migrations
+
+# The index as first shipped. The SQL is copied here rather than taken from
+# bidbuygo.services.search_service, so that later changes to the app cannot
+# change what this migration does (0029 drops the PostgreSQL foreign key).
+CREATE = {
+    'sqlite': [
+        """
+        CREATE TABLE IF NOT EXISTS "PRODUCT_SEARCH_KEY" (
+            id INTEGER PRIMARY KEY,
+            product_id VARCHAR(25) NOT NULL UNIQUE
+        )
+        """,
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS "PRODUCT_SEARCH" USING fts5(
+            product_name,
+            description,
+            category,
+            product_condition,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        )
+        """,
+        'DELETE FROM "PRODUCT_SEARCH"',
+        'DELETE FROM "PRODUCT_SEARCH_KEY"',
+        'INSERT INTO "PRODUCT_SEARCH_KEY" (product_id) SELECT product_id FROM "PRODUCT"',
+        """
+        INSERT INTO "PRODUCT_SEARCH"
+            (rowid, product_name, description, category, product_condition)
+        SELECT k.id, p.product_name, COALESCE(p.description, ''),
+               COALESCE(c.name, ''), COALESCE(p.product_condition, '')
+        FROM "PRODUCT" p
+        JOIN "PRODUCT_SEARCH_KEY" k ON k.product_id = p.product_id
+        LEFT JOIN "CATEGORY" c ON c.id = p.category_id
+        """,
+        'INSERT INTO "PRODUCT_SEARCH"("PRODUCT_SEARCH") VALUES (\'optimize\')',
+    ],
+    'postgresql': [
+        """
+        CREATE TABLE IF NOT EXISTS "PRODUCT_SEARCH" (
+            product_id VARCHAR(25) PRIMARY KEY
+                REFERENCES "PRODUCT" (product_id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED,
+            document TSVECTOR NOT NULL
+        )
+        """,
+        'CREATE INDEX IF NOT EXISTS "PRODUCT_SEARCH_document_gin" ON "PRODUCT_SEARCH" USING GIN (document)',
+        'TRUNCATE "PRODUCT_SEARCH"',
+        """
+        INSERT INTO "PRODUCT_SEARCH" (product_id, document)
+        SELECT p.product_id,
+               setweight(to_tsvector('english', COALESCE(p.product_name, '')), 'A') ||
+               setweight(to_tsvector('english', COALESCE(p.description, '')), 'B') ||
+               setweight(to_tsvector('english', COALESCE(c.name, '') || ' ' ||
+                                                COALESCE(p.product_condition, '')), 'C')
+        FROM "PRODUCT" p
+        LEFT JOIN "CATEGORY" c ON c.id = p.category_id
+        """,
+        'ANALYZE "PRODUCT_SEARCH"',
+    ],
+}
+
+DROP = {
+    'sqlite': ['DROP TABLE IF EXISTS "PRODUCT_SEARCH"', 'DROP TABLE IF EXISTS "PRODUCT_SEARCH_KEY"'],
+    'postgresql': ['DROP TABLE IF EXISTS "PRODUCT_SEARCH"'],
+}
+
+
+def create_search_index(apps, schema_editor):
+    # Other engines search with a scan and need no index
+    for sql in CREATE.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    for sql in DROP.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0017_unverifieduser'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
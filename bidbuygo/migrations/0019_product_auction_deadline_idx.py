@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0018_product_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_type', 'auction_status', 'last_bid_time'], name='product_auction_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0019_product_auction_deadline_idx'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='product',
+            name='product_auction_deadline_idx',
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['product_type', 'auction_status', 'last_bid_time', 'product_id'], name='product_auction_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['product_name', 'product_id'], name='product_listing_idx'),
+        ),
+    ]
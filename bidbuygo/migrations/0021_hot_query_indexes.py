@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0020_product_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bidding',
+            index=models.Index(fields=['product', 'bid_status', 'bid_amt'], name='bidding_product_status_amt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['product_type', 'product_name', 'product_id'], name='product_type_listing_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'product_name', 'product_id'], name='product_category_listing_idx'),
+        ),
+    ]
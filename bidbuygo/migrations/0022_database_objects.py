@@ -0,0 +1,81 @@
+from django.db import migrations
+
+# The views as they were when this migration was written. The SQL is copied
+# here rather than taken from bidbuygo.db_functions, so that later changes to
+# the app cannot change what this migration does.
+VIEWS = {
+    'payment_processing': """
+        SELECT
+            o.id AS order_id,
+            o.status AS order_status,
+            o.payment_method,
+            t.payment_id,
+            t.amount,
+            t.status AS transaction_status
+        FROM "bidbuygo_order" o
+        LEFT JOIN "bidbuygo_transaction" t ON t.order_id = o.id
+    """,
+    'auction_management': """
+        SELECT
+            p.product_id,
+            p.auction_status,
+            p.last_bid_time,
+            b.bid_amt,
+            b.bid_status,
+            b.user_id
+        FROM "PRODUCT" p
+        LEFT JOIN "BIDDING" b ON b.product_id = p.product_id
+    """,
+    'inventory_management': """
+        SELECT
+            product_id,
+            quantity,
+            is_available,
+            quantity > 0 AS should_be_available
+        FROM "PRODUCT"
+    """,
+    'cart_totals': """
+        SELECT
+            c.id AS cart_id,
+            c.user_id,
+            COALESCE(SUM((p.price + COALESCE(ps.price_adjustment, 0)) * ci.quantity), 0) AS total_price
+        FROM "CART" c
+        LEFT JOIN "bidbuygo_cartitem" ci ON ci.cart_id = c.id
+        LEFT JOIN "PRODUCT" p ON p.product_id = ci.product_id
+        LEFT JOIN "PRODUCT_SIZE" ps ON ps.product_id = ci.product_id AND ps.size = ci.size
+        GROUP BY c.id, c.user_id
+    """,
+}
+
+# Created at process start by earlier versions of the app
+OBSOLETE_TRIGGERS = [
+    'update_quantity_after_payment',
+    'update_bid_info',
+    'check_auction_ending',
+    'update_order_status',
+]
+
+
+def create_database_objects(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for name in OBSOLETE_TRIGGERS:
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {name}')
+    for name, sql in VIEWS.items():
+        schema_editor.execute(f'DROP VIEW IF EXISTS {name}')
+        schema_editor.execute(f'CREATE VIEW {name} AS {sql}')
+
+
+def drop_database_objects(apps, schema_editor):
+    for name in VIEWS:
+        schema_editor.execute(f'DROP VIEW IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0021_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_database_objects, drop_database_objects),
+    ]
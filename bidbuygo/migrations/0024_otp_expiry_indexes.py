@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0023_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['email'], name='otp_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='otp',
+            index=models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='unverifieduser',
+            index=models.Index(fields=['expires_at'], name='unverified_user_expires_idx'),
+        ),
+    ]
@@ -0,0 +1,141 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:26
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+# The views of 0022_database_objects, copied so that this migration does not
+# depend on the app's current SQL
+VIEWS = {
+    'payment_processing': """
+        SELECT
+            o.id AS order_id,
+            o.status AS order_status,
+            o.payment_method,
+            t.payment_id,
+            t.amount,
+            t.status AS transaction_status
+        FROM "bidbuygo_order" o
+        LEFT JOIN "bidbuygo_transaction" t ON t.order_id = o.id
+    """,
+    'auction_management': """
+        SELECT
+            p.product_id,
+            p.auction_status,
+            p.last_bid_time,
+            b.bid_amt,
+            b.bid_status,
+            b.user_id
+        FROM "PRODUCT" p
+        LEFT JOIN "BIDDING" b ON b.product_id = p.product_id
+    """,
+    'inventory_management': """
+        SELECT
+            product_id,
+            quantity,
+            is_available,
+            quantity > 0 AS should_be_available
+        FROM "PRODUCT"
+    """,
+    'cart_totals': """
+        SELECT
+            c.id AS cart_id,
+            c.user_id,
+            COALESCE(SUM((p.price + COALESCE(ps.price_adjustment, 0)) * ci.quantity), 0) AS total_price
+        FROM "CART" c
+        LEFT JOIN "bidbuygo_cartitem" ci ON ci.cart_id = c.id
+        LEFT JOIN "PRODUCT" p ON p.product_id = ci.product_id
+        LEFT JOIN "PRODUCT_SIZE" ps ON ps.product_id = ci.product_id AND ps.size = ci.size
+        GROUP BY c.id, c.user_id
+    """,
+}
+
+
+def create_database_objects(apps, schema_editor):
+    for name, sql in VIEWS.items():
+        schema_editor.execute(f'DROP VIEW IF EXISTS {name}')
+        schema_editor.execute(f'CREATE VIEW {name} AS {sql}')
+
+
+def drop_database_objects(apps, schema_editor):
+    for name in VIEWS:
+        schema_editor.execute(f'DROP VIEW IF EXISTS {name}')
+
+
+def backfill_rating_aggregates(apps, schema_editor):
+    Product = apps.get_model('bidbuygo', 'Product')
+    ProductReview = apps.get_model('bidbuygo', 'ProductReview')
+    db = schema_editor.connection.alias
+    histograms = defaultdict(dict)
+    rows = ProductReview.objects.using(db).order_by().values_list('product_id', 'rating').annotate(reviews=Count('id'))
+    for product_id, rating, reviews in rows:
+        histograms[product_id][rating] = reviews
+    for product_id, histogram in histograms.items():
+        count = sum(histogram.values())
+        total = sum(rating * reviews for rating, reviews in histogram.items())
+        Product.objects.using(db).filter(pk=product_id).update(
+            rating_count=count,
+            rating_sum=total,
+            rating_average=total / count,
+            **{f'rating_{rating}_count': reviews for rating, reviews in histogram.items()}
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0025_review_pagination_index'),
+    ]
+
+    operations = [
+        # SQLite adds columns by rebuilding PRODUCT, which the views read
+        migrations.RunPython(drop_database_objects, create_database_objects),
+        migrations.AddField(
+            model_name='product',
+            name='rating_1_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_2_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_3_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_4_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_5_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_average',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='rating_sum',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['rating_average', 'rating_count', 'product_id'], name='product_rating_listing_idx'),
+        ),
+        migrations.RunPython(backfill_rating_aggregates, migrations.RunPython.noop),
+        migrations.RunPython(create_database_objects, drop_database_objects),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def drop_product_foreign_key(apps, schema_editor):
+    # PostgreSQL only: its search table referenced PRODUCT, so PRODUCT could
+    # not be truncated without it
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            'ALTER TABLE "PRODUCT_SEARCH" DROP CONSTRAINT IF EXISTS "PRODUCT_SEARCH_product_id_fkey"'
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0028_product_updated_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_product_foreign_key, migrations.RunPython.noop),
+    ]
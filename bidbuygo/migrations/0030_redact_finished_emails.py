@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+def redact_finished_emails(apps, schema_editor):
+    # The mail worker now clears the body of every email it finishes with
+    OutgoingEmail = apps.get_model('bidbuygo', 'OutgoingEmail')
+    OutgoingEmail.objects.using(schema_editor.connection.alias).filter(
+        status__in=['Sent', 'Failed']
+    ).exclude(body='').update(body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bidbuygo', '0029_product_search_without_fk'),
+    ]
+
+    operations = [
+        migrations.RunPython(redact_finished_emails, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.utils import timezone
+from django.utils.functional import cached_property
 import uuid
+from decimal import Decimal
 # Create your models here.
 
 class UserManager(BaseUserManager):
@@ -40,6 +42,10 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = "User"
         verbose_name_plural = "Users"
         db_table = 'USER'
+        indexes = [
+            # Recent registrations, scanned by check_email's filter sync
+            models.Index(fields=['date_joined'], name='user_date_joined_idx'),
+        ]
     
 class Seller(models.Model):
     seller_id = models.CharField(max_length=25,primary_key=True)
@@ -149,6 +155,8 @@ class Product(models.Model):
     review = models.TextField(blank=True, null=True)
     image = models.ImageField(upload_to='products', blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Also moved by changes to the product's sizes, reviews and bids, so it
+    # dates everything the product's pages show (their Last-Modified)
     updated_at = models.DateTimeField(auto_now=True)
     is_available = models.BooleanField(default=True)
     warranty_period = models.IntegerField(null=True, blank=True)  # in months
@@ -157,6 +165,16 @@ class Product(models.Model):
     current_bid = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)  # for auction items
     last_bid_time = models.DateTimeField(null=True, blank=True)  # for auction items
     auction_status = models.CharField(max_length=10, choices=[('Active', 'Active'), ('Ended', 'Ended')], default='Active')
+    # Review aggregates, updated with each review by ReviewService.record_rating
+    # (manage.py reconcile_ratings recomputes them)
+    rating_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_average = models.FloatField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
     
     def __str__(self):
         return self.product_name
@@ -165,6 +183,21 @@ class Product(models.Model):
         verbose_name = "Product"
         verbose_name_plural = "Products"
         db_table = 'PRODUCT'
+        indexes = [
+            # Auction scheduler (active auctions whose last bid moved recently)
+            # and the keyset-paginated auction listing
+            models.Index(fields=['product_type', 'auction_status', 'last_bid_time', 'product_id'], name='product_auction_listing_idx'),
+            # Keyset-paginated product listing (partial: the listing only
+            # shows available products)
+            models.Index(fields=['product_name', 'product_id'], condition=models.Q(is_available=True), name='product_listing_idx'),
+            # The same listing filtered by type or category
+            models.Index(fields=['product_type', 'product_name', 'product_id'], condition=models.Q(is_available=True), name='product_type_listing_idx'),
+            models.Index(fields=['category', 'product_name', 'product_id'], condition=models.Q(is_available=True), name='product_category_listing_idx'),
+            # The listing sorted by rating, best first
+            models.Index(fields=['rating_average', 'rating_count', 'product_id'], condition=models.Q(is_available=True), name='product_rating_listing_idx'),
+            # Latest change to any product, the listing's Last-Modified
+            models.Index(fields=['updated_at'], name='product_updated_idx'),
+        ]
 
 class Order(models.Model):
     STATUS_CHOICES = [
@@ -206,6 +239,10 @@ class Order(models.Model):
     class Meta:
         ordering = ['-created_at']
         db_table = 'bidbuygo_order'
+        indexes = [
+            # A user's order history, newest first
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+        ]
 
 class Delivery(models.Model):
     DELIVERY_STATUS_CHOICES = [
@@ -275,12 +312,11 @@ class Cart(models.Model):
     def __str__(self):
         return f"Cart for {self.user.email}"
 
-    @property
+    @cached_property
     def total_price(self):
-        cart_items = self.items.all()
-        if not cart_items.exists():
-            return 0
-        return sum(item.total_price for item in cart_items)
+        # One query per instance; pages price the cart with CartService.price_cart
+        from .services.cart_service import CartService
+        return CartService.cart_total(self)
 
     class Meta:
         verbose_name = "Cart"
@@ -301,12 +337,16 @@ class CartItem(models.Model):
     def __str__(self):
         return f"{self.quantity}x {self.product.product_name} (Size: {self.size})"
 
-    @property
+    @cached_property
     def total_price(self):
-        try:
-            return float(self.product.price) * self.quantity
-        except (TypeError, ValueError):
-            return 0
+        # Items priced by CartService.price_cart carry their line total; list
+        # a cart's items that way rather than costing a query per item here
+        if hasattr(self, 'line_total'):
+            return self.line_total
+        adjustment = ProductSize.objects.filter(
+            product_id=self.product_id, size=self.size
+        ).values_list('price_adjustment', flat=True).first() or Decimal('0.00')
+        return (self.product.price + adjustment) * self.quantity
 
 class Bidding(models.Model):
     BID_STATUS_CHOICES = [
@@ -334,6 +374,11 @@ class Bidding(models.Model):
         constraints = [
             models.CheckConstraint(check=models.Q(bid_amt__gte=models.F('initial_bid_amt')), name='chk_bid_amt')
         ]
+        indexes = [
+            # A product's pending bids by amount: proxy bidding, ending and
+            # settling auctions
+            models.Index(fields=['product', 'bid_status', 'bid_amt'], name='bidding_product_status_amt_idx'),
+        ]
         verbose_name = "Bidding"
         verbose_name_plural = "Bidding"
         db_table = 'BIDDING'
@@ -365,10 +410,29 @@ class ProductReview(models.Model):
         verbose_name = "Product Review"
         verbose_name_plural = "Product Reviews"
         db_table = 'PRODUCT_REVIEW'
+        indexes = [
+            # A product's reviews, newest first, paged by cursor
+            models.Index(fields=['product', 'created_at', 'id'], name='review_product_recent_idx'),
+            # The same, most helpful first
+            models.Index(fields=['product', 'helpful_votes', 'created_at', 'id'], name='review_product_helpful_idx'),
+        ]
 
     def __str__(self):
         return f"Review by {self.user.username} for {self.product.product_name}"
 
+class ReviewVote(models.Model):
+    """A user's "helpful" vote on a review; each user votes once per review"""
+    review = models.ForeignKey(ProductReview, on_delete=models.CASCADE, related_name='votes')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = (('review', 'user'),)
+        db_table = 'REVIEW_VOTE'
+
+    def __str__(self):
+        return f"Vote by {self.user_id} on review {self.review_id}"
+
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -475,6 +539,13 @@ class OTP(models.Model):
     def __str__(self):
         return f"{self.email} - {self.otp}"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['email'], name='otp_email_idx'),
+            # purge_expired_otps
+            models.Index(fields=['expires_at'], name='otp_expires_idx'),
+        ]
+
 class UnverifiedUser(models.Model):
     email = models.EmailField(unique=True)
     otp = models.CharField(max_length=6)
@@ -491,4 +562,42 @@ class UnverifiedUser(models.Model):
     class Meta:
         verbose_name = "Unverified User"
         verbose_name_plural = "Unverified Users"
-        db_table = 'UNVERIFIED_USER'
\ No newline at end of file
+        db_table = 'UNVERIFIED_USER'
+        indexes = [
+            # purge_expired_otps
+            models.Index(fields=['expires_at'], name='unverified_user_expires_idx'),
+        ]
+
+
+class OutgoingEmail(models.Model):
+    STATUS_CHOICES = [
+        ('Pending', 'Pending'),
+        ('Sent', 'Sent'),
+        ('Failed', 'Failed'),
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254, blank=True, null=True)
+    to = models.TextField(help_text='Comma-separated recipient addresses')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='Pending')
+    attempts = models.PositiveIntegerField(default=0)
+    # When a pending email may next be tried; also the lease of a worker
+    # that has claimed it
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    claimed_by = models.CharField(max_length=32, blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} to {self.to} ({self.status})"
+
+    class Meta:
+        verbose_name = "Outgoing Email"
+        verbose_name_plural = "Outgoing Emails"
+        db_table = 'EMAIL_OUTBOX'
+        indexes = [
+            # The mail worker's queue: pending emails that are due
+            models.Index(fields=['next_attempt_at', 'id'], condition=models.Q(status='Pending'), name='email_outbox_due_idx'),
+        ]
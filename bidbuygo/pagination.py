@@ -0,0 +1,232 @@
+"""Keyset (cursor) pagination for listings that are too large for OFFSET."""
+import hashlib
+from functools import reduce
+from operator import or_
+
+from django.core import signing
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import F, Q
+
+TOKEN_SALT = 'bidbuygo.pagination'
+
+# How long a listing's total count is reused before being recounted
+COUNT_CACHE_TIMEOUT = 5 * 60
+
+
+class KeysetPage:
+    """
+    One page of a keyset-paginated listing
+
+    Has the has_next/has_previous/has_other_pages interface of Django's Page,
+    with opaque next_token/previous_token instead of page numbers.
+    """
+
+    def __init__(self, object_list, paginator, next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    def has_next(self):
+        return self.next_token is not None
+
+    def has_previous(self):
+        return self.previous_token is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    @property
+    def total(self):
+        return self.paginator.total()
+
+    def as_dict(self):
+        """
+        Cursor metadata for JSON listing endpoints
+        """
+        return {'next': self.next_token, 'previous': self.previous_token}
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset by the values of its sort key instead of an offset
+
+    Each page is "the first per_page rows after (or before) this key", which
+    an index on the ordering columns answers without reading the skipped
+    rows, so page 5000 costs the same as page 1 and no COUNT(*) is needed.
+    The primary key is appended to the ordering to make it total.
+
+    Ascending fields sort NULLs first and descending fields NULLs last, on
+    every backend, so nullable sort keys paginate consistently.
+
+    Args:
+        queryset: Unordered queryset to paginate
+        ordering: Field or annotation names, '-' prefixed for descending
+        per_page: Rows per page
+    """
+
+    def __init__(self, queryset, ordering, per_page=12):
+        pk = queryset.model._meta.pk.name
+        ordering = list(ordering)
+        if pk not in [field.lstrip('-') for field in ordering]:
+            ordering.append(pk)
+        self.queryset = queryset
+        self.ordering = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        self.per_page = per_page
+
+    def field(self, name):
+        """
+        The model field a sort key is read from, or the output field of the
+        annotation of that name (such as a search rank)
+        """
+        annotation = self.queryset.query.annotations.get(name)
+        if annotation is not None:
+            return annotation.output_field
+        return self.queryset.model._meta.get_field(name)
+
+    def order_by(self, reverse=False):
+        terms = []
+        for name, descending in self.ordering:
+            # NULL placement is only spelled out where NULLs can occur, so
+            # plain indexes still match the ORDER BY
+            nullable = self.field(name).null
+            if descending != reverse:
+                terms.append(F(name).desc(nulls_last=True) if nullable else F(name).desc())
+            else:
+                terms.append(F(name).asc(nulls_first=True) if nullable else F(name).asc())
+        return terms
+
+    def after(self, key, reverse=False):
+        """
+        Filter for the rows strictly after key in the (possibly reversed)
+        ordering: (a > x) OR (a = x AND b > y) OR ..., plus a redundant bound
+        on the leading column so the index range starts at the key
+        """
+        branches = []
+        equal = Q()
+        bound = None
+        for position, ((name, descending), value) in enumerate(zip(self.ordering, key)):
+            nullable = self.field(name).null
+            if descending != reverse:
+                # Descending, NULLs last: smaller values, then NULLs
+                if value is None:
+                    beyond = None
+                else:
+                    beyond = Q(**{f'{name}__lt': value})
+                    if nullable:
+                        beyond |= Q(**{f'{name}__isnull': True})
+                    if position == 0 and not nullable:
+                        bound = Q(**{f'{name}__lte': value})
+            else:
+                # Ascending, NULLs first: NULLs, then larger values
+                if value is None:
+                    beyond = Q(**{f'{name}__isnull': False})
+                else:
+                    beyond = Q(**{f'{name}__gt': value})
+                    if position == 0:
+                        bound = Q(**{f'{name}__gte': value})
+            if beyond is not None:
+                branches.append(equal & beyond)
+            equal &= Q(**{f'{name}__isnull': True}) if value is None else Q(**{name: value})
+        if not branches:
+            return Q(pk__in=[])
+        condition = reduce(or_, branches)
+        return bound & condition if bound is not None else condition
+
+    def key_of(self, obj):
+        return [getattr(obj, name) for name, _ in self.ordering]
+
+    def encode(self, key, direction):
+        values = [value.isoformat() if hasattr(value, 'isoformat')
+                  else value if value is None or isinstance(value, (bool, int, str))
+                  else str(value)
+                  for value in key]
+        return signing.dumps([direction, values], salt=TOKEN_SALT, compress=True)
+
+    def decode(self, token):
+        """
+        Returns:
+            tuple: (direction, key), or (None, None) for a missing or bad token
+        """
+        if not token:
+            return None, None
+        try:
+            direction, values = signing.loads(token, salt=TOKEN_SALT)
+            key = [
+                None if value is None else self.field(name).to_python(value)
+                for (name, _), value in zip(self.ordering, values)
+            ]
+        except (signing.BadSignature, ValidationError, ValueError, TypeError):
+            # Includes genuine tokens of another listing, such as another sort
+            return None, None
+        if direction not in ('n', 'p') or len(key) != len(self.ordering):
+            return None, None
+        return direction, key
+
+    def page_queryset(self, key=None, reverse=False):
+        """
+        The query behind one page: per_page + 1 rows after key, so the extra
+        row tells whether another page follows
+        """
+        queryset = self.queryset.order_by(*self.order_by(reverse))
+        if key is not None:
+            queryset = queryset.filter(self.after(key, reverse))
+        return queryset[:self.per_page + 1]
+
+    def get_page(self, token=None):
+        """
+        Get the page a token points at (the first page for no token)
+        """
+        direction, key = self.decode(token)
+        reverse = direction == 'p'
+        rows = list(self.page_queryset(key, reverse))
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if reverse:
+            rows.reverse()
+
+        # Walking forwards there is a previous page whenever we started from
+        # a key; walking backwards there is always a next page
+        if reverse:
+            has_next, has_previous = True, more
+        else:
+            has_next, has_previous = more, key is not None
+
+        next_token = previous_token = None
+        if rows and has_next:
+            next_token = self.encode(self.key_of(rows[-1]), 'n')
+        if rows and has_previous:
+            previous_token = self.encode(self.key_of(rows[0]), 'p')
+        return KeysetPage(rows, self, next_token, previous_token)
+
+    def total(self, estimate=False):
+        """
+        Count the whole listing, cached for COUNT_CACHE_TIMEOUT
+
+        With estimate=True PostgreSQL returns the planner's row estimate
+        instead of counting; other backends always count.
+        """
+        sql, params = self.queryset.query.sql_with_params()
+        key = 'keyset_total:' + hashlib.md5(f'{sql}{params}'.encode()).hexdigest()
+        total = cache.get(key)
+        if total is None:
+            db = connections[self.queryset.db]
+            if estimate and db.vendor == 'postgresql':
+                with db.cursor() as cursor:
+                    cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+                    total = cursor.fetchone()[0][0]['Plan']['Plan Rows']
+            else:
+                total = self.queryset.count()
+            cache.set(key, total, COUNT_CACHE_TIMEOUT)
+        return total
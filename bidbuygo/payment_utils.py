@@ -1,23 +1,19 @@
-import razorpay
-from django.conf import settings
-from .models import Transaction, Orders
-import json
+from .models import Transaction, Order
+from .services.payment_gateways import get_gateway
 
 class PaymentManager:
     def __init__(self):
-        self.client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
+        # One Razorpay client per process, imported on first use
+        self.gateway = get_gateway('razorpay')
 
     def create_order(self, amount, currency="INR"):
         """Create a Razorpay Order"""
         try:
-            data = {
-                "amount": int(amount * 100),  # Razorpay expects amount in paisa
-                "currency": currency,
-                "receipt": f"receipt_{str(amount)}",
-                "payment_capture": 1  # Auto capture payment
-            }
-            order = self.client.order.create(data=data)
-            return order
+            return self.gateway.create_order(
+                int(amount * 100),  # Razorpay expects amount in paisa
+                currency,
+                receipt=f"receipt_{str(amount)}"
+            )
         except Exception as e:
             print(f"Error creating Razorpay order: {str(e)}")
             return None
@@ -25,11 +21,7 @@ class PaymentManager:
     def verify_payment(self, razorpay_order_id, razorpay_payment_id, razorpay_signature):
         """Verify Razorpay payment signature"""
         try:
-            return self.client.utility.verify_payment_signature({
-                'razorpay_order_id': razorpay_order_id,
-                'razorpay_payment_id': razorpay_payment_id,
-                'razorpay_signature': razorpay_signature
-            })
+            return self.gateway.verify_payment(razorpay_order_id, razorpay_payment_id, razorpay_signature)
         except Exception as e:
             print(f"Error verifying payment: {str(e)}")
             return False
@@ -37,7 +29,7 @@ class PaymentManager:
     def process_payment(self, order_id, payment_details):
         """Process payment and update transaction status"""
         try:
-            order = Orders.objects.get(order_id=order_id)
+            order = Order.objects.get(order_id=order_id)
             
             # Create or update transaction
             transaction, created = Transaction.objects.get_or_create(
@@ -75,17 +67,7 @@ class PaymentManager:
     def initiate_refund(self, payment_id, amount=None):
         """Initiate refund for a payment"""
         try:
-            if amount:
-                refund_data = {
-                    "amount": int(amount * 100),
-                    "speed": "normal"
-                }
-            else:
-                refund_data = {
-                    "speed": "normal"
-                }
-            
-            refund = self.client.payment.refund(payment_id, refund_data)
+            refund = self.gateway.refund(payment_id, int(amount * 100) if amount else None)
             return True, refund
         except Exception as e:
             print(f"Error initiating refund: {str(e)}")
@@ -0,0 +1,278 @@
+"""
+Per-request query counting, N+1 detection and query budgets
+
+QueryBudgetMiddleware records every query a request runs, with the view
+code and template line that caused it. It logs a request that runs more
+queries than its view's budget in QUERY_BUDGETS, and any query shape
+repeated REPEAT_THRESHOLD times or more (a loop querying once per row: an
+N+1). Configured by the QUERY_BUDGET setting; with ENFORCE on, an overrun
+raises QueryBudgetExceeded instead of only being logged.
+
+Tests use assert_query_budget, which applies the same checks to the
+queries run inside a block.
+"""
+import logging
+import re
+import sys
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.template.base import Node
+
+logger = logging.getLogger(__name__)
+
+# Most queries a request to each URL may run, by URL name: one count for
+# every method, or a count per method for views whose form submissions
+# write. Counts include the session and user lookups of a logged in
+# request (2) and a cold cart badge cache (1), and must not grow with the
+# number of rows shown.
+QUERY_BUDGETS = {
+    'bidbuygo:home': 3,
+    'bidbuygo:products': 4,
+    'bidbuygo:product_detail': 6,
+    'bidbuygo:product_reviews': 1,
+    'bidbuygo:auctions': 4,
+    # POST: the registered check, the code replaced in a savepoint (4) and
+    # the queued email
+    'bidbuygo:register_email': {'GET': 2, 'POST': 6},
+    'bidbuygo:verify_email': {'GET': 2, 'POST': 2},
+    # POST: the user INSERT, the code's removal, and login(): the session
+    # rotated and saved and last_login updated
+    'bidbuygo:set_password': {'GET': 1, 'POST': 11},
+    # POST: the user, then login() as for set_password
+    'bidbuygo:user_login': {'GET': 2, 'POST': 9},
+    'bidbuygo:user_logout': 4,
+    # Registered addresses only, plus the email filter's periodic sync
+    'bidbuygo:check_email': 2,
+    # get_or_create of the profile: SELECT, SAVEPOINT, INSERT, RELEASE
+    'bidbuygo:user_profile': 8,
+    'bidbuygo:edit_address': 3,
+    'bidbuygo:delete_address': 5,
+    'bidbuygo:order_list': 3,
+    'bidbuygo:order_detail': 4,
+    'bidbuygo:place_order': 3,
+    'bidbuygo:complete_payment': 2,
+    # get_or_create of the cart line, then the cart owner lookup
+    'bidbuygo:add_to_cart': 9,
+    'bidbuygo:cart': 4,
+    'bidbuygo:update_cart': 8,
+    'bidbuygo:remove_from_cart': 6,
+    'bidbuygo:checkout': 4,
+    'bidbuygo:order_success': 5,
+    'bidbuygo:place_bid': 4,
+    'bidbuygo:bid_success': 4,
+    'bidbuygo:auction_stream': 1,
+    # The validators' lookup, the product, and the order book on a cold start
+    'bidbuygo:get_auction_status': 3,
+    'bidbuygo:add_review': 5,
+    # The vote row, the count and the product's updated_at, in one transaction
+    'bidbuygo:vote_review': 8,
+    'bidbuygo:seller_dashboard': 2,
+    'bidbuygo:add_product': 2,
+    'bidbuygo:delivery_detail': 5,
+    'bidbuygo:update_delivery_status': 2,
+    'bidbuygo:send_otp': 5,
+    'bidbuygo:verify_otp': 1,
+    'bidbuygo:email_verification': 2,
+}
+
+REPEAT_THRESHOLD = 3
+
+APP_DIR = str(Path(__file__).resolve().parent)
+TEMPLATE_DIR = str(Path(django.__file__).resolve().parent / 'template')
+
+# Parameter lists and literals vary between runs of one query shape
+IN_LIST = re.compile(r'\((?:%s|\?)(?:,\s*(?:%s|\?))*\)')
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+TRANSACTION_STATEMENT = re.compile(r'^\s*(SAVEPOINT|RELEASE SAVEPOINT|ROLLBACK TO SAVEPOINT|BEGIN|COMMIT)\b', re.I)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def query_budget(view_name, method='GET'):
+    """
+    The budget of a request to the URL named view_name, or None when it has
+    none (for that method)
+    """
+    budget = QUERY_BUDGETS.get(view_name)
+    if isinstance(budget, dict):
+        # HEAD runs the GET view
+        return budget.get('GET' if method == 'HEAD' else method)
+    return budget
+
+
+def query_shape(sql):
+    """
+    The query with its parameter lists and literals replaced, so repeated
+    runs of one ORM call compare equal
+    """
+    return LITERAL.sub('?', IN_LIST.sub('(...)', sql))
+
+
+def query_origin():
+    """
+    Where the running query comes from: the innermost app code frame and
+    the innermost template node being rendered
+
+    Returns:
+        tuple: ('file.py:line in function' or None, 'template:line' or None)
+    """
+    code = template = None
+    frame = sys._getframe(2)
+    while frame is not None and (code is None or template is None):
+        filename = frame.f_code.co_filename
+        if template is None and filename.startswith(TEMPLATE_DIR):
+            node = frame.f_locals.get('self')
+            if isinstance(node, Node) and getattr(node, 'token', None) is not None:
+                template = f'{node.origin.template_name or node.origin.name}:{node.token.lineno}'
+        elif code is None and filename.startswith(APP_DIR) and filename != __file__:
+            code = f'{Path(filename).relative_to(APP_DIR)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return code, template
+
+
+@dataclass
+class RecordedQuery:
+    sql: str
+    shape: str
+    duration: float
+    code: str
+    template: str
+
+    @property
+    def origin(self):
+        return ', '.join(part for part in (self.template, self.code) if part) or 'unknown'
+
+
+class QueryRecorder:
+    """
+    Records the queries run on this thread's database connections while
+    recording() is active
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            code, template = query_origin()
+            self.queries.append(
+                RecordedQuery(sql, query_shape(sql), time.perf_counter() - started, code, template)
+            )
+
+    @contextmanager
+    def recording(self):
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(self))
+            yield self
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=REPEAT_THRESHOLD):
+        """
+        Query shapes run at least threshold times, most frequent first
+
+        Returns:
+            list: (shape, list of RecordedQuery) pairs
+        """
+        by_shape = defaultdict(list)
+        for query in self.queries:
+            if not TRANSACTION_STATEMENT.match(query.sql):
+                by_shape[query.shape].append(query)
+        return sorted(
+            ((shape, runs) for shape, runs in by_shape.items() if len(runs) >= threshold),
+            key=lambda item: -len(item[1])
+        )
+
+    def problems(self, budget=None, threshold=REPEAT_THRESHOLD):
+        """
+        Budget overrun and repeated query messages, empty when there are none
+        """
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append(f'{self.count} queries, over the budget of {budget}')
+        for shape, runs in self.repeated(threshold):
+            origins = sorted({query.origin for query in runs})
+            problems.append(
+                f'{len(runs)} runs of one query (N+1?) from {"; ".join(origins)}: {shape[:300]}'
+            )
+        return problems
+
+    def report(self):
+        """
+        Every recorded query with its time and origin, one per line
+        """
+        return '\n'.join(
+            f'{i:3d}. {query.duration * 1000:7.2f} ms  {query.origin}\n     {query.sql[:300]}'
+            for i, query in enumerate(self.queries, 1)
+        )
+
+
+@contextmanager
+def assert_query_budget(budget=None, view_name=None, threshold=REPEAT_THRESHOLD, method='GET'):
+    """
+    Fail when the block runs more than budget queries (by default the
+    budget of a method request to the URL named view_name) or repeats a
+    query shape threshold times
+
+    Yields:
+        QueryRecorder: The queries run so far
+    """
+    if budget is None and view_name is not None:
+        budget = query_budget(view_name, method)
+    recorder = QueryRecorder()
+    with recorder.recording():
+        yield recorder
+    problems = recorder.problems(budget, threshold)
+    if problems:
+        label = f'{view_name}: ' if view_name else ''
+        raise QueryBudgetExceeded(label + '\n'.join(problems) + '\n' + recorder.report())
+
+
+class QueryBudgetMiddleware:
+    """
+    Count each request's queries and report overruns and N+1s; list it
+    first in MIDDLEWARE so session and authentication queries count too
+
+    Queries run while a streaming response is iterated, after the view has
+    returned, are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        config = settings.QUERY_BUDGET
+        if not config.get('ENABLED'):
+            raise MiddlewareNotUsed
+        self.enforce = config.get('ENFORCE', False)
+        self.threshold = config.get('REPEAT_THRESHOLD', REPEAT_THRESHOLD)
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        with recorder.recording():
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        problems = recorder.problems(query_budget(view_name, request.method), self.threshold)
+        response['X-Query-Count'] = str(recorder.count)
+        if problems:
+            label = f'{request.method} {request.path} ({view_name or "unresolved"})'
+            logger.warning('%s: %s', label, '; '.join(problems))
+            if self.enforce:
+                raise QueryBudgetExceeded(f'{label}: ' + '\n'.join(problems) + '\n' + recorder.report())
+        return response
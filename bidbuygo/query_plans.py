@@ -0,0 +1,202 @@
+"""
+Registry of the hot query shapes and their execution plans
+
+Each registered function builds the queryset a hot path runs, with
+representative parameters. check_query_plans explains every one of them and
+fails when one has to read a whole table, so a dropped or mis-shaped index
+shows up before it reaches production.
+"""
+import json
+import re
+
+from django.db import connections, transaction
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Bidding, CartItem, Order, Product
+from .pagination import KeysetPaginator
+from .services.bidding_service import AUCTION_IDLE_TIMEOUT
+from .services.review_service import ReviewService
+
+HOT_QUERIES = {}
+
+# SQLite reports a table read without an index as "SCAN <table>"; index
+# scans ("SCAN <table> USING INDEX ...") stop at the LIMIT and are fine
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\S+)$')
+SQLITE_TEMP_SORT = 'USE TEMP B-TREE FOR ORDER BY'
+
+
+def hot_query(name):
+    """
+    Register a function returning the queryset behind a hot path
+    """
+    def register(func):
+        HOT_QUERIES[name] = func
+        return func
+    return register
+
+
+def explain(queryset, using='default'):
+    """
+    Explain a queryset on the given database
+
+    Returns:
+        tuple: (plan lines, tables read by full scan, whether the ORDER BY
+        needed a separate sort)
+    """
+    connection = connections[using]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            lines = [row[3] for row in cursor.fetchall()]
+        # Subqueries and window functions are materialised into derived
+        # tables that are always scanned; only real tables count
+        derived = {line.split(' ', 1)[1] for line in lines if line.startswith(('CO-ROUTINE ', 'MATERIALIZE '))}
+        full_scans = [
+            match.group(1) for match in map(SQLITE_FULL_SCAN.match, lines)
+            if match and match.group(1) not in derived and match.group(1) != 'CONSTANT'
+        ]
+        return lines, full_scans, SQLITE_TEMP_SORT in lines
+    if connection.vendor == 'postgresql':
+        # Small tables are cheaper to read sequentially, so ask the planner
+        # whether an index could be used at all
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        nodes = list(_plan_nodes(plan[0]['Plan']))
+        lines = [' '.join(filter(None, (node['Node Type'], node.get('Relation Name'), node.get('Index Name'))))
+                 for node in nodes]
+        full_scans = [node['Relation Name'] for node in nodes if node['Node Type'] == 'Seq Scan']
+        return lines, full_scans, any(node['Node Type'] == 'Sort' for node in nodes)
+    raise NotImplementedError(f'Query plans are not checked on {connection.vendor}')
+
+
+def _plan_nodes(node):
+    yield node
+    for child in node.get('Plans', ()):
+        yield from _plan_nodes(child)
+
+
+# The hot queries, mirroring views.py and the services
+
+def _listing_page(queryset, ordering, key):
+    # A page after a key exercises the range condition as well as the order
+    return KeysetPaginator(queryset, ordering).page_queryset(key)
+
+
+def _active_auctions():
+    return Product.objects.filter(product_type='auction', auction_status='Active', is_available=True)
+
+
+@hot_query('product_list')
+def product_list():
+    return _listing_page(Product.objects.filter(is_available=True), ['product_name'], ['m', 'P1'])
+
+
+@hot_query('product_list by type')
+def product_list_by_type():
+    return _listing_page(
+        Product.objects.filter(is_available=True, product_type='regular'), ['product_name'], ['m', 'P1']
+    )
+
+
+@hot_query('product_list by category')
+def product_list_by_category():
+    return _listing_page(
+        Product.objects.filter(is_available=True, category__name='Shirts'), ['product_name'], ['m', 'P1']
+    )
+
+
+@hot_query('product_list by rating')
+def product_list_by_rating():
+    return _listing_page(
+        Product.objects.filter(is_available=True), ['-rating_average', '-rating_count', '-product_id'], [4.5, 10, 'P1']
+    )
+
+
+@hot_query('auction_list ending soon')
+def auctions_ending_soon():
+    return _active_auctions().filter(
+        last_bid_time__lte=timezone.now() + timezone.timedelta(hours=24)
+    ).order_by('last_bid_time')
+
+
+@hot_query('auction_list others')
+def other_auctions():
+    soon = timezone.now() + timezone.timedelta(hours=24)
+    return _listing_page(
+        _active_auctions().exclude(last_bid_time__lte=soon), ['last_bid_time'], [soon, 'P1']
+    )
+
+
+@hot_query('expired auctions')
+def expired_auctions():
+    return Product.objects.filter(
+        product_type='auction',
+        auction_status='Active',
+        last_bid_time__lt=timezone.now() - AUCTION_IDLE_TIMEOUT
+    )
+
+
+@hot_query('proxy bids')
+def proxy_bids():
+    return Bidding.objects.filter(
+        product_id='P1', is_auto_bid=True, bid_status='Pending', auto_bid_limit__gt=100
+    ).values_list('user_id', 'auto_bid_limit', 'bid_time')
+
+
+@hot_query('bid history')
+def bid_history():
+    return Bidding.objects.filter(product_id='P1').order_by('-bid_amt')
+
+
+@hot_query('settle pending bids')
+def pending_bids():
+    return Bidding.objects.filter(product_id__in=['P1', 'P2'], bid_status='Pending')
+
+
+@hot_query('settlement winners')
+def settlement_winners():
+    return Bidding.objects.filter(product_id__in=['P1', 'P2'], bid_status='Pending').annotate(
+        position=Window(
+            RowNumber(),
+            partition_by=[F('product_id')],
+            order_by=[F('bid_amt').desc(), F('bid_time').asc(), F('id').asc()]
+        )
+    ).filter(position=1).values_list('id', 'product_id', 'user_id', 'bid_amt')
+
+
+@hot_query('product reviews')
+def product_reviews():
+    return ReviewService.paginator('P1').page_queryset([timezone.now(), 1000])
+
+
+@hot_query('most helpful reviews')
+def most_helpful_reviews():
+    return ReviewService.paginator('P1', order='helpful').page_queryset([12, timezone.now(), 1000])
+
+
+@hot_query('latest catalog change')
+def latest_catalog_change():
+    # The listing's validators, run on every anonymous revalidation
+    return Product.objects.order_by('-updated_at').values_list('updated_at', flat=True)[:1]
+
+
+@hot_query('user orders')
+def user_orders():
+    return Order.objects.filter(user_id=1).order_by('-created_at')
+
+
+@hot_query('cart items')
+def cart_items():
+    return CartItem.objects.filter(cart_id=1)
+
+
+@hot_query('cart count')
+def cart_count():
+    return CartItem.objects.filter(cart__user_id=1)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# Events a slow watcher may fall behind by before the oldest are dropped
+WATCHER_QUEUE_SIZE = 100
+
+
+class LocalBroker:
+    """
+    In-process fan-out of auction events to every connected watcher
+
+    Watchers are asyncio queues owned by the event loop that serves their
+    stream. Publishing happens from the synchronous bidding code, so each
+    event is handed to each loop once with call_soon_threadsafe and that loop
+    copies it into all of its queues; the cost of a bid does not depend on
+    how many people are watching.
+    """
+
+    def __init__(self, **options):
+        self.lock = threading.Lock()
+        # product_id -> loop -> set of queues
+        self.watchers = defaultdict(lambda: defaultdict(set))
+
+    def subscribe(self, product_id):
+        """
+        Register a watcher on the running event loop
+
+        Returns:
+            asyncio.Queue: Receives the product's events as dicts
+        """
+        queue = asyncio.Queue(maxsize=WATCHER_QUEUE_SIZE)
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            self.watchers[product_id][loop].add(queue)
+        return queue
+
+    def unsubscribe(self, product_id, queue):
+        with self.lock:
+            loops = self.watchers.get(product_id)
+            if loops is None:
+                return
+            for loop, queues in list(loops.items()):
+                queues.discard(queue)
+                if not queues:
+                    del loops[loop]
+            if not loops:
+                del self.watchers[product_id]
+
+    def watcher_count(self, product_id):
+        with self.lock:
+            return sum(len(queues) for queues in self.watchers.get(product_id, {}).values())
+
+    def publish(self, product_id, event):
+        self.deliver(product_id, event)
+
+    def deliver(self, product_id, event):
+        """
+        Fan an event out to the watchers in this process
+        """
+        with self.lock:
+            targets = [(loop, list(queues)) for loop, queues in self.watchers.get(product_id, {}).items()]
+        for loop, queues in targets:
+            try:
+                loop.call_soon_threadsafe(_fan_out, queues, event)
+            except RuntimeError:
+                # The loop has shut down; its watchers are gone
+                pass
+
+
+def _fan_out(queues, event):
+    for queue in queues:
+        if queue.full():
+            # Drop the oldest event rather than block the publisher
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+class RedisBroker(LocalBroker):
+    """
+    Shares events between worker processes through Redis pub/sub
+
+    Every process publishes to Redis and a background thread per process
+    relays what it receives to the local watchers, so each event still
+    crosses the network once per process rather than once per watcher.
+    Requires the redis package.
+    """
+
+    CHANNEL_PREFIX = 'bidbuygo:auction:'
+
+    def __init__(self, url='redis://localhost:6379/0', **options):
+        super().__init__(**options)
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured('RedisBroker requires the redis package')
+        self.client = redis.Redis.from_url(url)
+        self.listener = None
+        self.listener_lock = threading.Lock()
+
+    def subscribe(self, product_id):
+        self.start_listener()
+        return super().subscribe(product_id)
+
+    def publish(self, product_id, event):
+        self.client.publish(self.CHANNEL_PREFIX + str(product_id), json.dumps(event, default=str))
+
+    def start_listener(self):
+        with self.listener_lock:
+            if self.listener is None or not self.listener.is_alive():
+                self.listener = threading.Thread(target=self.listen, name='auction-events', daemon=True)
+                self.listener.start()
+
+    def listen(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.psubscribe(self.CHANNEL_PREFIX + '*')
+        for message in pubsub.listen():
+            try:
+                product_id = message['channel'].decode()[len(self.CHANNEL_PREFIX):]
+                self.deliver(product_id, json.loads(message['data']))
+            except Exception:
+                logger.exception('Bad auction event from Redis')
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    """
+    Get the process-wide broker configured by AUCTION_EVENTS_BACKEND
+    """
+    global _broker
+    if _broker is None:
+        with _broker_lock:
+            if _broker is None:
+                backend = import_string(settings.AUCTION_EVENTS_BACKEND)
+                _broker = backend(**settings.AUCTION_EVENTS_OPTIONS)
+    return _broker
+
+
+def publish(product_id, kind, **data):
+    """
+    Send an event to everyone watching a product
+
+    Never raises: a broker failure must not fail the bid that caused it.
+    """
+    try:
+        get_broker().publish(product_id, {'event': kind, 'product_id': product_id, **data})
+    except Exception:
+        logger.exception('Could not publish %s event for %s', kind, product_id)
+
+
+def format_sse(event):
+    """
+    Encode an event dict as a Server-Sent Events message
+    """
+    return f"event: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
@@ -0,0 +1,159 @@
+import heapq
+import logging
+import time
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from ..models import Product
+from .bidding_service import BiddingService, AUCTION_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+
+class AuctionScheduler:
+    """
+    Ends auctions exactly when they expire using a min-heap of deadlines
+
+    An auction's deadline is its last_bid_time plus AUCTION_IDLE_TIMEOUT.
+    The heap is filled once at startup; after that each tick only reads the
+    auctions whose last_bid_time moved since the previous tick (new bids push
+    a later deadline, the old heap entry is skipped when popped) and the
+    auctions that are actually due, so the work per tick does not grow with
+    the number of running auctions.
+    """
+
+    def __init__(self, poll_interval=5.0, overlap=timedelta(seconds=5), batch_size=500):
+        self.poll_interval = poll_interval
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.heap = []
+        self.deadlines = {}
+        self.watermark = None
+
+    def active_auctions(self):
+        return Product.objects.filter(
+            product_type='auction',
+            auction_status='Active',
+            last_bid_time__isnull=False
+        )
+
+    def schedule(self, product_id, last_bid_time):
+        """
+        Record the deadline implied by last_bid_time, replacing any older one
+        """
+        deadline = last_bid_time + AUCTION_IDLE_TIMEOUT
+        if self.deadlines.get(product_id) == deadline:
+            return
+        self.deadlines[product_id] = deadline
+        heapq.heappush(self.heap, (deadline, product_id))
+        if self.watermark is None or last_bid_time > self.watermark:
+            self.watermark = last_bid_time
+
+    def load(self):
+        """
+        Fill the heap from every running auction (once, at startup)
+        """
+        rows = self.active_auctions().values_list('product_id', 'last_bid_time')
+        for product_id, last_bid_time in rows.iterator(chunk_size=5000):
+            self.deadlines[product_id] = last_bid_time + AUCTION_IDLE_TIMEOUT
+            if self.watermark is None or last_bid_time > self.watermark:
+                self.watermark = last_bid_time
+        self.heap = [(deadline, product_id) for product_id, deadline in self.deadlines.items()]
+        heapq.heapify(self.heap)
+        return len(self.deadlines)
+
+    def poll(self):
+        """
+        Pick up auctions whose last bid changed since the previous poll
+
+        The window overlaps the previous one so that a bid committed slightly
+        after a later one is not missed; already known deadlines are ignored.
+        """
+        changed = self.active_auctions()
+        if self.watermark is not None:
+            changed = changed.filter(last_bid_time__gte=self.watermark - self.overlap)
+        for product_id, last_bid_time in changed.values_list('product_id', 'last_bid_time'):
+            self.schedule(product_id, last_bid_time)
+
+    def pop_due(self, now):
+        """
+        Pop the ids of auctions whose current deadline has passed
+
+        Their deadlines are forgotten with them; end_due schedules again the
+        ones that turn out to have been extended.
+        """
+        due = []
+        while self.heap and self.heap[0][0] <= now and len(due) < self.batch_size:
+            deadline, product_id = heapq.heappop(self.heap)
+            if self.deadlines.get(product_id) == deadline:
+                del self.deadlines[product_id]
+                due.append(product_id)
+        # Superseded entries are skipped lazily; compact when they dominate
+        if len(self.heap) > 2 * len(self.deadlines) + 1000:
+            self.heap = [(deadline, product_id) for product_id, deadline in self.deadlines.items()]
+            heapq.heapify(self.heap)
+        return due
+
+    def end_due(self, product_ids, now):
+        """
+        End the due auctions, re-checking each one against the database
+        """
+        expired = []
+        rows = self.active_auctions().filter(pk__in=product_ids).values_list('pk', 'last_bid_time')
+        for product_id, last_bid_time in rows:
+            if last_bid_time + AUCTION_IDLE_TIMEOUT > now:
+                # A bid landed after the last poll; wait for the new deadline
+                self.schedule(product_id, last_bid_time)
+            else:
+                expired.append(product_id)
+        if not expired:
+            return 0
+
+        # The deadline condition is repeated so a bid racing this tick keeps
+        # its auction open; the next poll picks up the new deadline.
+        return len(BiddingService.end_auctions(Product.objects.filter(
+            pk__in=expired,
+            last_bid_time__lte=now - AUCTION_IDLE_TIMEOUT
+        )))
+
+    def tick(self, now=None):
+        """
+        Run one scheduling step
+
+        Returns:
+            int: Number of auctions ended
+        """
+        self.poll()
+        now = now or timezone.now()
+        ended = 0
+        while True:
+            due = self.pop_due(now)
+            if not due:
+                break
+            ended += self.end_due(due, now)
+        return ended
+
+    def seconds_until_next(self, now=None):
+        now = now or timezone.now()
+        if not self.heap:
+            return self.poll_interval
+        wait = (self.heap[0][0] - now).total_seconds()
+        return max(0.0, min(wait, self.poll_interval))
+
+    def run_forever(self, stop=lambda: False):
+        """
+        Tick until stop() is true, sleeping until the next deadline or poll
+
+        Call load() first.
+        """
+        while not stop():
+            close_old_connections()
+            try:
+                ended = self.tick()
+                if ended:
+                    logger.info('Ended %d auctions', ended)
+            except Exception:
+                logger.exception('Auction scheduler tick failed')
+            time.sleep(self.seconds_until_next())
@@ -1,38 +1,125 @@
+import logging
+import random
+import time
 from django.utils import timezone
-from django.db import transaction
+from django.db import connection, transaction, OperationalError
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from django.core.exceptions import ValidationError
 from decimal import Decimal
-from ..models import Product, Bidding
+from ..models import Product, Bidding, User
+from . import auction_events, page_cache
+from .order_book import order_books
+from .proxy_bidding import resolve_proxy_bids
 from datetime import timedelta
 
+logger = logging.getLogger(__name__)
+
+# A new bid must beat the current one by at least this much
+MIN_BID_INCREMENT = Decimal('1.00')
+
+# Attempts and base backoff (seconds) when a bid hits a transient lock error
+MAX_BID_RETRIES = 5
+BID_RETRY_BACKOFF = 0.005
+
+# An auction ends once this long has passed without a new bid
+AUCTION_IDLE_TIMEOUT = timedelta(hours=24)
+
+# Auctions settled per transaction by end_auctions (keeps IN lists well
+# below SQLite's bound-parameter limit)
+SETTLEMENT_BATCH_SIZE = 5000
+
 class BiddingService:
     @staticmethod
-    def place_bid(user, product, bid_amount, auto_bid_limit=None):
+    def place_bid(user, product, bid_amount, auto_bid_limit=None, min_increment=MIN_BID_INCREMENT):
         """
         Place a bid on a product
+
+        The lead is taken with a conditional UPDATE on the product row
+        (compare-and-set on current_bid), so of any number of concurrent
+        bidders only strictly higher bids win, and only current_bid,
+        last_bid_time and updated_at are written. Transient lock errors are
+        retried with backoff; the retry count is stored on the returned bid
+        as ``retries``.
+
+        Args:
+            user: The user placing the bid
+            product: The auction product (current_bid may be stale)
+            bid_amount: The amount of the bid
+            auto_bid_limit: Maximum amount for auto-bidding
+            min_increment: How much a bid must beat the current bid by
+
+        Raises:
+            ValidationError: If the bid is invalid or was outbid
         """
+        # Validate product is available for bidding
+        if product.product_type != 'auction':
+            raise ValidationError("This product is not available for auction")
+
+        # Check if auction has already ended
+        if product.auction_status == 'Ended':
+            raise ValidationError("This auction has already ended")
+
+        if auto_bid_limit is not None and auto_bid_limit < bid_amount:
+            raise ValidationError("Auto-bid limit cannot be lower than the bid")
+
+        # Reject bids that are already too low without taking any lock
+        min_bid = BiddingService.minimum_bid(product, min_increment)
+        if bid_amount < min_bid:
+            raise ValidationError(f"Bid must be at least {min_bid}")
+
+        retries = 0
+        while True:
+            try:
+                bid = BiddingService._place_bid_once(
+                    user, product, bid_amount, auto_bid_limit, min_increment, min_bid
+                )
+            except OperationalError:
+                # Retrying inside a caller's transaction is not possible
+                if retries >= MAX_BID_RETRIES or connection.in_atomic_block:
+                    raise
+                retries += 1
+                time.sleep(random.uniform(0, BID_RETRY_BACKOFF * 2 ** retries))
+                continue
+            if retries:
+                logger.info('Bid on %s placed after %d retries', product.pk, retries)
+            bid.retries = retries
+            return bid
+
+    @staticmethod
+    def minimum_bid(product, min_increment=MIN_BID_INCREMENT):
+        """
+        Get the lowest acceptable bid given the product's current bid
+        """
+        if product.current_bid is None:
+            return product.price
+        return product.current_bid + min_increment
+
+    @staticmethod
+    def _place_bid_once(user, product, bid_amount, auto_bid_limit, min_increment, min_bid):
         with transaction.atomic():
-            # Validate product is available for bidding
-            if product.product_type != 'Auction':
-                raise ValidationError("This product is not available for auction")
-            
-            # Check if auction has already ended
-            if product.auction_status == 'Ended':
-                raise ValidationError("This auction has already ended")
-
-            # Get current highest bid
-            current_highest_bid = Bidding.objects.filter(
-                product=product,
-                bid_status='Pending'
-            ).order_by('-bid_amt').first()
+            now = timezone.now()
 
-            # Validate bid amount
-            min_bid = product.current_bid or product.price
-            if current_highest_bid:
-                min_bid = current_highest_bid.bid_amt + Decimal('1.00')  # Minimum increment
+            # Take the lead only if nobody got there first. The UPDATE is the
+            # first statement so the write lock is requested up front (on
+            # SQLite, BEGIN IMMEDIATE has already taken it).
+            won = Product.objects.filter(
+                pk=product.pk,
+                auction_status='Active',
+                price__lte=bid_amount
+            ).filter(
+                Q(current_bid__isnull=True) | Q(current_bid__lte=bid_amount - min_increment)
+            ).update(current_bid=bid_amount, last_bid_time=now, updated_at=now)
 
-            if bid_amount < min_bid:
-                raise ValidationError(f"Bid must be at least {min_bid}")
+            if not won:
+                product.refresh_from_db(fields=['current_bid', 'last_bid_time', 'auction_status'])
+                if product.auction_status == 'Ended':
+                    raise ValidationError("This auction has already ended")
+                raise ValidationError(
+                    f"Bid must be at least {BiddingService.minimum_bid(product, min_increment)}"
+                )
+
+            book = order_books.get(product)
 
             # Create new bid
             bid = Bidding.objects.create(
@@ -43,62 +130,104 @@ class BiddingService:
                 is_auto_bid=bool(auto_bid_limit),
                 auto_bid_limit=auto_bid_limit,
                 bid_status='Pending',
-                bid_time=timezone.now()
+                bid_time=now
             )
+            transaction.on_commit(lambda: book.add(bid))
 
-            # Update product's current bid and last bid time
+            # Mirror the columns written above on the caller's instance
             product.current_bid = bid_amount
-            product.last_bid_time = timezone.now()
-            product.save()
+            product.last_bid_time = now
+
+            # Standing proxy bids answer every bid, manual or not
+            BiddingService._process_auto_bids(product, bid, book, min_increment)
 
-            # If auto-bidding is enabled, process auto-bids
-            if auto_bid_limit:
-                BiddingService._process_auto_bids(product)
+            # Registered last so watchers see the book after every add
+            transaction.on_commit(lambda: BiddingService._publish_bid(product, book))
 
             return bid
 
     @staticmethod
-    def _process_auto_bids(product):
+    def _publish_bid(product, book):
         """
-        Process auto-bids for a product
+        Tell watchers about a committed bid and the deadline it pushed back
         """
-        auto_bids = Bidding.objects.filter(
-            product=product,
-            is_auto_bid=True,
-            bid_status='Pending'
-        ).exclude(
-            auto_bid_limit__lte=product.current_bid
-        ).order_by('-auto_bid_limit', 'bid_time')
-
-        if len(auto_bids) < 2:
-            return
-
-        # Get the two highest auto-bids
-        highest_auto_bid = auto_bids[0]
-        second_highest_auto_bid = auto_bids[1]
-
-        # Calculate the winning bid amount
-        winning_bid_amount = min(
-            second_highest_auto_bid.auto_bid_limit + Decimal('1.00'),
-            highest_auto_bid.auto_bid_limit
+        ends_at = product.last_bid_time + AUCTION_IDLE_TIMEOUT
+        auction_events.publish(
+            product.pk, 'bid',
+            current_bid=str(product.current_bid),
+            total_bids=book.bid_count,
+            last_bid_time=product.last_bid_time.isoformat()
         )
+        auction_events.publish(product.pk, 'extended', ends_at=ends_at.isoformat())
+
+    @staticmethod
+    def _process_auto_bids(product, leader_bid, book, min_increment=MIN_BID_INCREMENT):
+        """
+        Let the product's proxy (auto) bids answer the bid just placed
 
-        # Create new bid for the winner
-        Bidding.objects.create(
-            user=highest_auto_bid.user,
+        Every active auto_bid_limit is read in one query and the war between
+        them is resolved in a single pass (see resolve_proxy_bids), so at
+        most two Bidding rows are written: the runner-up's final bid and the
+        leader's. The leader's own row is raised in place rather than
+        duplicated, as is the committing row of a proxy that wins a tie with
+        leader_bid, so it keeps the earlier bid_time that ranks it first.
+        Must run inside the transaction that placed leader_bid.
+
+        Returns:
+            list: The bids created
+        """
+        proxies = Bidding.objects.filter(
             product=product,
-            bid_amt=winning_bid_amount,
-            initial_bid_amt=product.current_bid,
             is_auto_bid=True,
-            auto_bid_limit=highest_auto_bid.auto_bid_limit,
             bid_status='Pending',
-            bid_time=timezone.now()
+            auto_bid_limit__gte=product.current_bid
+        ).values_list('user_id', 'auto_bid_limit', 'bid_time')
+
+        outcome = resolve_proxy_bids(
+            product.current_bid, leader_bid.user_id, leader_bid.bid_time, proxies, min_increment
         )
+        if outcome is None:
+            return []
+
+        now = timezone.now()
+        users = User.objects.in_bulk(
+            [user_id for user_id, _, _ in outcome.bids if user_id != leader_bid.user_id]
+        )
+        created = []
+        for user_id, amount, limit in outcome.bids:
+            if user_id == leader_bid.user_id:
+                leader_bid.bid_amt = amount
+                leader_bid.save(update_fields=['bid_amt'])
+                continue
+            if amount == product.current_bid:
+                # An earlier proxy ties the bid just placed and keeps the
+                # lead; a new row would rank after that bid on bid_time
+                Bidding.objects.filter(product=product, user_id=user_id, bid_time=outcome.placed_at).update(
+                    bid_amt=amount, auto_bid_limit=limit
+                )
+                # The book holds the row at its old amount
+                transaction.on_commit(lambda: order_books.discard(product.pk))
+                continue
+            bid = Bidding.objects.create(
+                user=users[user_id],
+                product=product,
+                bid_amt=amount,
+                initial_bid_amt=product.current_bid,
+                is_auto_bid=True,
+                auto_bid_limit=limit,
+                bid_status='Pending',
+                bid_time=now
+            )
+            transaction.on_commit(lambda bid=bid: book.add(bid))
+            created.append(bid)
 
-        # Update product's current bid and last bid time
-        product.current_bid = winning_bid_amount
-        product.last_bid_time = timezone.now()
-        product.save()
+        # The row is already locked by the UPDATE in _place_bid_once
+        Product.objects.filter(pk=product.pk).update(
+            current_bid=outcome.price, last_bid_time=now, updated_at=now
+        )
+        product.current_bid = outcome.price
+        product.last_bid_time = now
+        return created
 
     @staticmethod
     def check_and_end_auctions():
@@ -106,82 +235,153 @@ class BiddingService:
         Check all active auctions and end those that haven't received bids in 24 hours
         """
         now = timezone.now()
-        active_auctions = Product.objects.filter(
-            product_type='Auction',
-            auction_status='Active'
+        expired_auctions = Product.objects.filter(
+            product_type='auction',
+            auction_status='Active',
+            last_bid_time__lt=now - AUCTION_IDLE_TIMEOUT
         )
 
-        for product in active_auctions:
-            if product.last_bid_time and (now - product.last_bid_time) > timedelta(hours=24):
-                BiddingService.end_auction(product)
+        return BiddingService.end_auctions(expired_auctions)
 
     @staticmethod
     def end_auction(product):
         """
         End an auction and determine the winner
+
+        Settled by end_auctions, so a single auction gets the same locking,
+        Active re-check and winner query as a batch of them.
+
+        Returns:
+            Bidding: The winning bid, or None if the auction had no bids
+
+        Raises:
+            ValidationError: If the product is not an auction or has already ended
         """
-        with transaction.atomic():
-            if product.product_type != 'Auction':
-                raise ValidationError("This product is not an auction item")
+        if product.product_type != 'auction':
+            raise ValidationError("This product is not an auction item")
 
-            # Get the highest bid
-            winning_bid = Bidding.objects.filter(
-                product=product,
-                bid_status='Pending'
-            ).order_by('-bid_amt').first()
-
-            if winning_bid:
-                # Mark the winning bid
-                winning_bid.bid_status = 'Won'
-                winning_bid.is_winner = True
-                winning_bid.save()
-
-                # Mark all other bids as lost
-                Bidding.objects.filter(
-                    product=product,
-                    bid_status='Pending'
-                ).exclude(id=winning_bid.id).update(
-                    bid_status='Lost'
+        results = BiddingService.end_auctions(Product.objects.filter(pk=product.pk))
+        if product.pk not in results:
+            raise ValidationError("This auction has already ended")
+
+        product.auction_status = 'Ended'
+        winner = results[product.pk]
+        return Bidding.objects.get(pk=winner['bid_id']) if winner else None
+
+    @staticmethod
+    def end_auctions(queryset, batch_size=SETTLEMENT_BATCH_SIZE):
+        """
+        End many auctions at once with set-based statements
+
+        Per batch of batch_size auctions this locks the products,
+        picks every winner with one windowed query (highest amount, then
+        earliest bid) and issues three UPDATEs (Won, Lost, Ended), however
+        many auctions and bids are involved.
+
+        Args:
+            queryset: Products to end; only active auctions are affected
+            batch_size: Auctions settled per transaction
+
+        Returns:
+            dict: product_id -> {'bid_id', 'user_id', 'bid_amt'} of the
+            winning bid, or None for auctions that ended without bids
+        """
+        product_ids = list(
+            queryset.filter(product_type='auction', auction_status='Active')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        results = {}
+        for start in range(0, len(product_ids), batch_size):
+            batch = product_ids[start:start + batch_size]
+            with transaction.atomic():
+                # Re-check under lock so auctions ended concurrently are skipped
+                batch = list(
+                    Product.objects.select_for_update()
+                    .filter(pk__in=batch, auction_status='Active')
+                    .values_list('pk', flat=True)
                 )
+                if not batch:
+                    continue
+
+                winners = Bidding.objects.filter(
+                    product_id__in=batch,
+                    bid_status='Pending'
+                ).annotate(
+                    position=Window(
+                        RowNumber(),
+                        partition_by=[F('product_id')],
+                        order_by=[F('bid_amt').desc(), F('bid_time').asc(), F('id').asc()]
+                    )
+                ).filter(position=1).values_list('id', 'product_id', 'user_id', 'bid_amt')
+
+                results.update(dict.fromkeys(batch))
+                for bid_id, product_id, user_id, bid_amt in winners:
+                    results[product_id] = {'bid_id': bid_id, 'user_id': user_id, 'bid_amt': bid_amt}
+
+                winner_ids = [r['bid_id'] for r in map(results.get, batch) if r]
+                Bidding.objects.filter(pk__in=winner_ids).update(bid_status='Won', is_winner=True)
+                Bidding.objects.filter(product_id__in=batch, bid_status='Pending').update(bid_status='Lost')
+                Product.objects.filter(pk__in=batch).update(auction_status='Ended', updated_at=timezone.now())
 
-            # Update product status
-            product.auction_status = 'Ended'
-            product.save()
+                transaction.on_commit(lambda ended=batch: order_books.discard_many(ended))
+                page_cache.invalidate('auctions', *(f'product:{product_id}' for product_id in batch))
+                transaction.on_commit(lambda ended=batch: BiddingService._publish_ended(ended, results))
+        return results
+
+    @staticmethod
+    def _publish_ended(product_ids, results):
+        for product_id in product_ids:
+            winner = results.get(product_id)
+            auction_events.publish(
+                product_id, 'ended',
+                winning_bid=str(winner['bid_amt']) if winner else None
+            )
 
-            return winning_bid
+    @staticmethod
+    def time_remaining(last_bid_time):
+        """
+        Hours left before an auction with this last bid ends idle, as shown
+        to bidders (it changes every six minutes, without any save)
+        """
+        time_remaining = None
+        if last_bid_time:
+            time_elapsed = timezone.now() - last_bid_time
+            time_remaining = max(0, (AUCTION_IDLE_TIMEOUT - time_elapsed).total_seconds() / 3600)  # Convert to hours
+        return f"{time_remaining:.1f} hours" if time_remaining else "No bids yet"
 
     @staticmethod
     def get_auction_status(product):
         """
         Get the current status of an auction
         """
-        if product.product_type != 'Auction':
+        if product.product_type != 'auction':
             return {
                 'is_auction': False
             }
 
-        current_highest_bid = Bidding.objects.filter(
-            product=product,
-            bid_status='Pending'
-        ).order_by('-bid_amt').first()
-
-        total_bids = Bidding.objects.filter(
-            product=product
-        ).count()
-
-        # Calculate time remaining
-        time_remaining = None
-        if product.last_bid_time:
-            time_elapsed = timezone.now() - product.last_bid_time
-            time_remaining = max(0, 24 - time_elapsed.total_seconds() / 3600)  # Convert to hours
+        book = order_books.get(product)
 
         return {
             'is_auction': True,
             'current_bid': product.current_bid or product.price,
-            'highest_bidder': current_highest_bid.user if current_highest_bid else None,
-            'total_bids': total_bids,
-            'time_remaining': f"{time_remaining:.1f} hours" if time_remaining else "No bids yet",
+            'highest_bidder': book.highest_bidder(),
+            'top_bidders': book.top_bidders(),
+            'total_bids': book.bid_count,
+            'time_remaining': BiddingService.time_remaining(product.last_bid_time),
             'auction_status': product.auction_status,
             'last_bid_time': product.last_bid_time,
             'has_ended': product.auction_status == 'Ended'
-        } 
\ No newline at end of file
+        } 
+
+    @staticmethod
+    def verify_order_book(product):
+        """
+        Check the cached order book of a product against the Bidding table
+
+        Returns:
+            list: Discrepancies found; the book is reloaded if there are any
+        """
+        errors = order_books.get(product).consistency_errors()
+        if errors:
+            order_books.discard(product.pk)
+        return errors
@@ -0,0 +1,72 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Compact probabilistic set of strings
+
+    might_contain() never returns False for an item that was added; for
+    other items it returns True with probability about error_rate once
+    capacity items are in. Bits are derived from one 128-bit BLAKE2 digest
+    per item (double hashing), so adding or probing costs one hash whatever
+    the number of bit positions.
+
+    Args:
+        capacity: Number of items the filter is sized for
+        error_rate: Target false positive rate at capacity
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, item):
+        bits = self.bits
+        for position in self._positions(item):
+            bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items):
+        """
+        Add many items; the same as add() in a loop, with less overhead
+        """
+        bits, size, hashes, blake2b = self.bits, self.size, range(self.hashes), hashlib.blake2b
+        added = 0
+        for item in items:
+            digest = blake2b(item.encode(), digest_size=16).digest()
+            h1 = int.from_bytes(digest[:8], 'little')
+            h2 = int.from_bytes(digest[8:], 'little') | 1
+            for i in hashes:
+                position = (h1 + i * h2) % size
+                bits[position >> 3] |= 1 << (position & 7)
+            added += 1
+        self.count += added
+
+    def might_contain(self, item):
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    __contains__ = might_contain
+
+    @property
+    def nbytes(self):
+        return len(self.bits)
+
+    def expected_error_rate(self):
+        """
+        False positive rate predicted for the items added so far
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
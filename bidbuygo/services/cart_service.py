@@ -0,0 +1,124 @@
+from decimal import Decimal
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce
+from ..caching import is_shared
+from ..models import Cart, CartItem, ProductSize
+
+# Cart badge counts are invalidated on every change, so in a cache every
+# worker shares they can live long
+CART_COUNT_TIMEOUT = 60 * 60
+# A per-process cache only sees its own worker's invalidations: a count
+# another worker changed is wrong until it expires
+LOCAL_CART_COUNT_TIMEOUT = 5
+
+MONEY = DecimalField(max_digits=12, decimal_places=2)
+CENT = Decimal('0.01')
+
+class CartService:
+    @staticmethod
+    def count_key(user_id):
+        return f'cart_count:{user_id}'
+
+    @staticmethod
+    def count_timeout():
+        """
+        Seconds a badge count is cached: long only in a cache every worker
+        shares, where invalidate_count reaches them all
+        """
+        return CART_COUNT_TIMEOUT if is_shared() else LOCAL_CART_COUNT_TIMEOUT
+
+    @staticmethod
+    def item_count(user):
+        """
+        Get the number of lines in a user's cart, from the cache when warm
+
+        Args:
+            user: An authenticated user
+
+        Returns:
+            int: Number of cart items (0 when there is no cart)
+        """
+        key = CartService.count_key(user.pk)
+        count = cache.get(key)
+        if count is None:
+            count = CartItem.objects.filter(cart__user_id=user.pk).count()
+            cache.set(key, count, CartService.count_timeout())
+        return count
+
+    @staticmethod
+    def invalidate_count(user_id):
+        """
+        Forget a user's cached count once the current transaction commits
+
+        Deleting before commit would let another request cache the old count
+        again from a snapshot that does not include this change.
+        """
+        transaction.on_commit(lambda: cache.delete(CartService.count_key(user_id)))
+
+    @staticmethod
+    def cart_owner(cart_item):
+        """
+        Get the user id of a cart item's cart without loading the cart if it
+        is already cached on the instance
+        """
+        if CartItem.cart.is_cached(cart_item):
+            return cart_item.cart.user_id
+        return Cart.objects.filter(pk=cart_item.cart_id).values_list('user_id', flat=True).first()
+
+    @staticmethod
+    def line_items(cart):
+        """
+        Cart items annotated with unit_price (product price plus the size's
+        price_adjustment) and line_total, both computed in SQL, and with the
+        matching product_size_id (None if the size does not exist)
+        """
+        product_size = ProductSize.objects.filter(
+            product=OuterRef('product'),
+            size=OuterRef('size')
+        )
+        adjustment = product_size.values('price_adjustment')[:1]
+        unit_price = ExpressionWrapper(
+            F('product__price') + Coalesce(Subquery(adjustment), Value(Decimal('0.00'))),
+            output_field=MONEY
+        )
+        return CartItem.objects.filter(cart=cart).annotate(
+            unit_price=unit_price,
+            product_size_id=Subquery(product_size.values('pk')[:1])
+        ).annotate(
+            line_total=ExpressionWrapper(F('unit_price') * F('quantity'), output_field=MONEY)
+        )
+
+    @staticmethod
+    def price_cart(cart):
+        """
+        Price a cart with one query
+
+        The grand total is a window sum over the cart, so the lines and the
+        total come back together.
+
+        Returns:
+            tuple: (list of CartItems with unit_price and line_total, Decimal grand total)
+        """
+        items = list(
+            CartService.line_items(cart).select_related('product').annotate(
+                grand_total=Window(Sum('line_total'), output_field=MONEY)
+            ).order_by('created_at', 'id')
+        )
+        for item in items:
+            # SQLite hands back unscaled decimals for computed columns
+            item.unit_price = item.unit_price.quantize(CENT)
+            item.line_total = item.line_total.quantize(CENT)
+        total = items[0].grand_total.quantize(CENT) if items else Decimal('0.00')
+        return items, total
+
+    @staticmethod
+    def cart_total(cart):
+        """
+        Get just the grand total of a cart as a Decimal
+        """
+        total = CartService.line_items(cart).aggregate(
+            total=Coalesce(Sum('line_total'), Value(Decimal('0.00')), output_field=MONEY)
+        )['total']
+        return total.quantize(CENT)
@@ -0,0 +1,149 @@
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.db.models import Case, F, Q, When
+from django.utils import timezone
+from ..models import Cart, CartItem, Order, OrderItem, Product, ProductSize, Transaction
+from . import page_cache
+from .cart_service import CartService
+
+class CheckoutService:
+    @staticmethod
+    def place_cod_order(user, cart, shipping):
+        """
+        Turn a cart into a cash-on-delivery order
+
+        The number of queries does not depend on the cart size. The cart is
+        priced once (which also resolves each line's ProductSize row); inside
+        the transaction every ProductSize row involved is
+        locked with one query in (product, size) order, so concurrent
+        checkouts cannot deadlock, and the whole cart's stock is decremented
+        by one conditional UPDATE that only matches rows with enough stock.
+        If any line is short nothing is written. Only the lines priced are
+        taken out of the cart: one added meanwhile (from another tab) stays
+        there, neither ordered nor lost.
+
+        Args:
+            user: The buyer
+            cart: The buyer's cart
+            shipping: Order shipping fields (full_name, phone_number, ...)
+
+        Returns:
+            Order: The created order
+
+        Raises:
+            ValidationError: If the cart is empty or any line is out of stock
+        """
+        lines, total = CartService.price_cart(cart)
+        if not lines:
+            raise ValidationError("Your cart is empty.")
+        if any(line.product_size_id is None for line in lines):
+            raise ValidationError(CheckoutService.shortage_message(lines))
+
+        order = CheckoutService._place_order(user, cart, shipping, lines, total)
+        if order is None:
+            raise ValidationError(CheckoutService.shortage_message(lines))
+        return order
+
+    @staticmethod
+    def _sizes(lines, **filters):
+        return ProductSize.objects.filter(
+            reduce(or_, (Q(product_id=line.product_id, size=line.size) for line in lines)),
+            **filters
+        )
+
+    @staticmethod
+    def _place_order(user, cart, shipping, lines, total):
+        """
+        Write the order, or roll back and return None if stock ran short
+        """
+        # Group the ProductSize rows by quantity to keep the statements small
+        by_quantity = defaultdict(list)
+        for line in lines:
+            by_quantity[line.quantity].append(line.product_size_id)
+        size_ids = [line.product_size_id for line in lines]
+
+        with transaction.atomic():
+            if connection.features.has_select_for_update:
+                # Backends with row locks: take them all up front, in order.
+                # SQLite has none; its transactions begin IMMEDIATE (see
+                # DATABASES), holding the one write lock before any read.
+                list(ProductSize.objects.select_for_update().filter(pk__in=size_ids)
+                     .order_by('product_id', 'size').values_list('pk', flat=True))
+                # Adding an item waits on this lock (the foreign key check),
+                # so the cart's contents hold until the order is written
+                list(Cart.objects.select_for_update().filter(pk=cart.pk).values_list('pk', flat=True))
+
+            decremented = ProductSize.objects.filter(reduce(or_, (
+                Q(pk__in=ids, stock__gte=quantity) for quantity, ids in by_quantity.items()
+            ))).update(stock=Case(
+                *(When(pk__in=ids, then=F('stock') - quantity) for quantity, ids in by_quantity.items()),
+                default=F('stock')
+            ))
+            if decremented != len(lines):
+                transaction.set_rollback(True)
+                return None
+
+            # The product pages show the stock, so they changed
+            now = timezone.now()
+            Product.objects.filter(pk__in={line.product_id for line in lines}).update(updated_at=now)
+            sold_out = Product.objects.filter(
+                pk__in=ProductSize.objects.filter(pk__in=size_ids, stock__lte=0).values('product_id')
+            ).update(is_available=False, updated_at=now)
+            # Bulk updates send no signals; the pages show stock and availability
+            page_cache.invalidate(
+                *{f'product:{line.product_id}' for line in lines}, *(['catalog'] if sold_out else [])
+            )
+
+            order = Order.objects.create(
+                user=user,
+                amount=total,
+                status='PENDING',
+                payment_method='COD',
+                **shipping
+            )
+            OrderItem.objects.bulk_create([
+                OrderItem(
+                    order=order,
+                    product_id=line.product_id,
+                    quantity=line.quantity,
+                    price=line.unit_price,
+                    size=line.size
+                )
+                for line in lines
+            ])
+            Transaction.objects.create(
+                order=order,
+                amount=total,
+                status='SUCCESS',
+                payment_id=f'COD-{order.order_id}'
+            )
+
+            line_ids = [line.pk for line in lines]
+            if cart.items.exclude(pk__in=line_ids).exists():
+                CartItem.objects.filter(pk__in=line_ids).delete()
+            else:
+                # Deleting the cart removes its items
+                cart.delete()
+            CartService.invalidate_count(user.pk)
+            return order
+
+    @staticmethod
+    def shortage_message(lines):
+        """
+        Describe the first cart line that cannot be fulfilled
+        """
+        stock = {
+            (size.product_id, size.size): size.stock
+            for size in CheckoutService._sizes(lines).only('product_id', 'size', 'stock')
+        }
+        for line in lines:
+            available = stock.get((line.product_id, line.size))
+            if available is None:
+                return f"Sorry, {line.product.product_name} is not available in size {line.size}"
+            if available < line.quantity:
+                return (f"Sorry, only {available} items available for "
+                        f"{line.product.product_name} in size {line.size}")
+        return "Some items in your cart just sold out. Please review your cart."
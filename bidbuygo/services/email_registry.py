@@ -0,0 +1,165 @@
+"""
+Per-process Bloom filter of registered emails for check_email
+
+The registration form calls check_email on every keystroke. Almost every
+address typed is not registered, so a Bloom filter of registered emails
+answers those without a query; only possible matches go to the database.
+
+Each process builds its filter from one streaming scan of USER, started in
+a background thread the first time it is needed (never in AppConfig.ready,
+which must not query). Until it is ready every check goes to the database.
+Users created in this process are added by a post_save signal; users
+created by other processes are picked up by a scan of the users joined
+since SYNC_OVERLAP before the newest date_joined seen, run at most every
+SYNC_INTERVAL. The filter is a superset of the registered emails at most
+SYNC_INTERVAL old, so a "not taken" answer can be that stale. Users
+created with an older date_joined than that (an import) are only added by
+the next rebuild. register_email still checks the database before
+accepting an address.
+"""
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Max
+
+from ..models import User
+from .bloom_filter import BloomFilter
+
+logger = logging.getLogger(__name__)
+
+ERROR_RATE = 0.01
+# Room for growth before the filter is rebuilt larger
+HEADROOM = 1.5
+SCAN_CHUNK_SIZE = 10000
+# Seconds between scans for users registered by other processes
+SYNC_INTERVAL = 5.0
+# How far each scan reaches back before the newest date_joined seen, for
+# users whose registration commits late (or whose clock is behind)
+SYNC_OVERLAP = timedelta(seconds=60)
+# Seconds between full rebuilds (deleted users and changed emails only
+# leave the filter then)
+REBUILD_INTERVAL = 3600.0
+
+
+class RegisteredEmails:
+    def __init__(self):
+        self.filter = None
+        self.joined_at = None
+        self.synced_at = 0.0
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+        self.building = False
+        self.pending = []
+
+    def build(self):
+        """
+        Build a new filter from a streaming scan of all users and swap it in
+        """
+        with self.lock:
+            # start() has already begun collecting emails saved meanwhile
+            if not self.building:
+                self.building = True
+                self.pending = []
+        try:
+            capacity = int(max(User.objects.count(), 1000) * HEADROOM)
+            bloom = BloomFilter(capacity, ERROR_RATE)
+            # Users saved in this process from here on are in self.pending,
+            # those saved elsewhere are found by the next sync
+            joined_at = User.objects.aggregate(Max('date_joined'))['date_joined__max']
+            bloom.update(User.objects.values_list('email', flat=True).iterator(chunk_size=SCAN_CHUNK_SIZE))
+            with self.lock:
+                bloom.update(self.pending)
+                self.filter = bloom
+                self.joined_at = joined_at
+                self.synced_at = self.built_at = time.monotonic()
+        finally:
+            with self.lock:
+                self.building = False
+                self.pending = []
+        return bloom
+
+    def _build_in_background(self):
+        try:
+            self.build()
+        except Exception:
+            logger.exception('Building the registered email filter failed')
+        finally:
+            connection.close()
+
+    def start(self):
+        """
+        Start building the filter in a background thread, once
+        """
+        with self.lock:
+            if self.building:
+                return
+            self.building = True
+            self.pending = []
+        threading.Thread(target=self._build_in_background, daemon=True).start()
+
+    def add(self, email):
+        """
+        Record a registered email (called for every saved User)
+        """
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(email)
+            if self.building:
+                self.pending.append(email)
+
+    def sync(self):
+        """
+        Add users registered by other processes since the last sync
+
+        Scanned by date_joined with an overlap rather than by id: ids are
+        handed out before commit, so a lower id can commit after a higher one
+        has been seen. Emails the filter already holds are not added again.
+        """
+        self.synced_at = time.monotonic()
+        bloom = self.filter
+        users = User.objects.all()
+        if self.joined_at is not None:
+            users = users.filter(date_joined__gte=self.joined_at - SYNC_OVERLAP)
+        for email, date_joined in users.values_list('email', 'date_joined'):
+            if bloom is None or not bloom.might_contain(email):
+                self.add(email)
+            if self.joined_at is None or date_joined > self.joined_at:
+                self.joined_at = date_joined
+
+    def might_be_registered(self, email):
+        """
+        Returns:
+            bool: False if email is certainly not registered, True if it may
+            be (or the filter is not ready yet)
+        """
+        bloom = self.filter
+        if bloom is None:
+            self.start()
+            return True
+        now = time.monotonic()
+        if now - self.built_at > REBUILD_INTERVAL or bloom.count > bloom.capacity:
+            self.built_at = now
+            self.start()
+        if now - self.synced_at > SYNC_INTERVAL:
+            self.sync()
+        return bloom.might_contain(email)
+
+    def is_registered(self, email):
+        """
+        Whether a user with this email exists, querying only on a possible
+        match
+        """
+        if not email:
+            return False
+        return self.might_be_registered(email) and User.objects.filter(email=email).exists()
+
+    def clear(self):
+        with self.lock:
+            self.filter = None
+            self.joined_at = None
+
+
+registered_emails = RegisteredEmails()
@@ -0,0 +1,183 @@
+import logging
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from ..models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+MAX_ATTEMPTS = 5
+# Retry after 30s, 1m, 2m, 4m, ...
+RETRY_BASE = timedelta(seconds=30)
+# How long a claimed batch is reserved for its worker. A worker that dies
+# mid-batch leaves its emails to be picked up again once this expires.
+CLAIM_LEASE = timedelta(minutes=5)
+# Stored in place of the body once an email is Sent or Failed: bodies carry
+# one-time codes, and the outbox is a queue, not an archive
+REDACTED_BODY = ''
+
+
+class MailService:
+    @staticmethod
+    def enqueue(subject, body, recipients, from_email=None):
+        """
+        Queue an email for the mail worker instead of sending it in the request
+
+        Args:
+            subject: Subject line
+            body: Plain text body
+            recipients: List of addresses
+            from_email: Sender, DEFAULT_FROM_EMAIL when None
+
+        Returns:
+            OutgoingEmail: The queued email
+        """
+        return OutgoingEmail.objects.create(
+            subject=subject,
+            body=body,
+            from_email=from_email,
+            to=','.join(recipients)
+        )
+
+    @staticmethod
+    def retry_delay(attempts):
+        return RETRY_BASE * 2 ** (attempts - 1)
+
+    @staticmethod
+    def claim(batch_size=BATCH_SIZE, now=None):
+        """
+        Reserve up to batch_size due emails for this worker
+
+        The reservation is a conditional UPDATE, so several workers can
+        share the queue without sending an email twice.
+
+        Returns:
+            list: The claimed OutgoingEmail rows, oldest first
+        """
+        now = now or timezone.now()
+        token = uuid.uuid4().hex
+        due = list(OutgoingEmail.objects.filter(
+            status='Pending', next_attempt_at__lte=now
+        ).order_by('next_attempt_at', 'id').values_list('id', flat=True)[:batch_size])
+        if not due:
+            return []
+        # Rows another worker claimed in the meantime no longer match
+        claimed = OutgoingEmail.objects.filter(
+            id__in=due, status='Pending', next_attempt_at__lte=now
+        ).update(
+            claimed_by=token,
+            next_attempt_at=now + CLAIM_LEASE,
+            attempts=F('attempts') + 1
+        )
+        if not claimed:
+            return []
+        return list(OutgoingEmail.objects.filter(id__in=due, claimed_by=token).order_by('id'))
+
+    @staticmethod
+    def send_batch(batch_size=BATCH_SIZE, connection=None):
+        """
+        Claim due emails and send them over one mail server connection
+
+        An email that fails is retried with exponential backoff and marked
+        Failed after MAX_ATTEMPTS. A connection that cannot be opened fails
+        the whole batch the same way. Sent and Failed emails keep no body.
+        Emails whose lease ran out and that another worker claimed meanwhile
+        are left to that worker.
+
+        Args:
+            batch_size: Maximum emails to send
+            connection: An email backend to reuse (opened if it is not
+                already), or None to use a new one for this batch
+
+        Returns:
+            tuple: (sent, failed) counts
+        """
+        emails = MailService.claim(batch_size)
+        if not emails:
+            return 0, 0
+
+        sent, failures = [], []
+        owns_connection = connection is None
+        connection = connection or get_connection()
+        try:
+            connection.open()
+            for email in emails:
+                message = EmailMessage(
+                    email.subject,
+                    email.body,
+                    email.from_email or settings.DEFAULT_FROM_EMAIL,
+                    email.to.split(','),
+                    connection=connection
+                )
+                try:
+                    message.send()
+                    sent.append(email.id)
+                except Exception as e:
+                    failures.append((email, e))
+        except Exception as e:
+            failures.extend((email, e) for email in emails if email.id not in sent)
+        finally:
+            if owns_connection:
+                connection.close()
+
+        now = timezone.now()
+        # Every email of the batch carries the claim's token
+        mine = OutgoingEmail.objects.filter(claimed_by=emails[0].claimed_by)
+        with transaction.atomic():
+            mine.filter(id__in=sent).update(status='Sent', sent_at=now, claimed_by=None, body=REDACTED_BODY)
+            for email, error in failures:
+                logger.warning('Sending email %s failed (attempt %d): %s', email.id, email.attempts, error)
+                if email.attempts >= MAX_ATTEMPTS:
+                    changes = {'status': 'Failed', 'body': REDACTED_BODY}
+                else:
+                    changes = {'next_attempt_at': now + MailService.retry_delay(email.attempts)}
+                mine.filter(id=email.id).update(
+                    last_error=str(error)[:1000], claimed_by=None, **changes
+                )
+        return len(sent), len(failures)
+
+    @staticmethod
+    def drain(batch_size=BATCH_SIZE):
+        """
+        Send batches until no email is due, all over one connection
+
+        Returns:
+            tuple: (sent, failed) counts
+        """
+        total_sent = total_failed = 0
+        connection = get_connection()
+        try:
+            while True:
+                sent, failed = MailService.send_batch(batch_size, connection)
+                total_sent += sent
+                total_failed += failed
+                if failed:
+                    # The server may have dropped us; reconnect on the next batch
+                    connection.close()
+                if sent + failed < batch_size:
+                    return total_sent, total_failed
+        finally:
+            connection.close()
+
+    @staticmethod
+    def run_forever(batch_size=BATCH_SIZE, poll_interval=2.0, stop=lambda: False):
+        """
+        Drain the outbox, then poll for new emails every poll_interval seconds
+        """
+        while not stop():
+            close_old_connections()
+            try:
+                sent, failed = MailService.drain(batch_size)
+                if sent or failed:
+                    logger.info('Sent %d emails, %d failed', sent, failed)
+            except Exception:
+                logger.exception('Mail worker batch failed')
+            time.sleep(poll_interval)
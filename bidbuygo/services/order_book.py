@@ -0,0 +1,161 @@
+import threading
+from bisect import insort
+from collections import OrderedDict, namedtuple
+
+from ..models import Bidding
+
+# Sort key puts the highest amount first and, for equal amounts, the earliest
+# bid first (the earlier bidder keeps the lead on a tie).
+BookEntry = namedtuple('BookEntry', ['sort_key', 'bid_id', 'user_id', 'bid_amt', 'bid_time'])
+
+
+def _entry(bid_id, user_id, bid_amt, bid_time):
+    return BookEntry((-bid_amt, bid_time, bid_id), bid_id, user_id, bid_amt, bid_time)
+
+
+class OrderBook:
+    """
+    In-memory view of the bids on one auction
+
+    Pending bids are kept in a list sorted by (amount desc, time asc), so the
+    highest bid is entries[0] and top-N is a slice. Inserting an accepted bid
+    is a binary search plus a list insert.
+    """
+
+    def __init__(self, product_id, current_bid=None):
+        self.product_id = product_id
+        self.current_bid = current_bid
+        self.entries = []
+        self.bid_count = 0
+        self.bid_ids = set()
+        self.users = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, product_id, current_bid=None):
+        """
+        Build a book from the Bidding table in a single query
+        """
+        book = cls(product_id, current_bid)
+        bids = Bidding.objects.filter(product_id=product_id).select_related('user').only(
+            'id', 'bid_amt', 'bid_time', 'bid_status', 'user'
+        )
+        for bid in bids:
+            book.bid_count += 1
+            book.bid_ids.add(bid.id)
+            if bid.bid_status == 'Pending':
+                book.users[bid.user_id] = bid.user
+                book.entries.append(_entry(bid.id, bid.user_id, bid.bid_amt, bid.bid_time))
+        book.entries.sort()
+        return book
+
+    def add(self, bid):
+        """
+        Record a bid that has been committed to the database
+
+        Idempotent, since a book reloaded inside the bid's own transaction
+        already contains it by the time the on_commit hook runs.
+        """
+        with self.lock:
+            if bid.id in self.bid_ids:
+                return
+            self.bid_ids.add(bid.id)
+            self.bid_count += 1
+            if bid.bid_status == 'Pending':
+                self.users[bid.user_id] = bid.user
+                insort(self.entries, _entry(bid.id, bid.user_id, bid.bid_amt, bid.bid_time))
+                if self.current_bid is None or bid.bid_amt > self.current_bid:
+                    self.current_bid = bid.bid_amt
+
+    def highest(self):
+        return self.entries[0] if self.entries else None
+
+    def highest_bidder(self):
+        top = self.highest()
+        return self.users.get(top.user_id) if top else None
+
+    def top_bidders(self, n=5):
+        """
+        Get the n highest distinct bidders with their best bid
+        """
+        seen = set()
+        result = []
+        for entry in self.entries:
+            if entry.user_id in seen:
+                continue
+            seen.add(entry.user_id)
+            result.append({'user': self.users.get(entry.user_id), 'bid_amt': entry.bid_amt})
+            if len(result) == n:
+                break
+        return result
+
+    def is_stale(self, product):
+        """
+        Cheap staleness check against the product row the caller already holds
+
+        Bids written outside BiddingService (or by another process) move
+        product.current_bid without going through this book.
+        """
+        return product.current_bid != self.current_bid
+
+    def consistency_errors(self):
+        """
+        Compare the book with the Bidding table
+
+        Returns:
+            list: Human readable discrepancies, empty when consistent
+        """
+        fresh = OrderBook.load(self.product_id)
+        errors = []
+        if fresh.bid_count != self.bid_count:
+            errors.append(f'bid count {self.bid_count} != {fresh.bid_count} in database')
+        if len(fresh.entries) != len(self.entries):
+            errors.append(f'pending bids {len(self.entries)} != {len(fresh.entries)} in database')
+        mine = [(e.bid_id, e.bid_amt) for e in self.entries]
+        theirs = [(e.bid_id, e.bid_amt) for e in fresh.entries]
+        if mine[:1] != theirs[:1]:
+            errors.append(f'highest bid {mine[:1]} != {theirs[:1]} in database')
+        elif mine != theirs:
+            errors.append('pending bid ordering differs from database')
+        return errors
+
+
+class OrderBookRegistry:
+    """
+    Process-wide LRU of order books, loaded lazily per auction
+    """
+
+    def __init__(self, max_books=1000):
+        self.max_books = max_books
+        self.books = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, product):
+        with self.lock:
+            book = self.books.get(product.pk)
+            if book is not None:
+                self.books.move_to_end(product.pk)
+        if book is None or book.is_stale(product):
+            book = OrderBook.load(product.pk, product.current_bid)
+            with self.lock:
+                self.books[product.pk] = book
+                self.books.move_to_end(product.pk)
+                while len(self.books) > self.max_books:
+                    self.books.popitem(last=False)
+        return book
+
+    def discard(self, product_id):
+        with self.lock:
+            self.books.pop(product_id, None)
+
+    def discard_many(self, product_ids):
+        with self.lock:
+            for product_id in product_ids:
+                self.books.pop(product_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.books.clear()
+
+
+order_books = OrderBookRegistry()
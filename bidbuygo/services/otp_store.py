@@ -0,0 +1,171 @@
+"""
+One-time password storage for email verification
+
+Two flows use OTPs: registration (register_email / verify_email /
+set_password) and the standalone send_otp / verify_otp endpoints. Each is a
+"purpose" with its own store, configured by the OTP_STORE setting:
+
+    OTP_STORE = {
+        'BACKEND': 'bidbuygo.services.otp_store.CacheOTPStore',
+        'OPTIONS': {'alias': 'default'},
+    }
+
+CacheOTPStore lets the cache expire codes, so nothing accumulates; it needs
+a cache shared by all workers (Redis, Memcached, database), not the default
+per-process LocMemCache. DatabaseOTPStore keeps codes in the OTP and
+UNVERIFIED_USER tables; expired rows are removed by purge_expired_otps.
+"""
+import hashlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+from django.utils.module_loading import import_string
+
+from ..models import OTP, UnverifiedUser
+
+# How long a verified email stays verified, e.g. for registration to reach
+# set_password
+VERIFIED_TTL = timedelta(minutes=30)
+
+# Outcomes of OTPStore.check
+VERIFIED = 'verified'
+ALREADY_VERIFIED = 'already_verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+MISSING = 'missing'
+
+
+def normalize_email(email):
+    """
+    The form of an address that codes are stored under, so that a code
+    issued to Someone@Example.com verifies someone@example.com (and back)
+    """
+    return (email or '').strip().lower()
+
+
+class DatabaseOTPStore:
+    """
+    Codes stored as rows, one per email, in the purpose's table
+    """
+    MODELS = {
+        'registration': UnverifiedUser,
+        'email': OTP,
+    }
+    PURGE_BATCH_SIZE = 5000
+
+    def __init__(self, purpose):
+        self.model = self.MODELS[purpose]
+
+    def rows(self, email):
+        return self.model.objects.filter(email=normalize_email(email))
+
+    def issue(self, email, code, ttl):
+        """
+        Store a new code for email, replacing any previous one
+        """
+        with transaction.atomic():
+            self.rows(email).delete()
+            self.model.objects.create(email=normalize_email(email), otp=code, expires_at=timezone.now() + ttl)
+
+    def check(self, email, code):
+        """
+        Check a submitted code, marking the email verified when it matches
+
+        Returns:
+            str: VERIFIED, ALREADY_VERIFIED, INVALID, EXPIRED or MISSING
+        """
+        row = self.rows(email).order_by('-created_at').first()
+        if row is None:
+            return MISSING
+        if row.is_expired():
+            return EXPIRED
+        if not constant_time_compare(row.otp, code or ''):
+            return INVALID
+        if row.is_verified:
+            return ALREADY_VERIFIED
+        self.model.objects.filter(pk=row.pk).update(
+            is_verified=True, expires_at=timezone.now() + VERIFIED_TTL
+        )
+        return VERIFIED
+
+    def is_verified(self, email):
+        return self.rows(email).filter(is_verified=True, expires_at__gte=timezone.now()).exists()
+
+    def discard(self, email):
+        self.rows(email).delete()
+
+    def purge(self, now=None):
+        """
+        Delete expired rows in batches, so no single DELETE holds the table
+        for long
+
+        Returns:
+            int: Rows deleted
+        """
+        now = now or timezone.now()
+        deleted = 0
+        while True:
+            batch = list(
+                self.model.objects.filter(expires_at__lt=now)
+                .values_list('pk', flat=True)[:self.PURGE_BATCH_SIZE]
+            )
+            if not batch:
+                return deleted
+            deleted += self.model.objects.filter(pk__in=batch).delete()[0]
+
+
+class CacheOTPStore:
+    """
+    Codes stored as cache entries that expire on their own
+    """
+
+    def __init__(self, purpose, alias='default'):
+        self.purpose = purpose
+        self.cache = caches[alias]
+
+    def key(self, email):
+        # Hashed so any address makes a valid memcached key
+        return f'otp:{self.purpose}:{hashlib.md5(normalize_email(email).encode()).hexdigest()}'
+
+    def issue(self, email, code, ttl):
+        self.cache.set(self.key(email), {'code': code, 'verified': False}, ttl.total_seconds())
+
+    def check(self, email, code):
+        """
+        Returns:
+            str: VERIFIED, ALREADY_VERIFIED, INVALID or MISSING (an expired
+            code has already left the cache)
+        """
+        entry = self.cache.get(self.key(email))
+        if entry is None:
+            return MISSING
+        if not constant_time_compare(entry['code'], code or ''):
+            return INVALID
+        if entry['verified']:
+            return ALREADY_VERIFIED
+        self.cache.set(self.key(email), {**entry, 'verified': True}, VERIFIED_TTL.total_seconds())
+        return VERIFIED
+
+    def is_verified(self, email):
+        entry = self.cache.get(self.key(email))
+        return bool(entry and entry['verified'])
+
+    def discard(self, email):
+        self.cache.delete(self.key(email))
+
+    def purge(self, now=None):
+        # The cache expires entries itself
+        return 0
+
+
+def get_store(purpose):
+    """
+    Get the OTP store configured by OTP_STORE for a purpose
+    ('registration' or 'email')
+    """
+    config = settings.OTP_STORE
+    return import_string(config['BACKEND'])(purpose, **config.get('OPTIONS', {}))
@@ -0,0 +1,294 @@
+"""
+Whole-page cache for anonymous visitors to the catalog pages
+
+Views decorated with cache_anonymous_page are served from the cache to
+requests without a session or messages cookie (so never to a logged in
+user), keyed on the view, its URL arguments and the query parameters that
+change the page. Configured by the PAGE_CACHE setting.
+
+Invalidation: each page depends on named scopes ('catalog', 'auctions',
+'categories', 'product:<id>'), and each scope has a generation in the cache.
+Signals on Product, ProductSize, ProductReview, Bidding and Category saves
+(and the services' bulk updates) replace the generations of the scopes they
+touch once the transaction commits, as do helpful votes; a cached page
+whose generations no longer match is stale. Auction pages also expire after
+SHORT_TIMEOUT, as their remaining time changes without any save.
+
+Stampede protection: when a page is missing or stale, the first request
+takes a lock with cache.add and renders it; requests arriving meanwhile are
+served the stale copy, or, when there is none yet, wait up to WAIT seconds
+for the new one before rendering it themselves.
+
+A page stored with ETag or Last-Modified headers (see conditional_page)
+keeps them, and a request whose If-None-Match or If-Modified-Since matches
+the copy it would be served is answered 304 Not Modified.
+
+Outcomes are counted per view in the cache (see stats() and the
+page_cache_stats command) and sent in an X-Page-Cache header.
+"""
+import hashlib
+import time
+from functools import wraps
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import parse_http_date_safe
+
+from ..caching import is_shared
+
+HIT = 'hit'
+STALE = 'stale'
+MISS = 'miss'
+OUTCOMES = (HIT, STALE, MISS)
+
+DEFAULTS = {
+    # None: only when the cache is shared by every worker (see
+    # bidbuygo.caching); a per-process cache would miss other workers'
+    # invalidations and serve stale pages for up to TIMEOUT
+    'ENABLED': None,
+    'ALIAS': 'default',
+    # Seconds a page is served before being re-rendered
+    'TIMEOUT': 10 * 60,
+    # The same for pages that change without a save (auctions)
+    'SHORT_TIMEOUT': 5,
+    # Seconds a stale page is kept, to be served while it is re-rendered
+    'STALE_TIMEOUT': 60,
+    # Longest a render may hold the lock before another request takes over
+    'LOCK_TIMEOUT': 10,
+    # Longest a request waits for another's render when there is no stale page
+    'WAIT': 1.0,
+}
+POLL_INTERVAL = 0.05
+
+MESSAGES_COOKIE = 'messages'
+# Response headers stored with a page and sent again with each copy
+STORED_HEADERS = ('ETag', 'Last-Modified', 'Cache-Control')
+
+
+def config():
+    return {**DEFAULTS, **getattr(settings, 'PAGE_CACHE', {})}
+
+
+def is_enabled():
+    enabled, alias = config()['ENABLED'], config()['ALIAS']
+    return is_shared(alias) if enabled is None else enabled
+
+
+def get_cache():
+    return caches[config()['ALIAS']]
+
+
+def generation_key(scope):
+    return f'page:gen:{scope}'
+
+
+def stats_key(view_name, outcome):
+    return f'page:stats:{view_name}:{outcome}'
+
+
+def invalidate(*scopes):
+    """
+    Mark every page depending on scopes stale, once the current transaction
+    commits (before, another request could cache the old rows again)
+    """
+    if scopes:
+        transaction.on_commit(lambda: bump(scopes))
+
+
+def bump(scopes):
+    # A new unique value rather than incr(), so a generation evicted and
+    # recreated can never match the one a stored page was rendered with
+    generation = time.time_ns()
+    get_cache().set_many({generation_key(scope): generation for scope in scopes}, None)
+
+
+def current_generation(cache, key, values):
+    if key not in values:
+        # Evicted or never bumped: start a generation no stored page has
+        cache.add(key, time.time_ns(), None)
+        values[key] = cache.get(key)
+    return values[key]
+
+
+def generations(*scopes):
+    """
+    The current generations of scopes, which change whenever a row they
+    cover is saved or deleted
+
+    Returns:
+        tuple: One generation per scope
+    """
+    cache = get_cache()
+    keys = [generation_key(scope) for scope in scopes]
+    values = cache.get_many(keys)
+    return tuple(current_generation(cache, key, values) for key in keys)
+
+
+def short_lived(response):
+    """
+    Cache this response for SHORT_TIMEOUT instead of TIMEOUT
+    """
+    response.page_cache_timeout = config()['SHORT_TIMEOUT']
+    return response
+
+
+def count(view_name, outcome):
+    cache = get_cache()
+    key = stats_key(view_name, outcome)
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats(view_names):
+    """
+    Returns:
+        dict: {view name: {'hit': n, 'stale': n, 'miss': n}}
+    """
+    keys = {(view, outcome): stats_key(view, outcome) for view in view_names for outcome in OUTCOMES}
+    values = get_cache().get_many(list(keys.values()))
+    return {
+        view: {outcome: values.get(keys[view, outcome], 0) for outcome in OUTCOMES}
+        for view in view_names
+    }
+
+
+def reset_stats(view_names):
+    get_cache().delete_many([stats_key(view, outcome) for view in view_names for outcome in OUTCOMES])
+
+
+def is_anonymous(request):
+    # Checked on cookies alone, so a hit needs no session or user query
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and MESSAGES_COOKIE not in request.COOKIES
+    )
+
+
+def is_cacheable(request, response):
+    # A response that sets cookies or embeds a CSRF token belongs to one visitor
+    session = getattr(request, 'session', None)
+    return (
+        request.method == 'GET'
+        and response.status_code == 200
+        and not response.streaming
+        and not (session is not None and session.modified)
+        and not response.cookies
+        and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+        and not request.META.get('CSRF_COOKIE_USED')
+    )
+
+
+class CachedPage:
+    def __init__(self, view_name, request, params, scopes):
+        query = urlencode([(name, request.GET.get(name, '')) for name in params])
+        # Hashed so any path and query make a valid memcached key
+        self.key = f'page:{view_name}:{hashlib.md5(f"{request.path}?{query}".encode()).hexdigest()}'
+        self.lock_key = f'{self.key}:lock'
+        self.scopes = scopes
+        self.cache = get_cache()
+        self.config = config()
+
+    def lookup(self):
+        """
+        The stored entry and the current generations of the page's scopes,
+        read in one round trip
+
+        Returns:
+            tuple: (entry dict or None, tuple of generations)
+        """
+        keys = [generation_key(scope) for scope in self.scopes]
+        values = self.cache.get_many(keys + [self.key])
+        return values.get(self.key), tuple(current_generation(self.cache, key, values) for key in keys)
+
+    def is_fresh(self, entry, generations):
+        return entry is not None and entry['generations'] == generations and entry['expires'] > time.time()
+
+    def store(self, response, generations):
+        timeout = getattr(response, 'page_cache_timeout', self.config['TIMEOUT'])
+        entry = {
+            'generations': generations,
+            'expires': time.time() + timeout,
+            'content': response.content,
+            'content_type': response['Content-Type'],
+            'headers': {name: response[name] for name in STORED_HEADERS if name in response},
+        }
+        self.cache.set(self.key, entry, timeout + self.config['STALE_TIMEOUT'])
+
+    def wait_for(self, generations):
+        deadline = time.monotonic() + self.config['WAIT']
+        while time.monotonic() < deadline:
+            time.sleep(POLL_INTERVAL)
+            entry = self.cache.get(self.key)
+            if self.is_fresh(entry, generations):
+                return entry
+        return None
+
+
+def respond(request, entry, outcome):
+    response = HttpResponse(entry['content'], content_type=entry['content_type'], headers=entry.get('headers'))
+    response['X-Page-Cache'] = outcome.upper()
+    patch_vary_headers(response, ['Cookie'])
+    # The validators are those of this copy, so a stale copy is only
+    # "not modified" to a visitor who already has it
+    return get_conditional_response(
+        request, etag=response.get('ETag'),
+        last_modified=parse_http_date_safe(response.get('Last-Modified', '')), response=response,
+    )
+
+
+def cache_anonymous_page(params=(), scopes=()):
+    """
+    Serve a view's pages to anonymous visitors from the cache
+
+    Args:
+        params: Query parameters the page depends on; others are ignored
+        scopes: Scopes whose invalidation makes the page stale, formatted
+            with the view's keyword arguments ('product:{product_id}')
+    """
+    def decorator(view):
+        view_name = view.__name__
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if not is_enabled() or not is_anonymous(request):
+                return view(request, *args, **kwargs)
+
+            page = CachedPage(view_name, request, params, [scope.format(**kwargs) for scope in scopes])
+            entry, generations = page.lookup()
+            if page.is_fresh(entry, generations):
+                count(view_name, HIT)
+                return respond(request, entry, HIT)
+
+            locked = page.cache.add(page.lock_key, 1, page.config['LOCK_TIMEOUT'])
+            if not locked:
+                # Someone else is rendering it
+                if entry is not None:
+                    count(view_name, STALE)
+                    return respond(request, entry, STALE)
+                entry = page.wait_for(generations)
+                if entry is not None:
+                    count(view_name, HIT)
+                    return respond(request, entry, HIT)
+
+            try:
+                response = view(request, *args, **kwargs)
+                patch_vary_headers(response, ['Cookie'])
+                if is_cacheable(request, response):
+                    page.store(response, generations)
+            finally:
+                if locked:
+                    page.cache.delete(page.lock_key)
+            count(view_name, MISS)
+            response['X-Page-Cache'] = MISS.upper()
+            return response
+        wrapper.page_cache_view = view_name
+        return wrapper
+    return decorator
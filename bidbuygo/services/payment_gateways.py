@@ -0,0 +1,145 @@
+"""
+Payment gateways, loaded on first use
+
+The stripe and razorpay SDKs are large and most workers never take a
+payment, so neither is imported until a gateway is first asked for. Each
+gateway is then built once per process and reused, which keeps its HTTP
+session (and the connections pooled in it) alive between payments.
+
+Gateways are configured by the PAYMENT_GATEWAYS setting:
+
+    PAYMENT_GATEWAYS = {
+        'stripe': {
+            'BACKEND': 'bidbuygo.services.payment_gateways.StripeGateway',
+            'OPTIONS': {'secret_key': ..., 'webhook_secret': ...},
+        },
+    }
+"""
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+
+class InvalidSignature(Exception):
+    """A webhook or payment signature did not verify"""
+
+
+class StripeGateway:
+    """
+    Stripe PaymentIntents and webhooks
+    """
+
+    def __init__(self, secret_key, webhook_secret=None):
+        import stripe
+
+        self.stripe = stripe
+        self.secret_key = secret_key
+        self.webhook_secret = webhook_secret
+
+    def create_payment_intent(self, amount, currency, metadata=None):
+        """
+        Args:
+            amount: Amount in the currency's smallest unit
+            currency: ISO currency code
+            metadata: Key/value pairs stored on the intent
+
+        Returns:
+            PaymentIntent: The created intent
+        """
+        return self.stripe.PaymentIntent.create(
+            api_key=self.secret_key,
+            amount=amount,
+            currency=currency,
+            automatic_payment_methods={'enabled': True},
+            metadata=metadata or {}
+        )
+
+    def construct_event(self, payload, signature):
+        """
+        Verify and parse a webhook payload
+
+        Raises:
+            InvalidSignature: If the signature does not match
+            ValueError: If the payload is not valid JSON
+        """
+        try:
+            return self.stripe.Webhook.construct_event(payload, signature, self.webhook_secret)
+        except self.stripe.error.SignatureVerificationError as e:
+            raise InvalidSignature(str(e)) from e
+
+
+class RazorpayGateway:
+    """
+    Razorpay orders, signature checks and refunds
+    """
+
+    def __init__(self, key_id, key_secret):
+        import razorpay
+
+        self.client = razorpay.Client(auth=(key_id, key_secret))
+
+    def create_order(self, amount, currency='INR', receipt=None):
+        """
+        Args:
+            amount: Amount in paise
+        """
+        return self.client.order.create(data={
+            'amount': amount,
+            'currency': currency,
+            'receipt': receipt,
+            'payment_capture': 1
+        })
+
+    def verify_payment(self, order_id, payment_id, signature):
+        """
+        Raises:
+            InvalidSignature: If the signature does not match
+        """
+        import razorpay
+
+        try:
+            return self.client.utility.verify_payment_signature({
+                'razorpay_order_id': order_id,
+                'razorpay_payment_id': payment_id,
+                'razorpay_signature': signature
+            })
+        except razorpay.errors.SignatureVerificationError as e:
+            raise InvalidSignature(str(e)) from e
+
+    def refund(self, payment_id, amount=None):
+        """
+        Args:
+            amount: Amount in paise, or None to refund in full
+        """
+        data = {'speed': 'normal'}
+        if amount:
+            data['amount'] = amount
+        return self.client.payment.refund(payment_id, data)
+
+
+_gateways = {}
+_gateways_lock = threading.Lock()
+
+
+def get_gateway(name):
+    """
+    Get the process-wide gateway configured under PAYMENT_GATEWAYS[name],
+    importing its SDK the first time it is used
+
+    Raises:
+        ImproperlyConfigured: If no such gateway is configured
+    """
+    gateway = _gateways.get(name)
+    if gateway is None:
+        with _gateways_lock:
+            gateway = _gateways.get(name)
+            if gateway is None:
+                try:
+                    config = settings.PAYMENT_GATEWAYS[name]
+                except KeyError:
+                    raise ImproperlyConfigured(f'No payment gateway named {name!r} in PAYMENT_GATEWAYS')
+                backend = import_string(config['BACKEND'])
+                gateway = _gateways[name] = backend(**config.get('OPTIONS', {}))
+    return gateway
@@ -0,0 +1,68 @@
+from collections import namedtuple
+
+# A bidder's standing in the resolution: the most they are willing to pay and
+# when they committed to it (the earlier commitment wins a tie).
+Bidder = namedtuple('Bidder', ['user_id', 'limit', 'placed_at'])
+
+# Outcome of resolving an auction's proxies. bids lists the (user_id, amount,
+# limit) rows to write, in order: the runner-up's final bid, then the leader's.
+# placed_at is when the leader committed to their limit.
+Resolution = namedtuple('Resolution', ['leader_id', 'price', 'bids', 'placed_at'])
+
+
+def _outranks(a, b):
+    return (a.limit, b.placed_at) > (b.limit, a.placed_at)
+
+
+def resolve_proxy_bids(current_price, leader_id, leader_placed_at, proxies, increment):
+    """
+    Settle a bidding war between proxy (auto) bids in one pass
+
+    Second-price rule: the bidder with the highest limit leads, paying one
+    increment over the runner-up's limit (capped at their own limit, never
+    below the current price). This is the price an increment-by-increment
+    war would end on, without writing every intermediate bid.
+
+    Args:
+        current_price: The product's current bid
+        leader_id: User holding current_price
+        leader_placed_at: When the leader's bid was placed
+        proxies: Iterable of (user_id, auto_bid_limit, bid_time) for pending
+            auto bids with a limit of at least current_price (a proxy whose
+            limit ties the current price outranks it if committed earlier)
+        increment: Minimum step between bids
+
+    Returns:
+        Resolution, or None if the current leader and price stand
+    """
+    standings = {leader_id: Bidder(leader_id, current_price, leader_placed_at)}
+    for user_id, limit, placed_at in proxies:
+        known = standings.get(user_id)
+        if known is None or limit > known.limit:
+            # A bidder keeps the priority of their earliest commitment
+            if known is not None:
+                placed_at = min(placed_at, known.placed_at)
+            standings[user_id] = Bidder(user_id, limit, placed_at)
+
+    first = second = None
+    for bidder in standings.values():
+        if first is None or _outranks(bidder, first):
+            first, second = bidder, first
+        elif second is None or _outranks(bidder, second):
+            second = bidder
+
+    if second is None:
+        return None
+
+    price = max(current_price, min(first.limit, second.limit + increment))
+    if first.user_id == leader_id and price == current_price:
+        return None
+
+    bids = []
+    # Show how far the runner-up went, unless that already ties the final
+    # price (the later row would then outrank the winner's on bid_time)
+    if second.limit > current_price and second.limit < price:
+        bids.append((second.user_id, second.limit, second.limit))
+    if first.user_id != leader_id or price > current_price:
+        bids.append((first.user_id, price, first.limit))
+    return Resolution(first.user_id, price, bids, first.placed_at)
@@ -0,0 +1,260 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, FloatField, Value
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.urls import reverse
+from django.utils import timezone
+from ..models import Product, ProductReview, ReviewVote
+from ..pagination import KeysetPaginator
+from . import page_cache
+from .vote_buffer import helpful_votes
+
+REVIEWS_PER_PAGE = 10
+RECONCILE_BATCH_SIZE = 1000
+
+STARS = [rating for rating, _ in ProductReview.RATING_CHOICES]
+RATING_FIELDS = ['rating_count', 'rating_sum', 'rating_average'] + [f'rating_{star}_count' for star in STARS]
+
+# Newest first; the id breaks ties in the same direction so the
+# (product, created_at, id) index serves the order without a sort
+REVIEW_ORDERING = ['-created_at', '-id']
+# Most helpful first, newest first among equals, served by the
+# (product, helpful_votes, created_at, id) index
+HELPFUL_ORDERING = ['-helpful_votes', '-created_at', '-id']
+REVIEW_ORDERINGS = {'recent': REVIEW_ORDERING, 'helpful': HELPFUL_ORDERING}
+
+class ReviewService:
+    @staticmethod
+    def paginator(product_id, per_page=REVIEWS_PER_PAGE, order='recent'):
+        """
+        Cursor paginator over a product's reviews, each with its author
+        loaded by the same query
+
+        Votes arriving while a reader pages through the most helpful reviews
+        can move a review across the cursor, so it may be shown twice or
+        skipped; the newest first order is stable.
+
+        Args:
+            product_id: Product whose reviews to list
+            per_page: Reviews per page
+            order: 'recent' (newest first) or 'helpful' (most helpful
+                votes first); anything else is treated as 'recent'
+
+        Returns:
+            KeysetPaginator: Pages of ProductReviews
+        """
+        reviews = ProductReview.objects.filter(product_id=product_id).select_related('user')
+        ordering = REVIEW_ORDERINGS.get(order, REVIEW_ORDERING)
+        return KeysetPaginator(reviews, ordering, per_page=per_page)
+
+    @staticmethod
+    def rating_summary(product):
+        """
+        Review count, average rating and per-star histogram from the
+        product's stored aggregates
+
+        Returns:
+            dict: count, average (one decimal, None without reviews) and
+            histogram, a list of {rating, count, percent} from 5 stars down
+        """
+        total = product.rating_count
+        histogram = []
+        for star in reversed(STARS):
+            count = getattr(product, f'rating_{star}_count')
+            histogram.append({
+                'rating': star,
+                'count': count,
+                'percent': round(100 * count / total) if total > 0 else 0,
+            })
+        average = round(product.rating_average, 1) if total > 0 else None
+        return {'count': total, 'average': average, 'histogram': histogram}
+
+    @staticmethod
+    def record_rating(product_id, added=None, removed=None):
+        """
+        Apply one review's rating change to its product's aggregates, and
+        move its updated_at (the product's pages show the review)
+
+        One UPDATE of F() expressions, so concurrent reviews of a product add
+        up instead of overwriting each other. The average is computed from
+        the same (pre-update) row as the new count and sum.
+
+        Args:
+            product_id: Product reviewed
+            added: Rating of a new or edited review, None for a delete
+            removed: Rating of a deleted review, or an edited review's old one
+        """
+        # ReviewForm's ChoiceField leaves the rating as a string
+        added = None if added is None else int(added)
+        removed = None if removed is None else int(removed)
+        if added == removed:
+            # Only the text changed
+            Product.objects.filter(pk=product_id).update(updated_at=timezone.now())
+            return
+        count = (added is not None) - (removed is not None)
+        total = (added or 0) - (removed or 0)
+        changes = {
+            'updated_at': timezone.now(),
+            'rating_count': F('rating_count') + count,
+            'rating_sum': F('rating_sum') + total,
+            'rating_average': Coalesce(
+                Cast(F('rating_sum') + total, FloatField()) / NullIf(F('rating_count') + count, Value(0)),
+                Value(0.0)
+            ),
+        }
+        if added is not None:
+            changes[f'rating_{added}_count'] = F(f'rating_{added}_count') + 1
+        if removed is not None:
+            changes[f'rating_{removed}_count'] = F(f'rating_{removed}_count') - 1
+        Product.objects.filter(pk=product_id).update(**changes)
+
+    @staticmethod
+    def vote_helpful(review, user):
+        """
+        Record that user found a review helpful, once per user and review
+
+        The REVIEW_VOTE unique constraint rejects a second vote, so two
+        requests racing cannot both count. The count itself is raised by an
+        F() update, or left to the write-behind buffer when
+        HELPFUL_VOTES['WRITE_BEHIND'] is on; either way the product's
+        updated_at moves and its cached page is invalidated.
+
+        Args:
+            review: ProductReview (only id and product_id are read)
+            user: Voting user
+
+        Returns:
+            bool: True if the vote was counted, False if user had already
+            voted for this review
+        """
+        write_behind = getattr(settings, 'HELPFUL_VOTES', {}).get('WRITE_BEHIND', False)
+        try:
+            with transaction.atomic():
+                ReviewVote.objects.create(review_id=review.id, user=user)
+                if not write_behind:
+                    ProductReview.objects.filter(pk=review.id).update(helpful_votes=F('helpful_votes') + 1)
+                    Product.objects.filter(pk=review.product_id).update(updated_at=timezone.now())
+                    page_cache.invalidate(f'product:{review.product_id}')
+        except IntegrityError:
+            return False
+        if write_behind:
+            helpful_votes.add(review.id, review.product_id)
+        return True
+
+    @staticmethod
+    def aggregates(histogram):
+        """
+        The stored aggregate fields for a {rating: number of reviews} histogram
+        """
+        count = sum(histogram.values())
+        total = sum(star * n for star, n in histogram.items())
+        values = {'rating_count': count, 'rating_sum': total, 'rating_average': total / count if count else 0.0}
+        for star in STARS:
+            values[f'rating_{star}_count'] = histogram.get(star, 0)
+        return values
+
+    @staticmethod
+    def reconcile(batch_size=RECONCILE_BATCH_SIZE, dry_run=False):
+        """
+        Recompute every product's aggregates from its reviews and fix those
+        that drifted (bulk loads, edits made with queryset.update, ...)
+
+        Products are taken batch_size at a time, in primary key order, and
+        each batch's reviews are counted with one grouped query over that
+        key range. A batch's products are locked while it is checked, so a
+        review saved meanwhile is applied after the recomputed values rather
+        than lost.
+
+        Returns:
+            tuple: (products checked, products that had drifted)
+        """
+        checked = drifted = 0
+        last = None
+        while True:
+            with transaction.atomic():
+                products = Product.objects.select_for_update().order_by('pk').only('pk', *RATING_FIELDS)
+                if last is not None:
+                    products = products.filter(pk__gt=last)
+                products = list(products[:batch_size])
+                if not products:
+                    return checked, drifted
+                first, last = products[0].pk, products[-1].pk
+
+                histograms = defaultdict(dict)
+                rows = ProductReview.objects.filter(
+                    product_id__gte=first, product_id__lte=last
+                ).order_by().values_list('product_id', 'rating').annotate(reviews=Count('id'))
+                for product_id, rating, reviews in rows:
+                    histograms[product_id][rating] = reviews
+
+                stale = []
+                for product in products:
+                    expected = ReviewService.aggregates(histograms.get(product.pk, {}))
+                    if any(getattr(product, field) != value for field, value in expected.items()):
+                        for field, value in expected.items():
+                            setattr(product, field, value)
+                        stale.append(product)
+                if stale and not dry_run:
+                    Product.objects.bulk_update(stale, RATING_FIELDS)
+                checked += len(products)
+                drifted += len(stale)
+
+    @staticmethod
+    def reconcile_helpful_votes(batch_size=RECONCILE_BATCH_SIZE, dry_run=False):
+        """
+        Recount every review's helpful_votes from REVIEW_VOTE and fix those
+        that drifted (votes a write-behind buffer lost in a crash, ...)
+
+        Reviews are checked batch_size at a time, in primary key order, as
+        reconcile() checks products. Votes still waiting in another
+        process's write-behind buffer would be counted twice, so with
+        write-behind on run this while the site is quiet.
+
+        Returns:
+            tuple: (reviews checked, reviews that had drifted)
+        """
+        helpful_votes.flush()
+        checked = drifted = 0
+        last = None
+        while True:
+            with transaction.atomic():
+                reviews = ProductReview.objects.select_for_update().order_by('pk').only('pk', 'helpful_votes')
+                if last is not None:
+                    reviews = reviews.filter(pk__gt=last)
+                reviews = list(reviews[:batch_size])
+                if not reviews:
+                    return checked, drifted
+                first, last = reviews[0].pk, reviews[-1].pk
+
+                votes = dict(
+                    ReviewVote.objects.filter(review_id__gte=first, review_id__lte=last)
+                    .order_by().values_list('review_id').annotate(votes=Count('id'))
+                )
+                stale = []
+                for review in reviews:
+                    expected = votes.get(review.pk, 0)
+                    if review.helpful_votes != expected:
+                        review.helpful_votes = expected
+                        stale.append(review)
+                if stale and not dry_run:
+                    ProductReview.objects.bulk_update(stale, ['helpful_votes'])
+                checked += len(reviews)
+                drifted += len(stale)
+
+    @staticmethod
+    def as_json(review):
+        """
+        A review as the reviews endpoint returns it
+        """
+        return {
+            'id': review.id,
+            'author': review.user.email,
+            'rating': review.rating,
+            'text': review.review_text,
+            'created_at': review.created_at.isoformat(),
+            'image': review.images.url if review.images else None,
+            'is_verified_purchase': review.is_verified_purchase,
+            'helpful_votes': review.helpful_votes,
+            'vote_url': reverse('bidbuygo:vote_review', args=[review.id]),
+        }
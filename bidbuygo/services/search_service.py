@@ -0,0 +1,310 @@
+import re
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'PRODUCT_SEARCH'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def _tokens(query):
+    return TOKEN_RE.findall(query or '')[:16]
+
+
+class SqliteSearchBackend:
+    """
+    FTS5 virtual table holding one row per product
+
+    PRODUCT has a text primary key, so FTS rowids are allocated from
+    PRODUCT_SEARCH_KEY (an INTEGER PRIMARY KEY, hence stable across VACUUM)
+    and matches join back to PRODUCT through that small table instead of
+    reading the product id out of the FTS content for every hit.
+    """
+    # bm25 column weights: name, description, category, condition
+    RANK = 'bm25("PRODUCT_SEARCH", 10.0, 2.0, 1.0, 1.0)'
+
+    # bm25 scores better matches lower
+    ORDERING = ['search_rank', 'product_name']
+
+    INSERT_DOCUMENTS = """
+        INSERT INTO "PRODUCT_SEARCH"
+            (rowid, product_name, description, category, product_condition)
+        SELECT k.id, p.product_name, COALESCE(p.description, ''),
+               COALESCE(c.name, ''), COALESCE(p.product_condition, '')
+        FROM "PRODUCT" p
+        JOIN "PRODUCT_SEARCH_KEY" k ON k.product_id = p.product_id
+        LEFT JOIN "CATEGORY" c ON c.id = p.category_id
+    """
+
+    def create_index(self, cursor):
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "PRODUCT_SEARCH_KEY" (
+            id INTEGER PRIMARY KEY,
+            product_id VARCHAR(25) NOT NULL UNIQUE
+        );
+        """)
+        cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS "PRODUCT_SEARCH" USING fts5(
+            product_name,
+            description,
+            category,
+            product_condition,
+            tokenize = 'unicode61 remove_diacritics 2',
+            prefix = '2 3'
+        );
+        """)
+
+    def drop_index(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS "PRODUCT_SEARCH"')
+        cursor.execute('DROP TABLE IF EXISTS "PRODUCT_SEARCH_KEY"')
+
+    def rebuild(self, cursor):
+        cursor.execute('DELETE FROM "PRODUCT_SEARCH"')
+        cursor.execute('DELETE FROM "PRODUCT_SEARCH_KEY"')
+        cursor.execute('INSERT INTO "PRODUCT_SEARCH_KEY" (product_id) SELECT product_id FROM "PRODUCT"')
+        cursor.execute(self.INSERT_DOCUMENTS)
+        cursor.execute('INSERT INTO "PRODUCT_SEARCH"("PRODUCT_SEARCH") VALUES (\'optimize\')')
+
+    def index_product(self, cursor, product_id):
+        cursor.execute('INSERT OR IGNORE INTO "PRODUCT_SEARCH_KEY" (product_id) VALUES (%s)', [product_id])
+        cursor.execute(
+            'DELETE FROM "PRODUCT_SEARCH" WHERE rowid = '
+            '(SELECT id FROM "PRODUCT_SEARCH_KEY" WHERE product_id = %s)',
+            [product_id]
+        )
+        cursor.execute(self.INSERT_DOCUMENTS + ' WHERE p.product_id = %s', [product_id])
+
+    def index_category(self, cursor, category_id):
+        cursor.execute(
+            'DELETE FROM "PRODUCT_SEARCH" WHERE rowid IN '
+            '(SELECT k.id FROM "PRODUCT_SEARCH_KEY" k '
+            'JOIN "PRODUCT" p ON p.product_id = k.product_id WHERE p.category_id = %s)',
+            [category_id]
+        )
+        cursor.execute(self.INSERT_DOCUMENTS + ' WHERE p.category_id = %s', [category_id])
+
+    def remove_product(self, cursor, product_id):
+        cursor.execute(
+            'DELETE FROM "PRODUCT_SEARCH" WHERE rowid = '
+            '(SELECT id FROM "PRODUCT_SEARCH_KEY" WHERE product_id = %s)',
+            [product_id]
+        )
+        cursor.execute('DELETE FROM "PRODUCT_SEARCH_KEY" WHERE product_id = %s', [product_id])
+
+    def match_expression(self, query):
+        # Quote every token so user input can never inject FTS5 syntax, and
+        # make each one a prefix match so partially typed words still hit.
+        return ' '.join(f'"{token}"*' for token in _tokens(query))
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        return queryset.annotate(
+            search_rank=RawSQL(self.RANK, [], output_field=FloatField())
+        ).extra(
+            tables=[SEARCH_TABLE, 'PRODUCT_SEARCH_KEY'],
+            where=[
+                '"PRODUCT_SEARCH".rowid = "PRODUCT_SEARCH_KEY"."id"',
+                '"PRODUCT_SEARCH_KEY"."product_id" = "PRODUCT"."product_id"',
+                '"PRODUCT_SEARCH" MATCH %s',
+            ],
+            params=[expression],
+        ).order_by(*self.ORDERING)
+
+
+class PostgresSearchBackend:
+    """
+    Side table with a weighted tsvector per product and a GIN index over it
+
+    Rows are removed by the Product post_delete signal rather than a
+    foreign key, which would stop PRODUCT from being truncated (flush, the
+    test runner) on its own.
+    """
+    CONFIG = 'english'
+
+    ORDERING = ['-search_rank', 'product_name']
+
+    SELECT_DOCUMENTS = """
+        SELECT p.product_id,
+               setweight(to_tsvector('english', COALESCE(p.product_name, '')), 'A') ||
+               setweight(to_tsvector('english', COALESCE(p.description, '')), 'B') ||
+               setweight(to_tsvector('english', COALESCE(c.name, '') || ' ' ||
+                                                COALESCE(p.product_condition, '')), 'C')
+        FROM "PRODUCT" p
+        LEFT JOIN "CATEGORY" c ON c.id = p.category_id
+    """
+
+    def create_index(self, cursor):
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS "PRODUCT_SEARCH" (
+            product_id VARCHAR(25) PRIMARY KEY,
+            document TSVECTOR NOT NULL
+        );
+        """)
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS "PRODUCT_SEARCH_document_gin" '
+            'ON "PRODUCT_SEARCH" USING GIN (document)'
+        )
+
+    def drop_index(self, cursor):
+        cursor.execute('DROP TABLE IF EXISTS "PRODUCT_SEARCH"')
+
+    def rebuild(self, cursor):
+        cursor.execute('TRUNCATE "PRODUCT_SEARCH"')
+        cursor.execute('INSERT INTO "PRODUCT_SEARCH" (product_id, document) ' + self.SELECT_DOCUMENTS)
+        cursor.execute('ANALYZE "PRODUCT_SEARCH"')
+
+    def _upsert(self, cursor, where, params):
+        cursor.execute(
+            'INSERT INTO "PRODUCT_SEARCH" (product_id, document) '
+            + self.SELECT_DOCUMENTS + f' WHERE {where} '
+            'ON CONFLICT (product_id) DO UPDATE SET document = EXCLUDED.document',
+            params
+        )
+
+    def index_product(self, cursor, product_id):
+        self._upsert(cursor, 'p.product_id = %s', [product_id])
+
+    def index_category(self, cursor, category_id):
+        self._upsert(cursor, 'p.category_id = %s', [category_id])
+
+    def remove_product(self, cursor, product_id):
+        cursor.execute('DELETE FROM "PRODUCT_SEARCH" WHERE product_id = %s', [product_id])
+
+    def match_expression(self, query):
+        return ' & '.join(f'{token}:*' for token in _tokens(query))
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return queryset.none()
+        # As float8: a real reads back rounded, and the page cursor compares
+        # the rank it read with the one in the database
+        rank = RawSQL(
+            'ts_rank("PRODUCT_SEARCH"."document", to_tsquery(%s, %s))::float8', [self.CONFIG, expression],
+            output_field=FloatField()
+        )
+        return queryset.annotate(search_rank=rank).extra(
+            tables=[SEARCH_TABLE],
+            where=[
+                '"PRODUCT_SEARCH"."product_id" = "PRODUCT"."product_id"',
+                '"PRODUCT_SEARCH"."document" @@ to_tsquery(%s, %s)',
+            ],
+            params=[self.CONFIG, expression],
+        ).order_by(*self.ORDERING)
+
+
+class ScanSearchBackend:
+    """
+    Fallback for engines without a supported full-text index
+    """
+    ORDERING = ['product_name']
+
+    def create_index(self, cursor):
+        pass
+
+    def drop_index(self, cursor):
+        pass
+
+    def rebuild(self, cursor):
+        pass
+
+    def index_product(self, cursor, product_id):
+        pass
+
+    def index_category(self, cursor, category_id):
+        pass
+
+    def remove_product(self, cursor, product_id):
+        pass
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(product_name__icontains=query) |
+            Q(description__icontains=query)
+        ).order_by(*self.ORDERING)
+
+
+BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+class SearchService:
+    @staticmethod
+    def get_backend(db_connection=None):
+        """
+        Get the search backend matching the database engine in use
+        """
+        vendor = (db_connection or connection).vendor
+        return BACKENDS.get(vendor, ScanSearchBackend)()
+
+    @staticmethod
+    def create_index(db_connection=None):
+        """
+        Create and fill the search index structures, for databases not built
+        by migrations (0018 keeps its own copy of this SQL)
+        """
+        db_connection = db_connection or connection
+        backend = SearchService.get_backend(db_connection)
+        with db_connection.cursor() as cursor:
+            backend.create_index(cursor)
+            backend.rebuild(cursor)
+
+    @staticmethod
+    def drop_index(db_connection=None):
+        db_connection = db_connection or connection
+        with db_connection.cursor() as cursor:
+            SearchService.get_backend(db_connection).drop_index(cursor)
+
+    @staticmethod
+    def rebuild_index():
+        """
+        Rebuild the whole index from the PRODUCT table in bulk
+        """
+        with connection.cursor() as cursor:
+            SearchService.get_backend().rebuild(cursor)
+
+    @staticmethod
+    def index_product(product_id):
+        """
+        Refresh the index row of a single product
+        """
+        with connection.cursor() as cursor:
+            SearchService.get_backend().index_product(cursor, product_id)
+
+    @staticmethod
+    def index_category(category_id):
+        """
+        Refresh the index rows of every product in a category
+        """
+        with connection.cursor() as cursor:
+            SearchService.get_backend().index_category(cursor, category_id)
+
+    @staticmethod
+    def remove_product(product_id):
+        with connection.cursor() as cursor:
+            SearchService.get_backend().remove_product(cursor, product_id)
+
+    @staticmethod
+    def search(queryset, query):
+        """
+        Restrict a Product queryset to matches for query, best matches first
+
+        Args:
+            queryset: Product queryset to search within
+            query: Raw search text as typed by the user
+
+        Returns:
+            QuerySet: Ranked queryset annotated with ``search_rank``
+        """
+        return SearchService.get_backend().search(queryset, query)
+
+    @staticmethod
+    def ordering():
+        """
+        Sort keys of SearchService.search results, for KeysetPaginator
+        """
+        return SearchService.get_backend().ORDERING
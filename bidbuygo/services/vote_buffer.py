@@ -0,0 +1,128 @@
+"""
+Write-behind buffer for review helpful-vote counts
+
+A popular review can get a burst of votes in a few seconds, each one an
+UPDATE of the same PRODUCT_REVIEW row. With HELPFUL_VOTES['WRITE_BEHIND']
+on, each process adds votes up in memory instead and writes them at most
+FLUSH_INTERVAL seconds later, one UPDATE per batch of reviews, or at once
+when MAX_PENDING reviews are waiting.
+
+Only the counter is delayed: the REVIEW_VOTE row, which stops a user voting
+twice, is written by the request itself. Counts still buffered when a
+process dies are lost from helpful_votes but not from REVIEW_VOTE, and
+reconcile_ratings recounts them from there.
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, Value, When
+from django.utils import timezone
+
+from ..models import Product, ProductReview
+from . import page_cache
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = 2.0
+MAX_PENDING = 500
+# Reviews per UPDATE, to keep the CASE expression and parameter list short
+FLUSH_BATCH_SIZE = 200
+
+
+def apply_votes(counts, products):
+    """
+    Add {review id: votes} to helpful_votes, one UPDATE per batch of reviews,
+    then move the updated_at of the reviewed products ({review id: product
+    id}) and invalidate their cached pages
+    """
+    review_ids = list(counts)
+    for start in range(0, len(review_ids), FLUSH_BATCH_SIZE):
+        batch = review_ids[start:start + FLUSH_BATCH_SIZE]
+        increment = Case(*[When(pk=pk, then=Value(counts[pk])) for pk in batch], default=Value(0))
+        ProductReview.objects.filter(pk__in=batch).update(helpful_votes=F('helpful_votes') + increment)
+    product_ids = set(products.values())
+    Product.objects.filter(pk__in=product_ids).update(updated_at=timezone.now())
+    page_cache.invalidate(*(f'product:{product_id}' for product_id in product_ids))
+
+
+class HelpfulVoteBuffer:
+    def __init__(self):
+        self.pending = Counter()
+        self.products = {}
+        self.lock = threading.Lock()
+        self.timer = None
+
+    @property
+    def config(self):
+        return getattr(settings, 'HELPFUL_VOTES', {})
+
+    def add(self, review_id, product_id):
+        """
+        Count one vote, to be written by the next flush
+        """
+        config = self.config
+        with self.lock:
+            self.pending[review_id] += 1
+            self.products[review_id] = product_id
+            full = len(self.pending) >= config.get('MAX_PENDING', MAX_PENDING)
+            if not full:
+                self._schedule(config)
+        if full:
+            self.flush()
+
+    def _schedule(self, config):
+        """
+        Start the flush timer unless one is running; call with the lock held
+        """
+        if self.timer is None:
+            self.timer = threading.Timer(config.get('FLUSH_INTERVAL', FLUSH_INTERVAL), self._flush_in_background)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        """
+        Write the buffered votes; on failure they stay buffered and the
+        timer is started again, so they are retried without waiting for
+        another vote
+
+        Returns:
+            int: Reviews updated
+        """
+        with self.lock:
+            counts, self.pending = self.pending, Counter()
+            products, self.products = self.products, {}
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+        if not counts:
+            return 0
+        try:
+            apply_votes(counts, products)
+        except Exception:
+            with self.lock:
+                self.pending.update(counts)
+                self.products.update(products)
+                self._schedule(self.config)
+            raise
+        return len(counts)
+
+    def _flush_in_background(self):
+        with self.lock:
+            self.timer = None
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Writing buffered helpful votes failed')
+        finally:
+            connection.close()
+
+    def __len__(self):
+        return len(self.pending)
+
+
+helpful_votes = HelpfulVoteBuffer()
+atexit.register(helpful_votes.flush)
@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Order, Delivery
+from django.utils import timezone
+from .models import Order, Delivery, Product, ProductSize, Category, Cart, CartItem, User, ProductReview, Bidding
+from .services.search_service import SearchService
+from .services.cart_service import CartService
+from .services.review_service import ReviewService
+from .services.email_registry import registered_emails
+from .services import page_cache
 
 @receiver(post_save, sender=Order)
 def create_delivery(sender, instance, created, **kwargs):
@@ -11,4 +17,121 @@ def create_delivery(sender, instance, created, **kwargs):
             tracking_number=f'TRACK-{instance.order_id}',
             courier_service='Default Courier',
             status='pending'
-        ) 
\ No newline at end of file
+        ) 
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, raw=False, **kwargs):
+    """Keep the product search index in sync with product edits"""
+    if not raw:
+        SearchService.index_product(instance.product_id)
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    """Drop deleted products from the search index"""
+    SearchService.remove_product(instance.product_id)
+
+@receiver(post_save, sender=Category)
+def reindex_category(sender, instance, created, raw=False, **kwargs):
+    """Category names are indexed with each product, so refresh them on rename"""
+    if not raw and not created:
+        SearchService.index_category(instance.pk)
+
+@receiver(post_save, sender=CartItem)
+@receiver(post_delete, sender=CartItem)
+def invalidate_cart_count(sender, instance, origin=None, **kwargs):
+    """Refresh the cart badge count when items are added or removed"""
+    if isinstance(origin, Cart):
+        # Cascading from a cart delete, which invalidates once for all items
+        return
+    user_id = CartService.cart_owner(instance)
+    if user_id is not None:
+        CartService.invalidate_count(user_id)
+
+@receiver(post_delete, sender=Cart)
+def invalidate_deleted_cart_count(sender, instance, **kwargs):
+    """Refresh the cart badge count when a whole cart goes away"""
+    CartService.invalidate_count(instance.user_id)
+
+@receiver(post_save, sender=User)
+def register_email_address(sender, instance, raw=False, **kwargs):
+    """Keep check_email's filter of registered emails a superset"""
+    if not raw:
+        registered_emails.add(instance.email)
+
+@receiver(pre_save, sender=ProductReview)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    """Note what an edited review rated before, so the change can be applied"""
+    instance._previous_rating = None
+    if not raw and instance.pk is not None:
+        instance._previous_rating = ProductReview.objects.filter(pk=instance.pk).values_list(
+            'product_id', 'rating'
+        ).first()
+
+@receiver(post_save, sender=ProductReview)
+def record_review_rating(sender, instance, created, raw=False, **kwargs):
+    """Keep the product's stored rating aggregates in step with its reviews"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_rating', None)
+    if previous is None:
+        ReviewService.record_rating(instance.product_id, added=instance.rating)
+    elif previous[0] != instance.product_id:
+        ReviewService.record_rating(previous[0], removed=previous[1])
+        ReviewService.record_rating(instance.product_id, added=instance.rating)
+    else:
+        ReviewService.record_rating(instance.product_id, added=instance.rating, removed=previous[1])
+
+@receiver(post_delete, sender=ProductReview)
+def forget_review_rating(sender, instance, origin=None, **kwargs):
+    """Take a deleted review out of its product's rating aggregates"""
+    if isinstance(origin, Product):
+        # Cascading from a product delete; the aggregates go with it
+        return
+    ReviewService.record_rating(instance.product_id, removed=instance.rating)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_pages(sender, instance, **kwargs):
+    """Cached listings and the product's own page show the product row"""
+    scopes = ['catalog', f'product:{instance.pk}']
+    if instance.product_type.lower() == 'auction':
+        scopes.append('auctions')
+    page_cache.invalidate(*scopes)
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+def touch_sized_product(sender, instance, origin=None, raw=False, **kwargs):
+    """A product's pages list its sizes and stock, and are dated by its updated_at"""
+    if raw or isinstance(origin, Product):
+        return
+    Product.objects.filter(pk=instance.product_id).update(updated_at=timezone.now())
+
+@receiver(post_save, sender=ProductSize)
+@receiver(post_delete, sender=ProductSize)
+@receiver(post_save, sender=ProductReview)
+@receiver(post_delete, sender=ProductReview)
+def invalidate_product_page(sender, instance, origin=None, **kwargs):
+    """Sizes and reviews show on the product's page; reviews also change
+    the rating on listing cards and the rating order"""
+    if isinstance(origin, Product):
+        # Cascading from a product delete, which invalidates its page
+        return
+    scopes = [f'product:{instance.product_id}']
+    if sender is ProductReview:
+        scopes.append('catalog')
+    page_cache.invalidate(*scopes)
+
+@receiver(post_save, sender=Bidding)
+@receiver(post_delete, sender=Bidding)
+def invalidate_auction_pages(sender, instance, origin=None, **kwargs):
+    """A bid changes the auction's page and the auction listing"""
+    if isinstance(origin, Product):
+        return
+    page_cache.invalidate('auctions', f'product:{instance.product_id}')
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_pages(sender, instance, **kwargs):
+    """Category names show in the listing filter and on every product"""
+    page_cache.invalidate('categories')
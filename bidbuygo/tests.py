@@ -1,3 +1,1751 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail, signing
+from django.core.cache import cache
+from django.core.mail.backends.locmem import EmailBackend as LocmemBackend
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import (
+    OTP, Address, Bidding, Cart, CartItem, Category, Order, OrderItem, OutgoingEmail, Product,
+    ProductReview, ProductSize, ReviewVote, Tracking, UnverifiedUser, User,
+)
+from .caching import is_shared
+from .db_functions import VIEWS, create_database_objects
+from .pagination import TOKEN_SALT, KeysetPaginator
+from .query_budget import QUERY_BUDGETS, QueryBudgetExceeded, assert_query_budget
+from .query_plans import HOT_QUERIES, hot_query
+from .services.auction_scheduler import AuctionScheduler
+from .services.bidding_service import AUCTION_IDLE_TIMEOUT, BiddingService
+from .services.cart_service import CART_COUNT_TIMEOUT, LOCAL_CART_COUNT_TIMEOUT, CartService
+from .services.checkout_service import CheckoutService
+from .services.email_registry import registered_emails
+from .services import auction_events, page_cache, payment_gateways
+from .services.mail_service import MAX_ATTEMPTS, RETRY_BASE, MailService
+from .services.otp_store import get_store
+from .services.review_service import RATING_FIELDS, ReviewService
+from .services.search_service import SearchService
+from .services.vote_buffer import helpful_votes
+from .services.order_book import OrderBookRegistry, order_books
+from .services.proxy_bidding import resolve_proxy_bids
+from .urls import app_name, urlpatterns
+
+
+class ConcurrentBiddingTest(TransactionTestCase):
+    """Fire thousands of simultaneous bids at one auction"""
+
+    THREADS = 16
+    BIDS_PER_THREAD = 125
+
+    def setUp(self):
+        order_books.clear()
+        self.product = Product.objects.create(
+            product_name='Contested Watch',
+            product_type='auction',
+            product_condition='new',
+            price=Decimal('100.00'),
+            quantity=1,
+        )
+        self.users = [
+            User.objects.create_user(email=f'bidder{i}@example.com', password='x')
+            for i in range(self.THREADS)
+        ]
+
+    def test_only_strictly_higher_bids_win(self):
+        accepted, rejected, retries = [], [], []
+        start = threading.Barrier(self.THREADS)
+
+        def bidder(user, seed):
+            rng = random.Random(seed)
+            start.wait()
+            try:
+                for _ in range(self.BIDS_PER_THREAD):
+                    # Every thread bids from its own stale copy of the product
+                    product = Product.objects.get(pk=self.product.pk)
+                    amount = Decimal(rng.randint(10000, 500000)) / 100
+                    try:
+                        bid = BiddingService.place_bid(user, product, amount, min_increment=Decimal('0.01'))
+                    except ValidationError:
+                        rejected.append(amount)
+                    else:
+                        accepted.append(bid.bid_amt)
+                        retries.append(bid.retries)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=bidder, args=(user, i)) for i, user in enumerate(self.users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(accepted) + len(rejected), self.THREADS * self.BIDS_PER_THREAD)
+
+        # Bids were accepted in strictly increasing order of amount
+        amounts = list(Bidding.objects.filter(product=self.product).order_by('id').values_list('bid_amt', flat=True))
+        self.assertEqual(len(amounts), len(accepted))
+        self.assertTrue(all(a < b for a, b in zip(amounts, amounts[1:])))
+
+        # The product row agrees with the highest stored bid
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.current_bid, max(amounts))
+        self.assertEqual(self.product.current_bid, max(accepted))
+        self.assertTrue(all(r <= 5 for r in retries))
+
+        # The in-memory order book agrees with the table
+        self.assertEqual(BiddingService.verify_order_book(self.product), [])
+
+
+class ProxyBiddingTest(TestCase):
+    """Standing auto bids answer every bid at the second-price"""
+
+    def setUp(self):
+        order_books.clear()
+        self.product = Product.objects.create(
+            product_name='Proxy Lamp',
+            product_type='auction',
+            product_condition='new',
+            price=Decimal('100.00'),
+            quantity=1,
+            auction_status='Active',
+        )
+        self.alice, self.bob, self.carol = (
+            User.objects.create_user(email=f'{name}@example.com', password='x')
+            for name in ('alice', 'bob', 'carol')
+        )
+
+    def bid(self, user, amount, limit=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            BiddingService.place_bid(
+                user, self.product, Decimal(amount),
+                auto_bid_limit=Decimal(limit) if limit else None
+            )
+
+    def standing(self):
+        self.product.refresh_from_db()
+        top = Bidding.objects.filter(product=self.product).order_by('-bid_amt', 'bid_time').first()
+        return top.user, self.product.current_bid
+
+    def test_tie_at_the_same_limit_goes_to_the_earlier_proxy(self):
+        self.bid(self.alice, '110', limit='200')
+        self.bid(self.bob, '120', limit='200')
+
+        self.assertEqual(self.standing(), (self.alice, Decimal('200.00')))
+        # Bob's bid already equals the final price: no extra row for him
+        self.assertEqual(Bidding.objects.filter(user=self.bob).count(), 1)
+        self.assertEqual(BiddingService.verify_order_book(self.product), [])
+
+    def test_manual_bid_equal_to_a_proxy_limit_loses_the_tie(self):
+        self.bid(self.alice, '110', limit='200')
+        self.bid(self.bob, '200')
+
+        self.assertEqual(self.standing(), (self.alice, Decimal('200.00')))
+        # Alice's committing row is raised, so it still ranks first on time
+        self.assertEqual(Bidding.objects.filter(user=self.alice).get().bid_amt, Decimal('200.00'))
+        self.assertEqual(BiddingService.verify_order_book(self.product), [])
+        self.assertEqual(order_books.get(self.product).highest_bidder(), self.alice)
+        self.assertEqual(BiddingService.end_auction(self.product).user, self.alice)
+
+    def test_manual_bid_against_a_higher_proxy(self):
+        self.bid(self.alice, '110', limit='300')
+        self.bid(self.bob, '150')
+
+        self.assertEqual(self.standing(), (self.alice, Decimal('151.00')))
+        # Alice's proxy answers with one row, one increment over Bob
+        answer = Bidding.objects.filter(user=self.alice).latest('bid_time')
+        self.assertEqual((answer.bid_amt, answer.auto_bid_limit), (Decimal('151.00'), Decimal('300.00')))
+        self.assertEqual(Bidding.objects.filter(product=self.product).count(), 3)
+
+    def test_leader_raising_their_limit_does_not_move_the_price(self):
+        self.bid(self.alice, '110', limit='200')
+        self.bid(self.bob, '150', limit='160')
+        self.assertEqual(self.standing(), (self.alice, Decimal('161.00')))
+
+        self.bid(self.alice, '162', limit='400')
+
+        # Nobody else is left above 162, so Alice does not bid against herself
+        self.assertEqual(self.standing(), (self.alice, Decimal('162.00')))
+        self.assertIsNone(resolve_proxy_bids(
+            Decimal('162'), self.alice.pk, timezone.now(),
+            [(self.alice.pk, Decimal('200'), timezone.now()), (self.alice.pk, Decimal('400'), timezone.now())],
+            Decimal('1')
+        ))
+
+    def test_increment_is_capped_at_the_limits(self):
+        self.bid(self.alice, '110', limit='200')
+        self.bid(self.carol, '120', limit='199.50')
+
+        # One increment over Carol's 199.50 would pass Alice's own limit
+        self.assertEqual(self.standing(), (self.alice, Decimal('200.00')))
+        # Carol's war ends on her limit, never past it
+        carol_top = Bidding.objects.filter(user=self.carol).order_by('-bid_amt').first()
+        self.assertEqual(carol_top.bid_amt, Decimal('199.50'))
+        self.assertEqual(
+            resolve_proxy_bids(
+                Decimal('120'), self.bob.pk, timezone.now(),
+                [(self.alice.pk, Decimal('300'), timezone.now()), (self.bob.pk, Decimal('150'), timezone.now())],
+                Decimal('1')
+            ).price,
+            Decimal('151')
+        )
+
+
+class OrderBookTest(TestCase):
+    """The in-memory order book answers from memory until the product moves on"""
+
+    def setUp(self):
+        self.users = [User.objects.create_user(email=f'book{i}@example.com', password='x') for i in range(3)]
+        self.products = [
+            Product.objects.create(
+                product_name=f'Book Lot {i}', product_type='auction', product_condition='new',
+                price=Decimal('10.00'), quantity=1, auction_status='Active',
+            )
+            for i in range(3)
+        ]
+        self.product = self.products[0]
+        self.now = timezone.now()
+
+    def bid(self, user, amount, seconds=0, status='Pending'):
+        return Bidding.objects.create(
+            user=user, product=self.product, bid_amt=Decimal(amount), bid_status=status,
+            bid_time=self.now + timedelta(seconds=seconds)
+        )
+
+    def test_add_keeps_the_book_ordered(self):
+        book = OrderBookRegistry().get(self.product)
+        first = self.bid(self.users[0], '20', seconds=0)
+        bids = [first, self.bid(self.users[1], '30', seconds=1), self.bid(self.users[2], '30', seconds=2),
+                self.bid(self.users[0], '25', seconds=3), self.bid(self.users[1], '5', status='Lost')]
+        for bid in bids:
+            book.add(bid)
+        # A bid already in the book (reloaded in its own transaction) is not counted twice
+        book.add(first)
+
+        self.assertEqual(book.bid_count, 5)
+        self.assertEqual(book.current_bid, Decimal('30'))
+        # Highest first, the earlier of two equal bids ahead
+        self.assertEqual(book.highest().bid_id, bids[1].id)
+        self.assertEqual(book.highest_bidder(), self.users[1])
+        self.assertEqual(
+            [(row['user'], row['bid_amt']) for row in book.top_bidders()],
+            [(self.users[1], Decimal('30')), (self.users[2], Decimal('30')), (self.users[0], Decimal('25'))]
+        )
+        self.assertEqual(book.consistency_errors(), [])
+
+    def test_bids_written_elsewhere_reload_the_book(self):
+        registry = OrderBookRegistry()
+        self.bid(self.users[0], '20')
+        self.product.current_bid = Decimal('20')
+        book = registry.get(self.product)
+
+        # Unchanged product: the same book, without a query
+        with self.assertNumQueries(0):
+            self.assertIs(registry.get(self.product), book)
+
+        # Another process bids; the product row the caller reads shows it
+        outside = self.bid(self.users[1], '40', seconds=1)
+        Product.objects.filter(pk=self.product.pk).update(current_bid=outside.bid_amt)
+        self.product.refresh_from_db()
+        self.assertTrue(book.is_stale(self.product))
+        self.assertIn('highest bid', ' '.join(book.consistency_errors()))
+
+        fresh = registry.get(self.product)
+        self.assertIsNot(fresh, book)
+        self.assertEqual((fresh.highest().bid_id, fresh.bid_count), (outside.id, 2))
+
+    def test_least_recently_used_book_is_evicted(self):
+        registry = OrderBookRegistry(max_books=2)
+        first, second, third = self.products
+        book = registry.get(first)
+        registry.get(second)
+        registry.get(first)
+        registry.get(third)
+
+        self.assertEqual(list(registry.books), [first.pk, third.pk])
+        self.assertIs(registry.get(first), book)
+
+
+class AuctionSettlementTest(TestCase):
+    """Ending auctions marks one winner per auction in set-based statements"""
+
+    def setUp(self):
+        order_books.clear()
+        self.users = [User.objects.create_user(email=f'settle{i}@example.com', password='x') for i in range(3)]
+        self.start = timezone.now() - timedelta(days=2)
+
+    def auction(self, *amounts):
+        """An active auction with a bid per amount, one second apart"""
+        product = Product.objects.create(
+            product_name='Settled Vase', product_type='auction', product_condition='new',
+            price=Decimal('10.00'), quantity=1, auction_status='Active', last_bid_time=self.start,
+        )
+        for n, amount in enumerate(amounts):
+            Bidding.objects.create(
+                user=self.users[n % len(self.users)], product=product, bid_amt=Decimal(amount),
+                bid_status='Pending', bid_time=self.start + timedelta(seconds=n)
+            )
+        return product
+
+    def statuses(self, product):
+        return list(
+            Bidding.objects.filter(product=product).order_by('bid_time').values_list('bid_status', 'is_winner')
+        )
+
+    def test_winner_losers_and_auctions_without_bids(self):
+        contested, empty = self.auction('20', '30', '25'), self.auction()
+
+        results = BiddingService.end_auctions(Product.objects.all())
+
+        winner = Bidding.objects.get(product=contested, bid_amt=Decimal('30'))
+        self.assertEqual(results[contested.pk], {
+            'bid_id': winner.id, 'user_id': winner.user_id, 'bid_amt': Decimal('30.00')
+        })
+        self.assertIsNone(results[empty.pk])
+        self.assertEqual(self.statuses(contested), [('Lost', False), ('Won', True), ('Lost', False)])
+        self.assertEqual(
+            set(Product.objects.values_list('auction_status', flat=True)), {'Ended'}
+        )
+
+    def test_tied_top_amounts_go_to_the_earliest_bid(self):
+        product = self.auction('40', '40', '35')
+
+        BiddingService.end_auctions(Product.objects.filter(pk=product.pk))
+
+        self.assertEqual(self.statuses(product), [('Won', True), ('Lost', False), ('Lost', False)])
+
+    def test_batches_settle_every_auction_once(self):
+        auctions = [self.auction('15', str(20 + i)) for i in range(5)]
+        settled = self.auction('50')
+        Product.objects.filter(pk=settled.pk).update(auction_status='Ended')
+
+        with CaptureQueriesContext(connection) as queries:
+            results = BiddingService.end_auctions(Product.objects.all(), batch_size=2)
+
+        self.assertEqual(set(results), {product.pk for product in auctions})
+        for i, product in enumerate(auctions):
+            self.assertEqual(results[product.pk]['bid_amt'], Decimal(20 + i))
+            self.assertEqual(self.statuses(product), [('Lost', False), ('Won', True)])
+        # Already ended elsewhere: left alone
+        self.assertEqual(self.statuses(settled), [('Pending', False)])
+        # Three UPDATEs (Won, Lost, Ended) per batch of at most two
+        updates = [q for q in queries.captured_queries if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 3 * 3)
+
+    def test_single_auction_goes_through_the_bulk_path(self):
+        product = self.auction('20', '30')
+
+        winner = BiddingService.end_auction(product)
+
+        self.assertEqual((winner.bid_amt, winner.bid_status, winner.is_winner), (Decimal('30.00'), 'Won', True))
+        self.assertEqual(product.auction_status, 'Ended')
+        self.assertEqual(self.statuses(product), [('Lost', False), ('Won', True)])
+        # A second settlement must not pick another winner
+        with self.assertRaisesMessage(ValidationError, 'already ended'):
+            BiddingService.end_auction(Product.objects.get(pk=product.pk))
+        self.assertIsNone(BiddingService.end_auction(self.auction()))
+
+
+class AuctionSchedulerTest(TestCase):
+    """The scheduler ends auctions when their deadline passes, and only then"""
+
+    def setUp(self):
+        order_books.clear()
+        self.now = timezone.now()
+
+    def auction(self, idle):
+        return Product.objects.create(
+            product_name='Scheduled Clock', product_type='auction', product_condition='new',
+            price=Decimal('10.00'), quantity=1, auction_status='Active', last_bid_time=self.now - idle,
+        )
+
+    def status(self, product):
+        return Product.objects.get(pk=product.pk).auction_status
+
+    def test_tick_ends_only_the_due_auctions(self):
+        due, running = self.auction(timedelta(hours=25)), self.auction(timedelta(hours=1))
+        scheduler = AuctionScheduler()
+        self.assertEqual(scheduler.load(), 2)
+
+        self.assertEqual(scheduler.pop_due(self.now - timedelta(days=1)), [])
+        self.assertEqual(scheduler.tick(self.now), 1)
+
+        self.assertEqual((self.status(due), self.status(running)), ('Ended', 'Active'))
+        self.assertEqual(list(scheduler.deadlines), [running.pk])
+        self.assertEqual(scheduler.tick(self.now), 0)
+
+    def test_extended_deadline_is_rescheduled(self):
+        product = self.auction(timedelta(hours=25))
+        scheduler = AuctionScheduler()
+        scheduler.load()
+        self.assertEqual(scheduler.pop_due(self.now), [product.pk])
+
+        # A bid lands between the pop and the end: the auction waits again
+        Product.objects.filter(pk=product.pk).update(last_bid_time=self.now)
+        self.assertEqual(scheduler.end_due([product.pk], self.now), 0)
+        self.assertEqual(self.status(product), 'Active')
+        self.assertEqual(scheduler.deadlines, {product.pk: self.now + AUCTION_IDLE_TIMEOUT})
+
+        self.assertEqual(scheduler.tick(self.now + timedelta(hours=23)), 0)
+        self.assertEqual(scheduler.tick(self.now + timedelta(hours=24)), 1)
+        self.assertEqual(self.status(product), 'Ended')
+
+    def test_poll_reads_only_bids_since_the_watermark(self):
+        product = self.auction(timedelta(hours=2))
+        scheduler = AuctionScheduler()
+        scheduler.load()
+        self.assertEqual(scheduler.watermark, self.now - timedelta(hours=2))
+
+        fresh = self.auction(timedelta(0))
+        Product.objects.filter(pk=product.pk).update(last_bid_time=self.now - timedelta(minutes=1))
+        # Older than the watermark (less the overlap): not a change to pick up
+        old = self.auction(timedelta(hours=3))
+        scheduler.poll()
+
+        self.assertEqual(scheduler.watermark, self.now)
+        self.assertEqual(set(scheduler.deadlines), {product.pk, fresh.pk})
+        self.assertEqual(scheduler.deadlines[product.pk], self.now - timedelta(minutes=1) + AUCTION_IDLE_TIMEOUT)
+        self.assertNotIn(old.pk, scheduler.deadlines)
+
+    def test_auctions_ended_elsewhere_are_forgotten(self):
+        product = self.auction(timedelta(hours=1))
+        scheduler = AuctionScheduler()
+        scheduler.load()
+        BiddingService.end_auction(product)
+
+        self.assertEqual(scheduler.tick(self.now + AUCTION_IDLE_TIMEOUT), 0)
+        self.assertEqual((scheduler.deadlines, scheduler.heap), ({}, []))
+
+
+class AuctionEventsTest(TestCase):
+    """Published auction events reach the watchers of that auction, and its stream"""
+
+    def auction(self, **fields):
+        return Product.objects.create(
+            product_name='Streamed Clock', product_type='auction', product_condition='new',
+            price=Decimal('10.00'), quantity=1, **{'auction_status': 'Active', **fields}
+        )
+
+    def test_publish_reaches_subscribers_from_another_thread(self):
+        broker = auction_events.LocalBroker()
+
+        async def watch():
+            queue, other = broker.subscribe('P1'), broker.subscribe('P2')
+            self.assertEqual(broker.watcher_count('P1'), 1)
+            # Bids publish from the synchronous request thread
+            await asyncio.to_thread(broker.publish, 'P1', {'event': 'bid', 'current_bid': '12.00'})
+            event = await asyncio.wait_for(queue.get(), 5)
+            broker.unsubscribe('P1', queue)
+            return event, other.empty()
+
+        event, untouched = asyncio.run(watch())
+        self.assertEqual(event, {'event': 'bid', 'current_bid': '12.00'})
+        self.assertTrue(untouched)
+        self.assertEqual(broker.watcher_count('P1'), 0)
+        self.assertNotIn('P1', broker.watchers)
+
+    def test_slow_watchers_lose_the_oldest_events(self):
+        broker = auction_events.LocalBroker()
+
+        async def watch():
+            queue = broker.subscribe('P1')
+            for n in range(auction_events.WATCHER_QUEUE_SIZE + 5):
+                broker.publish('P1', {'event': 'bid', 'n': n})
+            await asyncio.sleep(0)
+            return [queue.get_nowait()['n'] for _ in range(queue.qsize())]
+
+        self.assertEqual(list(range(5, auction_events.WATCHER_QUEUE_SIZE + 5)), asyncio.run(watch()))
+
+    async def test_stream_sends_snapshot_then_events(self):
+        product = await sync_to_async(self.auction)(current_bid=Decimal('15.00'), last_bid_time=timezone.now())
+        response = await self.async_client.get(reverse('bidbuygo:auction_stream', args=[product.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response['Cache-Control'], 'no-cache')
+        self.assertEqual(response['X-Accel-Buffering'], 'no')
+
+        stream = aiter(response.streaming_content)
+        snapshot = (await anext(stream)).decode()
+        self.assertTrue(snapshot.startswith('event: snapshot\n'))
+        self.assertEqual(json.loads(snapshot.split('data: ')[1])['current_bid'], '15.00')
+
+        # The watcher is subscribed once the snapshot is out
+        auction_events.publish(product.pk, 'ended', winning_bid='15.00')
+        ended = (await asyncio.wait_for(anext(stream), 5)).decode()
+        self.assertEqual(ended, auction_events.format_sse(
+            {'event': 'ended', 'product_id': product.pk, 'winning_bid': '15.00'}
+        ))
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(auction_events.get_broker().watcher_count(product.pk), 0)
+
+    async def test_stream_skips_bids_the_snapshot_already_counts(self):
+        product = await sync_to_async(self.auction)(current_bid=Decimal('15.00'), last_bid_time=timezone.now())
+        user = await User.objects.acreate(email='watcher@example.com')
+        await Bidding.objects.acreate(
+            user=user, product=product, bid_amt=Decimal('15.00'), bid_time=product.last_bid_time
+        )
+        response = await self.async_client.get(reverse('bidbuygo:auction_stream', args=[product.pk]))
+        stream = aiter(response.streaming_content)
+        snapshot = json.loads((await anext(stream)).decode().split('data: ')[1])
+        self.assertEqual(snapshot['total_bids'], 1)
+
+        # Committed while the snapshot was read: already in it
+        ends_at = product.last_bid_time + AUCTION_IDLE_TIMEOUT
+        auction_events.publish(product.pk, 'bid', current_bid='15.00', total_bids=1)
+        auction_events.publish(product.pk, 'extended', ends_at=ends_at.isoformat())
+        later = ends_at + timedelta(minutes=1)
+        auction_events.publish(product.pk, 'bid', current_bid='16.00', total_bids=2)
+        auction_events.publish(product.pk, 'extended', ends_at=later.isoformat())
+        auction_events.publish(product.pk, 'ended', winning_bid='16.00')
+
+        rest = [chunk.decode() async for chunk in stream]
+        self.assertEqual([chunk.split('\n')[0] for chunk in rest], ['event: bid', 'event: extended', 'event: ended'])
+        self.assertIn('"total_bids": 2', rest[0])
+        self.assertIn(later.isoformat(), rest[1])
+
+    async def test_stream_of_an_ended_auction_stops_after_the_snapshot(self):
+        product = await sync_to_async(self.auction)(auction_status='Ended')
+        response = await self.async_client.get(reverse('bidbuygo:auction_stream', args=[product.pk]))
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertEqual(content.count('event: '), 1)
+        self.assertIn('"auction_status": "Ended"', content)
+
+    async def test_stream_is_only_for_auctions(self):
+        product = await Product.objects.acreate(
+            product_name='Plain Clock', product_type='regular', price=Decimal('10.00'), quantity=1
+        )
+        response = await self.async_client.get(reverse('bidbuygo:auction_stream', args=[product.pk]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CartCountCacheTest(TestCase):
+    """The cart badge must not cost queries on every page"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='shopper@example.com', password='x')
+        self.cart = Cart.objects.create(user=self.user)
+        self.product = Product.objects.create(
+            product_name='Linen Shirt',
+            product_type='regular',
+            product_condition='new',
+            price=Decimal('899.00'),
+            quantity=5,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.create(cart=self.cart, product=self.product, size='M')
+        self.client.force_login(self.user)
+
+    def cart_queries(self, queries):
+        return [q['sql'] for q in queries if '"CART"' in q['sql'] or 'cartitem' in q['sql']]
+
+    def test_warm_home_page_issues_no_cart_queries(self):
+        self.client.get(reverse('bidbuygo:home'))
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('bidbuygo:home'))
+
+        self.assertEqual(response.context['cart_count'], 1)
+        self.assertEqual(self.cart_queries(queries), [])
+
+    def test_count_is_refreshed_when_items_change(self):
+        self.client.get(reverse('bidbuygo:home'))
+
+        other = Product.objects.create(
+            product_name='Wool Scarf',
+            product_type='regular',
+            product_condition='new',
+            price=Decimal('499.00'),
+            quantity=5,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            CartItem.objects.create(cart=self.cart, product=other, size='M')
+        self.assertEqual(self.client.get(reverse('bidbuygo:home')).context['cart_count'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cart.delete()
+        self.assertEqual(self.client.get(reverse('bidbuygo:home')).context['cart_count'], 0)
+
+    def test_count_is_cached_briefly_unless_every_worker_shares_the_cache(self):
+        self.assertFalse(is_shared())
+        self.assertEqual(CartService.count_timeout(), LOCAL_CART_COUNT_TIMEOUT)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+            }}):
+                self.assertTrue(is_shared())
+                self.assertEqual(CartService.count_timeout(), CART_COUNT_TIMEOUT)
+
+
+class CartPricingTest(TestCase):
+    """Carts are priced in SQL as exact Decimals, whatever their size"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='pricing@example.com', password='x')
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = []
+        for i, (price, adjustment) in enumerate([('19.99', '0.01'), ('0.10', '-0.05'), ('250.00', '12.35')]):
+            product = Product.objects.create(
+                product_name=f'Priced Item {i}', product_type='regular', product_condition='new',
+                price=Decimal(price), quantity=10,
+            )
+            ProductSize.objects.create(product=product, size='M', stock=10, price_adjustment=Decimal(adjustment))
+            self.products.append(product)
+
+    def add(self, product, quantity, size='M'):
+        return CartItem.objects.create(cart=self.cart, product=product, size=size, quantity=quantity)
+
+    def test_lines_and_total_include_size_adjustments(self):
+        for product, quantity in zip(self.products, (3, 7, 1)):
+            self.add(product, quantity)
+        # No such size: priced at the product price
+        self.add(self.products[0], 2, size='XL')
+
+        with self.assertNumQueries(1):
+            lines, total = CartService.price_cart(self.cart)
+
+        self.assertEqual(
+            [(line.unit_price, line.line_total) for line in lines],
+            [(Decimal('20.00'), Decimal('60.00')), (Decimal('0.05'), Decimal('0.35')),
+             (Decimal('262.35'), Decimal('262.35')), (Decimal('19.99'), Decimal('39.98'))]
+        )
+        self.assertEqual(total, Decimal('362.68'))
+        self.assertEqual(str(total), '362.68')
+        self.assertEqual(CartService.cart_total(self.cart), total)
+        self.assertEqual(Cart.objects.get(pk=self.cart.pk).total_price, total)
+        # Unpriced items agree with the SQL line totals
+        self.assertEqual(
+            [item.total_price for item in self.cart.items.order_by('created_at', 'id')],
+            [line.line_total for line in lines]
+        )
+
+    def test_empty_cart(self):
+        self.assertEqual(CartService.price_cart(self.cart), ([], Decimal('0.00')))
+        self.assertEqual(CartService.cart_total(self.cart), Decimal('0.00'))
+
+    def test_cart_pages_cost_the_same_for_any_number_of_items(self):
+        self.client.force_login(self.user)
+        self.add(self.products[0], 1)
+        counts = []
+        for product in self.products[1:]:
+            self.add(product, 2)
+            for name in ('cart', 'checkout'):
+                # Warm the cart badge count first
+                self.client.get(reverse(f'bidbuygo:{name}'))
+                with CaptureQueriesContext(connection) as queries:
+                    self.client.get(reverse(f'bidbuygo:{name}'))
+                counts.append((name, len(queries)))
+        self.assertEqual(counts[:2], counts[2:])
+
+
+class CheckoutTest(TestCase):
+    """A cash-on-delivery checkout writes the whole order or nothing"""
+
+    SHIPPING = {
+        'full_name': 'Test Buyer', 'phone_number': '9999999999', 'address_line1': '1 Test Road',
+        'address_line2': '', 'city': 'Chennai', 'state': 'TN', 'postal_code': '600001', 'country': 'India',
+    }
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='checkout@example.com', password='x')
+        self.shirt = Product.objects.create(
+            product_name='Checkout Shirt', product_type='regular', product_condition='new',
+            price=Decimal('100.00'), quantity=10,
+        )
+        self.cap = Product.objects.create(
+            product_name='Checkout Cap', product_type='regular', product_condition='new',
+            price=Decimal('20.00'), quantity=1,
+        )
+        ProductSize.objects.create(product=self.shirt, size='M', stock=5, price_adjustment=Decimal('0.00'))
+        ProductSize.objects.create(product=self.shirt, size='L', stock=2, price_adjustment=Decimal('15.50'))
+        ProductSize.objects.create(product=self.cap, size='Free', stock=1, price_adjustment=Decimal('-2.50'))
+        self.cart = Cart.objects.create(user=self.user)
+        for product, size, quantity in [(self.shirt, 'M', 2), (self.shirt, 'L', 2), (self.cap, 'Free', 1)]:
+            CartItem.objects.create(cart=self.cart, product=product, size=size, quantity=quantity)
+
+    def stock(self):
+        return dict(ProductSize.objects.values_list('size', 'stock'))
+
+    def test_order_takes_stock_and_sized_prices(self):
+        order = CheckoutService.place_cod_order(self.user, self.cart, self.SHIPPING)
+
+        self.assertEqual(order.amount, Decimal('448.50'))
+        self.assertEqual(
+            sorted(order.items.values_list('size', 'quantity', 'price')),
+            [('Free', 1, Decimal('17.50')), ('L', 2, Decimal('115.50')), ('M', 2, Decimal('100.00'))]
+        )
+        self.assertEqual(self.stock(), {'M': 3, 'L': 0, 'Free': 0})
+        # As before checkout was batched, a size selling out takes its product off sale
+        self.assertEqual(
+            dict(Product.objects.values_list('product_name', 'is_available')),
+            {'Checkout Shirt': False, 'Checkout Cap': False}
+        )
+        self.assertEqual(order.transaction_set.get().payment_id, f'COD-{order.order_id}')
+        self.assertFalse(Cart.objects.filter(pk=self.cart.pk).exists())
+
+    def test_item_added_after_pricing_stays_in_the_cart(self):
+        lines, total = CartService.price_cart(self.cart)
+        # From another tab, between pricing and the order being written
+        ProductSize.objects.create(product=self.cap, size='Kids', stock=3, price_adjustment=Decimal('0.00'))
+        late = CartItem.objects.create(cart=self.cart, product=self.cap, size='Kids', quantity=1)
+
+        order = CheckoutService._place_order(self.user, self.cart, self.SHIPPING, lines, total)
+
+        self.assertEqual((order.amount, order.items.count()), (Decimal('448.50'), 3))
+        self.assertEqual(list(self.cart.items.all()), [late])
+        self.assertEqual((self.stock()['M'], self.stock()['Kids']), (3, 3))
+
+    def test_shortage_writes_nothing(self):
+        CartItem.objects.filter(cart=self.cart, size='L').update(quantity=3)
+
+        with self.assertRaisesMessage(ValidationError, 'only 2 items available for Checkout Shirt in size L'):
+            CheckoutService.place_cod_order(self.user, self.cart, self.SHIPPING)
+
+        self.assertEqual(self.stock(), {'M': 5, 'L': 2, 'Free': 1})
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertTrue(Product.objects.get(pk=self.cap.pk).is_available)
+        self.assertEqual(self.cart.items.count(), 3)
+
+    def test_missing_size_writes_nothing(self):
+        CartItem.objects.create(cart=self.cart, product=self.cap, size='XL', quantity=1)
+
+        with self.assertRaisesMessage(ValidationError, 'not available in size XL'):
+            CheckoutService.place_cod_order(self.user, self.cart, self.SHIPPING)
+
+        self.assertEqual(self.stock(), {'M': 5, 'L': 2, 'Free': 1})
+        self.assertFalse(Order.objects.exists())
+
+
+class CountingGateway:
+    """Counts how many times a gateway is built"""
+
+    built = 0
+
+    def __init__(self, **options):
+        CountingGateway.built += 1
+        self.options = options
+
+
+class PaymentGatewayTest(TestCase):
+    """Gateways import their SDK on first use and are built once per process"""
+
+    def setUp(self):
+        payment_gateways._gateways.clear()
+        self.addCleanup(payment_gateways._gateways.clear)
+        CountingGateway.built = 0
+
+    def test_sdks_are_imported_on_first_use(self):
+        # A fresh interpreter: this one may have imported the SDKs already
+        script = (
+            'import sys, django; django.setup()\n'
+            'import bidbuygo.urls, bidbuygo.admin\n'
+            'sdks = lambda: sorted(m for m in ("stripe", "razorpay") if m in sys.modules)\n'
+            'print(sdks())\n'
+            'from bidbuygo.services.payment_gateways import get_gateway\n'
+            'get_gateway("razorpay")\n'
+            'print(sdks())\n'
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', script], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'mysite.settings'}
+        )
+        self.assertEqual(result.stdout.split('\n')[:2], ["[]", "['razorpay']"])
+
+    @override_settings(PAYMENT_GATEWAYS={
+        'counting': {'BACKEND': 'bidbuygo.tests.CountingGateway', 'OPTIONS': {'secret_key': 'sk'}},
+    })
+    def test_gateway_is_built_once(self):
+        gateway = payment_gateways.get_gateway('counting')
+        self.assertIs(payment_gateways.get_gateway('counting'), gateway)
+        self.assertEqual((CountingGateway.built, gateway.options), (1, {'secret_key': 'sk'}))
+
+    @override_settings(PAYMENT_GATEWAYS={'counting': {'BACKEND': 'bidbuygo.tests.CountingGateway'}})
+    def test_unknown_gateway_is_improperly_configured(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "No payment gateway named 'paypal'"):
+            payment_gateways.get_gateway('paypal')
+        self.assertEqual((CountingGateway.built, payment_gateways._gateways), (0, {}))
+
+        # Configured without OPTIONS: built with none
+        self.assertEqual(payment_gateways.get_gateway('counting').options, {})
+
+
+class QueryPlanTest(TestCase):
+    """The registered hot queries must be answered from indexes"""
+
+    def test_hot_queries_use_indexes(self):
+        call_command('check_query_plans', stdout=StringIO())
+
+    def test_full_scan_is_reported(self):
+        hot_query('unindexed')(lambda: Product.objects.filter(description='silk'))
+        try:
+            with self.assertRaisesMessage(CommandError, 'unindexed'):
+                call_command('check_query_plans', stdout=StringIO())
+        finally:
+            del HOT_QUERIES['unindexed']
+
+
+@skipUnless(connection.vendor == 'sqlite', 'SQLite connection profile')
+class SQLiteProfileTest(TestCase):
+    """Every connection is opened with the pragmas from settings"""
+
+    def test_pragmas_and_transaction_mode(self):
+        with connection.cursor() as cursor:
+            pragmas = {
+                name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                for name in ('journal_mode', 'synchronous', 'temp_store', 'busy_timeout')
+            }
+        # synchronous NORMAL is 1, temp_store MEMORY is 2; WAL only away
+        # from the committed demo database (SQLITE_PATH)
+        journal_mode = settings.SQLITE_PRAGMAS.get('journal_mode', 'delete').lower()
+        self.assertEqual(
+            pragmas, {'journal_mode': journal_mode, 'synchronous': 1, 'temp_store': 2, 'busy_timeout': 20000}
+        )
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class DatabaseObjectsTest(TestCase):
+    """The views are recreated in place, on whichever engine is configured"""
+
+    def test_recreate_views(self):
+        create_database_objects()
+        create_database_objects()
+        self.assertTrue(set(VIEWS) <= set(connection.introspection.table_names(include_views=True)))
+        out = StringIO()
+        call_command('init_db', stdout=out)
+        self.assertIn('Successfully initialized', out.getvalue())
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM inventory_management')
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+
+class FailingEmailBackend(LocmemBackend):
+    def send_messages(self, messages):
+        raise ConnectionError('SMTP server unavailable')
+
+
+class SlowEmailBackend(LocmemBackend):
+    """Takes so long that the batch's lease runs out and another worker claims it"""
+
+    def send_messages(self, messages):
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.reclaimed = MailService.claim()
+        return super().send_messages(messages)
+
+
+class MailOutboxTest(TestCase):
+    """Emails are queued by the request and sent by run_mail_worker"""
+
+    def test_registration_queues_the_otp_email(self):
+        self.client.post(reverse('bidbuygo:register_email'), {'email': 'new@example.com'})
+        self.assertEqual(len(mail.outbox), 0)
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual((queued.to, queued.status), ('new@example.com', 'Pending'))
+
+        call_command('run_mail_worker', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['new@example.com'])
+        self.assertIn('Your OTP is', mail.outbox[0].body)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.body), ('Sent', ''))
+
+    @override_settings(EMAIL_BACKEND='bidbuygo.tests.FailingEmailBackend')
+    def test_failed_sends_back_off_then_give_up(self):
+        email = MailService.enqueue('Hello', 'Body', ['a@example.com'])
+        before = timezone.now()
+        self.assertEqual(MailService.drain(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.attempts), ('Pending', 1))
+        self.assertGreaterEqual(email.next_attempt_at, before + RETRY_BASE)
+        self.assertIn('SMTP server unavailable', email.last_error)
+
+        # Not due yet, so nothing is retried
+        self.assertEqual(MailService.drain(), (0, 0))
+
+        OutgoingEmail.objects.filter(pk=email.pk).update(attempts=MAX_ATTEMPTS - 1, next_attempt_at=before)
+        MailService.drain()
+        email.refresh_from_db()
+        self.assertEqual((email.status, email.body), ('Failed', ''))
+
+    @override_settings(EMAIL_BACKEND='bidbuygo.tests.SlowEmailBackend')
+    def test_reclaimed_emails_are_left_to_the_new_worker(self):
+        email = MailService.enqueue('Hello', 'Body', ['a@example.com'])
+        connection = mail.get_connection()
+
+        self.assertEqual(MailService.send_batch(connection=connection), (1, 0))
+
+        # The late worker's result does not overwrite the new claim
+        email.refresh_from_db()
+        self.assertEqual([e.pk for e in connection.reclaimed], [email.pk])
+        self.assertEqual((email.status, email.claimed_by, email.body),
+                         ('Pending', connection.reclaimed[0].claimed_by, 'Body'))
+
+
+class OTPStoreTest(TestCase):
+    """Registration works on either OTP store and expired codes are purged"""
+
+    def register(self, email):
+        self.client.post(reverse('bidbuygo:register_email'), {'email': email})
+        code = re.search(r'Your OTP is: (\d{6})', OutgoingEmail.objects.latest('id').body).group(1)
+        response = self.client.post(reverse('bidbuygo:verify_email', args=[email]), {'otp': code})
+        self.assertRedirects(response, reverse('bidbuygo:set_password', args=[email]), fetch_redirect_response=False)
+        self.client.post(reverse('bidbuygo:set_password', args=[email]), {
+            'password': 'S3cret!pass', 'confirm_password': 'S3cret!pass'
+        })
+        self.assertTrue(User.objects.filter(email=email).exists())
+        self.assertFalse(get_store('registration').is_verified(email))
+
+    def test_registration_with_database_store(self):
+        self.register('db@example.com')
+        self.assertFalse(UnverifiedUser.objects.exists())
+
+    @override_settings(OTP_STORE={'BACKEND': 'bidbuygo.services.otp_store.CacheOTPStore'})
+    def test_registration_with_cache_store(self):
+        cache.clear()
+        self.register('cache@example.com')
+        self.assertFalse(UnverifiedUser.objects.exists())
+
+    def test_addresses_match_whatever_their_case(self):
+        for backend in ('DatabaseOTPStore', 'CacheOTPStore'):
+            with self.subTest(backend=backend), \
+                    self.settings(OTP_STORE={'BACKEND': f'bidbuygo.services.otp_store.{backend}'}):
+                cache.clear()
+                store = get_store('registration')
+                store.issue('Mixed.Case@Example.com', '123456', timezone.timedelta(minutes=5))
+                self.assertEqual(store.check(' mixed.case@example.COM', '123456'), 'verified')
+                self.assertTrue(store.is_verified('MIXED.CASE@example.com'))
+                store.discard('mixed.case@EXAMPLE.com')
+                self.assertFalse(store.is_verified('Mixed.Case@Example.com'))
+
+    def test_purge_removes_only_expired_codes(self):
+        store = get_store('email')
+        store.issue('live@example.com', '123456', timezone.timedelta(minutes=5))
+        store.issue('old@example.com', '654321', timezone.timedelta(minutes=5))
+        OTP.objects.filter(email='old@example.com').update(expires_at=timezone.now() - timezone.timedelta(days=1))
+        self.assertEqual(store.check('old@example.com', '654321'), 'expired')
+
+        call_command('purge_expired_otps', stdout=StringIO())
+        self.assertEqual(list(OTP.objects.values_list('email', flat=True)), ['live@example.com'])
+        self.assertEqual(store.check('live@example.com', '000000'), 'invalid')
+        self.assertEqual(store.check('live@example.com', '123456'), 'verified')
+
+
+class CheckEmailFilterTest(TestCase):
+    """check_email answers free addresses from the Bloom filter"""
+
+    def setUp(self):
+        User.objects.create_user(email='taken@example.com', password='x')
+        registered_emails.build()
+        self.addCleanup(registered_emails.clear)
+
+    def check(self, email):
+        return self.client.get(reverse('bidbuygo:check_email'), {'email': email}).json()['is_taken']
+
+    def test_free_address_needs_no_query(self):
+        self.check('warmup@example.com')
+        with CaptureQueriesContext(connection) as queries:
+            for i in range(50):
+                self.assertFalse(self.check(f'free{i}@example.com'))
+        # At most the periodic scan for users registered elsewhere
+        self.assertLessEqual(len([q for q in queries if '"USER"' in q['sql']]), 1)
+
+    def test_registered_addresses_are_confirmed(self):
+        self.assertTrue(self.check('taken@example.com'))
+        User.objects.create_user(email='new@example.com', password='x')
+        self.assertTrue(self.check('new@example.com'))
+
+    def test_sync_finds_users_committed_out_of_order(self):
+        joined = timezone.now()
+        # Registered by other processes: no signal reaches this one. The
+        # higher id is seen first; the lower one commits a moment later
+        User.objects.bulk_create([User(pk=1000, email='first@example.com', password='!', date_joined=joined)])
+        registered_emails.sync()
+        User.objects.bulk_create([
+            User(pk=999, email='late@example.com', password='!', date_joined=joined - timedelta(seconds=2))
+        ])
+        registered_emails.sync()
+
+        self.assertTrue(registered_emails.filter.might_contain('late@example.com'))
+        self.assertEqual(registered_emails.joined_at, joined)
+        # The overlap scans the same users again without counting them twice
+        count = registered_emails.filter.count
+        registered_emails.sync()
+        self.assertEqual(registered_emails.filter.count, count)
+
+
+class QueryBudgetTest(TestCase):
+    """Every URL stays within its query budget, however many rows it shows"""
+
+    ROWS = 5
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='budget@example.com', password='x')
+        others = [User.objects.create_user(email=f'other{i}@example.com', password='x') for i in range(self.ROWS)]
+        men = Category.objects.create(name='men')
+        women = Category.objects.create(name='women')
+        products = [
+            Product.objects.create(
+                product_name=f'Shirt {i}', product_type='regular', product_condition='new',
+                category=(men, women)[i % 2], price=Decimal('499.00'), quantity=10,
+            )
+            for i in range(self.ROWS)
+        ]
+        self.product = products[0]
+        for size in ('S', 'M', 'L'):
+            ProductSize.objects.create(product=self.product, size=size, stock=3)
+        for user in others:
+            ProductReview.objects.create(user=user, product=self.product, rating=4, review_text='Fits well')
+
+        self.auction = Product.objects.create(
+            product_name='Vintage Jacket', product_type='auction', product_condition='used',
+            price=Decimal('1000.00'), quantity=1, auction_status='Ended', last_bid_time=timezone.now(),
+        )
+        for i, user in enumerate([self.user] + others):
+            Bidding.objects.create(user=user, product=self.auction, bid_amt=Decimal(1100 + i))
+
+        cart = Cart.objects.create(user=self.user)
+        for product in products:
+            CartItem.objects.create(cart=cart, product=product, size='M')
+
+        self.address = Address.objects.create(
+            user=self.user, full_name='Budget User', phone_number='9999999999', address_line1='1 Main Road',
+            city='Pune', state='MH', postal_code='411001',
+        )
+        self.order = Order.objects.create(
+            user=self.user, amount=Decimal('2495.00'), full_name='Budget User', phone_number='9999999999',
+            address_line1='1 Main Road', city='Pune', state='MH', postal_code='411001',
+        )
+        for product in products:
+            OrderItem.objects.create(order=self.order, product=product, price=Decimal('499.00'), size='M')
+        # The order's delivery is created by a signal
+        delivery = self.order.delivery
+        for event in ('order_placed', 'order_packed', 'order_shipped'):
+            Tracking.objects.create(delivery=delivery, event=event)
+        registered_emails.build()
+        self.addCleanup(registered_emails.clear)
+        self.client.force_login(self.user)
+
+    def requests(self):
+        """(URL name, args, method, data) for every URL"""
+        product, order = self.product.product_id, self.order
+        return [
+            ('home', [], 'get', {}),
+            ('products', [], 'get', {}),
+            ('products', [], 'get', {'category': 'men'}),
+            ('product_detail', [product], 'get', {}),
+            ('product_reviews', [product], 'get', {}),
+            ('auctions', [], 'get', {}),
+            ('register_email', [], 'get', {}),
+            ('verify_email', ['new@example.com'], 'get', {}),
+            ('set_password', ['new@example.com'], 'get', {}),
+            ('user_login', [], 'get', {}),
+            ('check_email', [], 'get', {'email': 'other1@example.com'}),
+            ('user_profile', [], 'get', {}),
+            ('edit_address', [self.address.id], 'get', {}),
+            ('order_list', [], 'get', {}),
+            ('order_detail', [order.id], 'get', {}),
+            ('place_order', [product], 'get', {}),
+            ('complete_payment', [order.id], 'get', {}),
+            ('add_to_cart', [product], 'post', {'selected_size': 'S', 'quantity': 1}),
+            ('cart', [], 'get', {}),
+            ('update_cart', [product], 'post', {'size': 'M', 'quantity': 2}),
+            ('remove_from_cart', [product], 'post', {'size': 'M'}),
+            ('checkout', [], 'get', {}),
+            ('order_success', [order.order_id], 'get', {}),
+            ('place_bid', [self.auction.product_id], 'get', {}),
+            ('bid_success', [self.auction.product_id], 'get', {}),
+            ('auction_stream', [self.auction.product_id], 'get', {}),
+            ('get_auction_status', [self.auction.product_id], 'get', {}),
+            ('add_review', [self.products_without_review()], 'get', {}),
+            ('vote_review', [ProductReview.objects.filter(product=self.product).first().id], 'post', {}),
+            ('seller_dashboard', [], 'get', {}),
+            ('add_product', [], 'get', {}),
+            ('delivery_detail', [order.id], 'get', {}),
+            ('update_delivery_status', [order.delivery.id], 'post', {'status': 'shipped'}),
+            ('send_otp', [], 'post', {'email': 'new@example.com'}),
+            ('verify_otp', [], 'post', {'email': 'new@example.com', 'otp': '000000'}),
+            ('email_verification', [], 'get', {}),
+            ('delete_address', [self.address.id], 'get', {}),
+            ('user_logout', [], 'get', {}),
+        ]
+
+    def products_without_review(self):
+        return Product.objects.filter(product_type='regular').exclude(pk=self.product.pk).first().product_id
+
+    def test_every_url_has_a_budget(self):
+        names = {f'{app_name}:{pattern.name}' for pattern in urlpatterns}
+        self.assertEqual(names, set(QUERY_BUDGETS))
+
+    def test_every_url_stays_within_budget(self):
+        # A few legacy views fail (missing templates and models); the
+        # queries they run before failing still count
+        self.client.raise_request_exception = False
+        for name, args, method, data in self.requests():
+            view_name = f'bidbuygo:{name}'
+            url = reverse(view_name, args=args)
+            with self.subTest(url=url, method=method), assert_query_budget(view_name=view_name, method=method.upper()):
+                getattr(self.client, method)(url, data)
+
+    def test_form_submissions_stay_within_budget(self):
+        # Registration from an email address to a logged in account, then
+        # a login, each a POST
+        self.client.logout()
+        email = 'signup@example.com'
+
+        def post(name, args, data):
+            view_name = f'bidbuygo:{name}'
+            with self.subTest(view=name), assert_query_budget(view_name=view_name, method='POST'):
+                return self.client.post(reverse(view_name, args=args), data)
+
+        post('register_email', [], {'email': email})
+        otp = re.search(r'OTP is: (\d{6})', OutgoingEmail.objects.get(to=email).body).group(1)
+        post('verify_email', [email], {'otp': otp})
+        response = post('set_password', [email], {'password': 'Secret#123', 'confirm_password': 'Secret#123'})
+        self.assertRedirects(response, reverse('bidbuygo:home'), fetch_redirect_response=False)
+        self.client.logout()
+        response = post('user_login', [], {'username': email, 'password': 'Secret#123'})
+        self.assertRedirects(response, reverse('bidbuygo:home'), fetch_redirect_response=False)
+
+    def test_repeated_queries_name_the_template_line(self):
+        template = Template('{% for product in products %}{{ product.category.name }}{% endfor %}')
+        with self.assertRaisesRegex(QueryBudgetExceeded, r'runs of one query .*<unknown source>:1'):
+            with assert_query_budget():
+                template.render(Context({'products': Product.objects.all()}))
+
+
+class ProductSearchTest(TestCase):
+    """The full-text index ranks matches and follows product edits"""
+
+    def setUp(self):
+        self.category = Category.objects.create(name='men')
+        self.jacket = self.product('Leather Jacket', 'Warm and windproof')
+        self.coat = self.product('Wool Coat', 'Longer than a jacket')
+        self.scarf = self.product('Silk Scarf', 'Light')
+
+    def product(self, name, description):
+        return Product.objects.create(
+            product_name=name, description=description, category=self.category, product_type='regular',
+            product_condition='new', price=Decimal('10.00'), quantity=1,
+        )
+
+    def search(self, query):
+        return [product.product_name for product in SearchService.search(Product.objects.all(), query)]
+
+    def indexed(self):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT COUNT(*) FROM "PRODUCT_SEARCH"')
+            return cursor.fetchone()[0]
+
+    def test_name_matches_rank_above_description_matches(self):
+        self.assertEqual(self.search('jacket'), ['Leather Jacket', 'Wool Coat'])
+        # Every word must match, each as a prefix
+        self.assertEqual(self.search('leath jack'), ['Leather Jacket'])
+        self.assertEqual(sorted(self.search('men')), ['Leather Jacket', 'Silk Scarf', 'Wool Coat'])
+        # Nothing searchable, or search syntax typed in: words, not an error
+        self.assertEqual(self.search('!!!'), [])
+        self.assertEqual(self.search('jacket" NEAR( *'), [])
+
+    def test_signals_keep_the_index_in_sync(self):
+        self.assertEqual(self.indexed(), 3)
+
+        self.scarf.product_name = 'Silk Jacket'
+        self.scarf.save()
+        self.assertEqual(self.search('scarf'), [])
+        self.assertIn('Silk Jacket', self.search('jacket'))
+
+        # Category names are indexed with each product
+        self.category.name = 'unisex'
+        self.category.save()
+        self.assertEqual(len(self.search('unisex')), 3)
+
+        self.jacket.delete()
+        self.assertNotIn('Leather Jacket', self.search('jacket'))
+        self.assertEqual(self.indexed(), 2)
+
+
+class KeysetPaginationTest(TestCase):
+    """Cursors walk a listing in both directions without OFFSET"""
+
+    def setUp(self):
+        cache.clear()
+        now = timezone.now()
+        self.products = [
+            Product.objects.create(
+                product_name=f'Keyset {i % 4}', product_type='regular', product_condition='new',
+                price=Decimal('10.00'), quantity=1,
+                last_bid_time=None if i % 3 == 0 else now - timedelta(hours=i % 5),
+            )
+            for i in range(11)
+        ]
+
+    def walk(self, paginator):
+        """Every page going forwards from the first, then backwards from the last"""
+        page = paginator.get_page()
+        forwards = [list(page)]
+        while page.has_next():
+            page = paginator.get_page(page.next_token)
+            forwards.append(list(page))
+        backwards = [list(page)]
+        while page.has_previous():
+            page = paginator.get_page(page.previous_token)
+            backwards.append(list(page))
+        return forwards, backwards[::-1]
+
+    def assertWalks(self, ordering, expected, queryset=None):
+        forwards, backwards = self.walk(KeysetPaginator(queryset or Product.objects.all(), ordering, per_page=3))
+        self.assertEqual([product for page in forwards for product in page], expected)
+        self.assertEqual(backwards, forwards)
+        self.assertTrue(all(len(page) == 3 for page in forwards[:-1]))
+
+    def test_next_and_previous_round_trip(self):
+        for ordering in (['product_name'], ['-product_name']):
+            with self.subTest(ordering=ordering):
+                self.assertWalks(ordering, list(Product.objects.order_by(*ordering, 'product_id')))
+
+    def test_null_sort_keys(self):
+        def stamp(product):
+            return product.last_bid_time.timestamp() if product.last_bid_time else 0
+
+        # Ascending puts NULLs first, descending puts them last
+        self.assertWalks(['last_bid_time'], sorted(
+            self.products, key=lambda p: (p.last_bid_time is not None, stamp(p), p.pk)
+        ))
+        self.assertWalks(['-last_bid_time'], sorted(
+            self.products, key=lambda p: (p.last_bid_time is None, -stamp(p), p.pk)
+        ))
+
+    def test_bad_tokens_fall_back_to_the_first_page(self):
+        paginator = KeysetPaginator(Product.objects.all(), ['last_bid_time'], per_page=3)
+        first = list(paginator.get_page())
+        token = paginator.get_page().next_token
+        by_name = KeysetPaginator(Product.objects.all(), ['product_name'], per_page=3)
+
+        for bad in (
+            token[:-2] + ('AA' if token[-2:] != 'AA' else 'BB'),
+            'not-a-token',
+            signing.dumps(['x', [None, self.products[0].pk]], salt=TOKEN_SALT),
+            signing.dumps(['n', [None]], salt=TOKEN_SALT),
+            # Genuine, but from a listing sorted on text
+            by_name.get_page().next_token,
+        ):
+            with self.subTest(token=bad):
+                page = paginator.get_page(bad)
+                self.assertEqual(list(page), first)
+                self.assertFalse(page.has_previous())
+
+    def test_total_is_counted_once(self):
+        paginator = KeysetPaginator(Product.objects.all(), ['product_name'])
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.total(), 11)
+        Product.objects.filter(pk=self.products[0].pk).delete()
+        with self.assertNumQueries(0):
+            self.assertEqual(KeysetPaginator(Product.objects.all(), ['product_name']).total(), 11)
+        # Another listing has its own count
+        self.assertEqual(KeysetPaginator(Product.objects.filter(product_name='Keyset 1'), ['pk']).total(), 3)
+
+    def test_search_results_page_by_rank(self):
+        # More than the 12 a product_list page shows
+        for i in range(14):
+            Product.objects.create(
+                product_name=f'Lamp {i}', description='lamp ' * (i % 3), product_type='regular',
+                product_condition='new', price=Decimal('10.00'), quantity=1,
+            )
+        matches = SearchService.search(Product.objects.all(), 'lamp')
+        self.assertWalks(SearchService.ordering(), list(matches.order_by(*SearchService.ordering(), 'product_id')),
+                         queryset=matches)
+
+        response = self.client.get(reverse('bidbuygo:products'), {'query': 'lamp'})
+        self.assertContains(response, f'?cursor={response.context["products"].next_token}&query=lamp')
+
+
+class ReviewPaginationTest(TestCase):
+    """The product page costs the same queries at 10,000 reviews as at one"""
+
+    REVIEWS = 10000
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            product_name='Denim Jacket', product_type='regular', product_condition='new',
+            price=Decimal('1999.00'), quantity=10,
+        )
+        users = User.objects.bulk_create(
+            User(email=f'reviewer{i}@example.com', password='!') for i in range(self.REVIEWS)
+        )
+        ProductReview.objects.bulk_create(
+            ProductReview(user=user, product=self.product, rating=i % 5 + 1, review_text=f'Review {i}')
+            for i, user in enumerate(users)
+        )
+        # bulk_create skips the signals that maintain the product's aggregates
+        ReviewService.reconcile()
+
+    def test_detail_page_queries_do_not_grow(self):
+        url = reverse('bidbuygo:product_detail', args=[self.product.pk])
+        with assert_query_budget(view_name='bidbuygo:product_detail'):
+            response = self.client.get(url)
+
+        self.assertEqual(len(response.context['reviews']), 10)
+        summary = response.context['rating_summary']
+        self.assertEqual(summary['count'], self.REVIEWS)
+        self.assertEqual(summary['average'], 3.0)
+        self.assertEqual([bar['count'] for bar in summary['histogram']], [self.REVIEWS // 5] * 5)
+
+    def test_json_pages_continue_newest_first(self):
+        first = self.client.get(reverse('bidbuygo:product_detail', args=[self.product.pk])).context['reviews']
+        seen = [review.id for review in first]
+        cursor = first.next_token
+        url = reverse('bidbuygo:product_reviews', args=[self.product.pk])
+        for _ in range(3):
+            with assert_query_budget(view_name='bidbuygo:product_reviews'):
+                page = self.client.get(url, {'cursor': cursor}).json()
+            self.assertEqual(len(page['reviews']), 10)
+            seen += [review['id'] for review in page['reviews']]
+            cursor = page['next']
+
+        newest = ProductReview.objects.filter(product=self.product).order_by('-created_at', '-id')
+        self.assertEqual(seen, list(newest.values_list('id', flat=True)[:40]))
+
+
+def stored_ratings(product):
+    product.refresh_from_db()
+    return {field: getattr(product, field) for field in RATING_FIELDS}
+
+
+def counted_ratings(product):
+    return ReviewService.aggregates(dict(
+        ProductReview.objects.filter(product=product).order_by().values_list('rating').annotate(n=Count('id'))
+    ))
+
+
+class RatingAggregatesTest(TestCase):
+    """Stored rating aggregates follow every review change"""
+
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(
+                product_name=f'Sneakers {i}', product_type='regular', product_condition='new',
+                price=Decimal('2999.00'), quantity=5,
+            )
+            for i in range(3)
+        ]
+        self.users = [User.objects.create_user(email=f'rater{i}@example.com', password='x') for i in range(4)]
+
+    def test_reviews_update_aggregates(self):
+        product = self.products[0]
+        reviews = [
+            ProductReview.objects.create(user=user, product=product, rating=rating, review_text='ok')
+            for user, rating in zip(self.users, [5, 4, 4, 1])
+        ]
+        self.assertEqual(stored_ratings(product)['rating_average'], 3.5)
+
+        # An edit moves one review between stars, from the form's string value
+        reviews[3].rating = '3'
+        reviews[3].save()
+        reviews[0].delete()
+        self.assertEqual(stored_ratings(product), counted_ratings(product))
+        self.assertEqual(product.rating_count, 3)
+        self.assertEqual(product.rating_4_count, 2)
+        self.assertEqual(ReviewService.rating_summary(product)['average'], 3.7)
+
+    def test_reconcile_fixes_drift(self):
+        first, second, _ = self.products
+        ProductReview.objects.create(user=self.users[0], product=first, rating=5, review_text='ok')
+        # Neither of these sends signals
+        ProductReview.objects.bulk_create([
+            ProductReview(user=user, product=second, rating=2, review_text='meh') for user in self.users
+        ])
+        ProductReview.objects.filter(product=first).update(rating=1)
+
+        out = StringIO()
+        call_command('reconcile_ratings', '--batch-size', '2', stdout=out)
+        self.assertIn('Fixed the rating aggregates of 2 of 3 products', out.getvalue())
+        for product in self.products:
+            self.assertEqual(stored_ratings(product), counted_ratings(product))
+        self.assertEqual(ReviewService.reconcile(), (3, 0))
+
+    def test_product_list_sorts_by_rating(self):
+        for product, ratings in zip(self.products, [[3, 3], [5, 4], [5, 4, 5, 4]]):
+            for user, rating in zip(self.users, ratings):
+                ProductReview.objects.create(user=user, product=product, rating=rating, review_text='ok')
+        unrated = Product.objects.create(
+            product_name='Apron', product_type='regular', product_condition='new', price=Decimal('99.00'), quantity=1,
+        )
+
+        response = self.client.get(reverse('bidbuygo:products'), {'sort': 'rating'})
+        names = [product.product_name for product in response.context['products']]
+        # Ties on the average go to the product with more reviews
+        self.assertEqual(names, ['Sneakers 2', 'Sneakers 1', 'Sneakers 0', unrated.product_name])
+
+
+class ConcurrentReviewTest(TransactionTestCase):
+    """Reviews saved at the same moment are all counted"""
+
+    THREADS = 8
+    REVIEWS_PER_THREAD = 20
+
+    def test_concurrent_reviews_are_all_counted(self):
+        product = Product.objects.create(
+            product_name='Popular Tee', product_type='regular', product_condition='new',
+            price=Decimal('399.00'), quantity=100,
+        )
+        users = User.objects.bulk_create(
+            User(email=f'crowd{i}@example.com', password='!') for i in range(self.THREADS * self.REVIEWS_PER_THREAD)
+        )
+        start = threading.Barrier(self.THREADS)
+
+        def reviewer(batch):
+            start.wait()
+            try:
+                for i, user in enumerate(batch):
+                    ProductReview.objects.create(user=user, product=product, rating=i % 5 + 1, review_text='ok')
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=reviewer, args=(users[i::self.THREADS],)) for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(stored_ratings(product)['rating_count'], self.THREADS * self.REVIEWS_PER_THREAD)
+        self.assertEqual(stored_ratings(product), counted_ratings(product))
+
+
+class HelpfulVoteTest(TestCase):
+    """Each user's helpful vote counts once, written at once or in batches"""
+
+    def setUp(self):
+        self.product = Product.objects.create(
+            product_name='Linen Shirt', product_type='regular', product_condition='new',
+            price=Decimal('899.00'), quantity=10,
+        )
+        self.users = [User.objects.create_user(email=f'voter{i}@example.com', password='x') for i in range(4)]
+        self.reviews = [
+            ProductReview.objects.create(user=user, product=self.product, rating=4, review_text='Breathes well')
+            for user in self.users[:2]
+        ]
+
+    def vote(self, user, review):
+        self.client.force_login(user)
+        return self.client.post(reverse('bidbuygo:vote_review', args=[review.id]))
+
+    def test_each_user_votes_once(self):
+        review = self.reviews[0]
+        self.assertEqual(self.vote(self.users[1], review).json(), {'counted': True, 'helpful_votes': 1})
+        self.assertEqual(self.vote(self.users[1], review).json(), {'counted': False, 'helpful_votes': 1})
+        self.assertEqual(self.vote(self.users[0], review).status_code, 400)
+        review.refresh_from_db()
+        self.assertEqual(review.helpful_votes, 1)
+        self.assertEqual(ReviewVote.objects.count(), 1)
+
+    @override_settings(HELPFUL_VOTES={'WRITE_BEHIND': True, 'FLUSH_INTERVAL': 60, 'MAX_PENDING': 500})
+    def test_write_behind_batches_votes(self):
+        self.addCleanup(helpful_votes.flush)
+        first, second = self.reviews
+        for user in self.users[1:]:
+            ReviewService.vote_helpful(first, user)
+        ReviewService.vote_helpful(second, self.users[0])
+        first.refresh_from_db()
+        self.assertEqual(first.helpful_votes, 0)
+
+        # The reviews' counts, then their product's updated_at
+        with self.assertNumQueries(2):
+            self.assertEqual(helpful_votes.flush(), 2)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.helpful_votes, second.helpful_votes), (3, 1))
+
+    @override_settings(HELPFUL_VOTES={'WRITE_BEHIND': True, 'FLUSH_INTERVAL': 60, 'MAX_PENDING': 500})
+    def test_failed_flush_keeps_votes_and_rearms_the_timer(self):
+        self.addCleanup(helpful_votes.flush)
+        review = self.reviews[0]
+        ReviewService.vote_helpful(review, self.users[1])
+        # A vote whose review id cannot be written fails the whole flush
+        helpful_votes.add('not-a-review', self.product.pk)
+
+        with self.assertRaises((ValueError, ValidationError)):
+            helpful_votes.flush()
+        self.assertEqual(len(helpful_votes), 2)
+        self.assertIsNotNone(helpful_votes.timer)
+        review.refresh_from_db()
+        self.assertEqual(review.helpful_votes, 0)
+
+        with helpful_votes.lock:
+            del helpful_votes.pending['not-a-review']
+        self.assertEqual(helpful_votes.flush(), 1)
+        self.assertIsNone(helpful_votes.timer)
+        review.refresh_from_db()
+        self.assertEqual(review.helpful_votes, 1)
+
+    def test_most_helpful_first_and_reconcile(self):
+        first, second = self.reviews
+        ReviewService.vote_helpful(second, self.users[0])
+        url = reverse('bidbuygo:product_reviews', args=[self.product.pk])
+        ids = [review['id'] for review in self.client.get(url, {'order': 'helpful'}).json()['reviews']]
+        self.assertEqual(ids, [second.id, first.id])
+
+        # Votes written without their counts, as a crashed buffer leaves them
+        ReviewVote.objects.bulk_create(ReviewVote(review=first, user=user) for user in self.users[2:])
+        self.assertEqual(ReviewService.reconcile_helpful_votes(batch_size=1), (2, 1))
+        first.refresh_from_db()
+        self.assertEqual(first.helpful_votes, 2)
+
+
+class ConcurrentVoteTest(TransactionTestCase):
+    """Votes cast at the same moment are all counted, and duplicates none"""
+
+    THREADS = 8
+    VOTES_PER_THREAD = 10
+
+    def test_concurrent_votes(self):
+        author = User.objects.create_user(email='author@example.com', password='x')
+        product = Product.objects.create(
+            product_name='Canvas Tote', product_type='regular', product_condition='new',
+            price=Decimal('299.00'), quantity=10,
+        )
+        review = ProductReview.objects.create(user=author, product=product, rating=5, review_text='Roomy')
+        users = User.objects.bulk_create(
+            User(email=f'fan{i}@example.com', password='!') for i in range(self.THREADS * self.VOTES_PER_THREAD)
+        )
+        repeat_voter = users[0]
+        start = threading.Barrier(self.THREADS)
+
+        def voter(batch):
+            start.wait()
+            try:
+                # Every thread also tries the same user's vote
+                for user in batch + [repeat_voter]:
+                    ReviewService.vote_helpful(review, user)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=voter, args=(users[i::self.THREADS],)) for i in range(self.THREADS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        review.refresh_from_db()
+        self.assertEqual(review.helpful_votes, len(users))
+        self.assertEqual(ReviewVote.objects.filter(review=review).count(), len(users))
+
+
+# One process: its LocMemCache sees every invalidation
+@override_settings(PAGE_CACHE={'ENABLED': True})
+class PageCacheTest(TestCase):
+    """Anonymous catalog pages come from the cache until a save changes them"""
+
+    def setUp(self):
+        cache.clear()
+        self.products = [
+            Product.objects.create(
+                product_name=f'Kurta {i}', product_type='regular', product_condition='new',
+                price=Decimal('799.00'), quantity=5,
+            )
+            for i in range(2)
+        ]
+        self.user = User.objects.create_user(email='shopper@example.com', password='x')
+
+    def get(self, product):
+        return self.client.get(reverse('bidbuygo:product_detail', args=[product.pk]))
+
+    @override_settings(PAGE_CACHE={})
+    def test_only_on_by_default_with_a_shared_cache(self):
+        self.assertNotIn('X-Page-Cache', self.get(self.products[0]))
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': directory,
+            }}):
+                self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'MISS')
+                self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'HIT')
+
+    def test_anonymous_pages_are_cached(self):
+        self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            response = self.get(self.products[0])
+        self.assertEqual(response['X-Page-Cache'], 'HIT')
+        self.assertContains(response, 'Kurta 0')
+        self.assertEqual(page_cache.stats(['product_detail'])['product_detail'], {'hit': 1, 'stale': 0, 'miss': 1})
+
+        # Logged in visitors always get their own page
+        self.client.force_login(self.user)
+        self.assertNotIn('X-Page-Cache', self.get(self.products[0]))
+
+    def test_saves_invalidate_only_the_pages_they_change(self):
+        listing = reverse('bidbuygo:products')
+        for product in self.products:
+            self.get(product)
+        self.client.get(listing)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductReview.objects.create(user=self.user, product=self.products[0], rating=5, review_text='Lovely')
+        self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get(self.products[1])['X-Page-Cache'], 'HIT')
+        self.assertEqual(self.client.get(listing)['X-Page-Cache'], 'MISS')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductSize.objects.create(product=self.products[1], size='XL', stock=2)
+        self.assertContains(self.get(self.products[1]), 'XL')
+        self.assertEqual(self.client.get(listing)['X-Page-Cache'], 'HIT')
+
+    def test_auction_pages_are_short_lived(self):
+        auction = Product.objects.create(
+            product_name='Brass Lamp', product_type='auction', product_condition='used',
+            price=Decimal('300.00'), quantity=1, last_bid_time=timezone.now(),
+        )
+        response = self.get(auction)
+        self.assertContains(response, 'Auction Details')
+        url = reverse('bidbuygo:product_detail', args=[auction.pk])
+        page = page_cache.CachedPage('product_detail', RequestFactory().get(url), ('reviews', 'review_order'), [])
+        expires_in = cache.get(page.key)['expires'] - time.time()
+        self.assertLessEqual(expires_in, page_cache.config()['SHORT_TIMEOUT'])
+        # Regular products keep the full timeout
+        self.get(self.products[0])
+        url = reverse('bidbuygo:product_detail', args=[self.products[0].pk])
+        page = page_cache.CachedPage('product_detail', RequestFactory().get(url), ('reviews', 'review_order'), [])
+        self.assertGreater(cache.get(page.key)['expires'] - time.time(), page_cache.config()['SHORT_TIMEOUT'])
+
+    def test_one_render_at_a_time(self):
+        self.get(self.products[0])
+        page_cache.bump([f'product:{self.products[0].pk}'])
+        # Another request is re-rendering the page: this one gets the stale copy
+        url = reverse('bidbuygo:product_detail', args=[self.products[0].pk])
+        page = page_cache.CachedPage('product_detail', RequestFactory().get(url), ('reviews', 'review_order'), [])
+        cache.add(page.lock_key, 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'STALE')
+
+        cache.delete(page.lock_key)
+        self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.get(self.products[0])['X-Page-Cache'], 'HIT')
+
+
+# One process: its LocMemCache sees every invalidation
+@override_settings(PAGE_CACHE={'ENABLED': True})
+class ConditionalGetTest(TestCase):
+    """Unchanged pages are answered 304 Not Modified without rendering"""
+
+    def setUp(self):
+        cache.clear()
+        self.product = Product.objects.create(
+            product_name='Linen Shirt', product_type='regular', product_condition='new',
+            price=Decimal('899.00'), quantity=5,
+        )
+        self.auction = Product.objects.create(
+            product_name='Pocket Watch', product_type='auction', product_condition='used',
+            price=Decimal('2000.00'), quantity=1, last_bid_time=timezone.now(),
+        )
+        self.user = User.objects.create_user(email='reader@example.com', password='x')
+        self.url = reverse('bidbuygo:product_detail', args=[self.product.pk])
+
+    def revalidate(self, url, response):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_unchanged_product_page_is_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+        # Answered from the cached copy's validators, or from one lookup
+        with self.assertNumQueries(0):
+            self.assertEqual(self.revalidate(self.url, response).status_code, 304)
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.revalidate(self.url, response).status_code, 304)
+        modified_since = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(modified_since.status_code, 304)
+
+        # Reviews, sizes and helpful votes all move the product's updated_at
+        with self.captureOnCommitCallbacks(execute=True):
+            review = ProductReview.objects.create(user=self.user, product=self.product, rating=4, review_text='Soft')
+        changed = self.revalidate(self.url, response)
+        self.assertEqual(changed.status_code, 200)
+        self.assertContains(changed, 'Soft')
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductSize.objects.create(product=self.product, size='M', stock=2)
+        self.assertEqual(self.revalidate(self.url, changed).status_code, 200)
+        before = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            ReviewService.vote_helpful(review, User.objects.create_user(email='voter@example.com', password='x'))
+        self.assertEqual(self.revalidate(self.url, before).status_code, 200)
+
+    def test_listing_and_auction_status(self):
+        listing = reverse('bidbuygo:products')
+        self.assertEqual(self.revalidate(listing, self.client.get(listing)).status_code, 304)
+
+        status_url = reverse('bidbuygo:get_auction_status', args=[self.auction.pk])
+        response = self.client.get(status_url)
+        self.assertEqual(response.json()['total_bids'], 0)
+        self.assertEqual(self.revalidate(status_url, response).status_code, 304)
+        BiddingService.place_bid(self.user, self.auction, Decimal('2100.00'))
+        response = self.revalidate(status_url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['top_bids'], ['2100.00'])
+
+    def test_listing_changes_when_a_product_or_category_is_deleted(self):
+        listing = reverse('bidbuygo:products')
+        old, _ = Category.objects.create(name='Clocks'), Category.objects.create(name='Watches')
+        first = self.client.get(listing)
+        self.assertContains(first, 'Pocket Watch')
+
+        # The newest product goes, so the newest updated_at moves back
+        with self.captureOnCommitCallbacks(execute=True):
+            self.auction.delete()
+        changed = self.revalidate(listing, first)
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotContains(changed, 'Pocket Watch')
+
+        self.assertEqual(self.revalidate(listing, changed).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            old.delete()
+        self.assertEqual(self.revalidate(listing, changed).status_code, 200)
+
+    def test_validators_belong_to_the_copy_served(self):
+        self.client.force_login(self.user)
+        self.assertNotIn('ETag', self.client.get(self.url))
+        self.client.logout()
+
+        first = self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductSize.objects.create(product=self.product, size='L', stock=1)
+        # Another request is re-rendering the page: this one gets the old copy
+        page = page_cache.CachedPage('product_detail', RequestFactory().get(self.url), ('reviews', 'review_order'), [])
+        cache.add(page.lock_key, 1)
+        stale = self.client.get(self.url)
+        self.assertEqual((stale['X-Page-Cache'], stale['ETag']), ('STALE', first['ETag']))
+        self.assertEqual(self.revalidate(self.url, first).status_code, 304)
+
+        cache.delete(page.lock_key)
+        fresh = self.revalidate(self.url, first)
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], first['ETag'])
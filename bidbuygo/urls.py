@@ -8,6 +8,7 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('products/', views.product_list, name='products'),
     path('products/<str:product_id>/', views.product_detail, name='product_detail'),
+    path('products/<str:product_id>/reviews/', views.product_reviews, name='product_reviews'),
     path('auctions/', views.auction_list, name='auctions'),
     
     # User Authentication URLs
@@ -38,9 +39,12 @@ urlpatterns = [
     # Bidding URLs
     path('place_bid/<str:product_id>/', views.place_bid, name='place_bid'),
     path('bid_success/<str:product_id>/', views.bid_success, name='bid_success'),
+    path('auctions/<str:product_id>/events/', views.auction_stream, name='auction_stream'),
+    path('auctions/<str:product_id>/status/', views.get_auction_status, name='get_auction_status'),
     
     # Review URLs
     path('add_review/<str:product_id>/', views.add_review, name='add_review'),
+    path('reviews/<int:review_id>/helpful/', views.vote_review, name='vote_review'),
     
     # Seller URLs
     path('seller/dashboard/', views.seller_dashboard, name='seller_dashboard'),
@@ -4,14 +4,27 @@ from django.contrib.auth import login, authenticate, logout
 from django.contrib import messages
 from django.db.models import Q, Avg, Count, Sum
 from django.utils import timezone
-from django.core.paginator import Paginator
-from django.http import JsonResponse
+from .pagination import KeysetPaginator
+from django.http import JsonResponse, Http404, StreamingHttpResponse
 from .models import *
 from .forms import *
 import uuid
 from decimal import Decimal
 from django.contrib.auth.forms import AuthenticationForm
-from .services.bidding_service import BiddingService
+from .services.bidding_service import BiddingService, AUCTION_IDLE_TIMEOUT
+from .services.search_service import SearchService
+from .services.cart_service import CartService
+from .services.review_service import ReviewService
+from .services.checkout_service import CheckoutService
+from .services.mail_service import MailService
+from .services import otp_store
+from .services.email_registry import registered_emails
+from .services import auction_events
+from .services import page_cache
+from .services.page_cache import cache_anonymous_page
+from .conditional import conditional_page, make_etag
+from .services.payment_gateways import InvalidSignature, get_gateway
+import asyncio
 from django.core.exceptions import ValidationError
 from django.views.decorators.csrf import csrf_exempt
 import json
@@ -19,13 +32,14 @@ from django.conf import settings
 from django.urls import reverse
 from django.db import connection
 from .models import Order, OrderItem, ProductSize, Cart, CartItem, User
-import stripe
 from django.db import transaction
-from django.core.mail import send_mail
-from datetime import timedelta
+from datetime import datetime, timedelta
+import logging
 import random
-from .models import UnverifiedUser
 
+logger = logging.getLogger(__name__)
+
+@cache_anonymous_page()
 def home(request):
     """Home page view"""
     context = {
@@ -41,17 +55,45 @@ def home(request):
     }
     return render(request, 'bidbuygo/home.html', context)
 
+# Query parameters that filter or order product_list
+LISTING_FILTERS = ('query', 'category', 'product_type', 'sort')
+
+def listing_query(request):
+    """Current listing filters as a query string, without the page position"""
+    params = request.GET.copy()
+    for name in list(params):
+        if name not in LISTING_FILTERS:
+            del params[name]
+    return params.urlencode()
+
+def listing_validators(request):
+    """
+    ETag and Last-Modified of an anonymous visitor's listing: the latest
+    change to any product or category, from the newest row of each
+
+    A deletion leaves no updated_at behind (and can move the newest one
+    back), so the ETag also carries the generations of the scopes the
+    delete signals invalidate.
+    """
+    if not page_cache.is_anonymous(request):
+        return None
+    products = Product.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    categories = Category.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+    changes = [changed for changed in (products, categories) if changed]
+    if not changes:
+        return None
+    return make_etag(products, categories, *page_cache.generations('catalog', 'categories')), max(changes)
+
+@cache_anonymous_page(params=LISTING_FILTERS + ('cursor',), scopes=('catalog', 'categories'))
+@conditional_page(listing_validators)
 def product_list(request):
-    # Get all available products
-    products = Product.objects.filter(is_available=True)
+    # Get all available products, with the category each card shows
+    products = Product.objects.filter(is_available=True).select_related('category')
     
-    # Get search query
+    # Get search query (ranked through the full-text index)
     search_query = request.GET.get('query')
     if search_query:
-        products = products.filter(
-            Q(product_name__icontains=search_query) |
-            Q(description__icontains=search_query)
-        )
+        products = SearchService.search(products, search_query)
     
     # Get category filter
     category = request.GET.get('category')
@@ -63,16 +105,22 @@ def product_list(request):
     if product_type:
         products = products.filter(product_type=product_type)
     
-    # Order products alphabetically by product name
-    products = products.order_by('product_name')
+    # Best rated first (by the stored average, then the number of reviews),
+    # best match first or by name
+    sort = request.GET.get('sort')
+    if sort == 'rating':
+        ordering = ['-rating_average', '-rating_count', '-product_id']
+    elif search_query:
+        ordering = SearchService.ordering()
+    else:
+        ordering = ['product_name']
     
     # Get all categories for the filter dropdown
     categories = Category.objects.all()
     
-    # Pagination
-    paginator = Paginator(products, 12)  # Show 12 products per page
-    page = request.GET.get('page')
-    products = paginator.get_page(page)
+    # Pages by cursor on the sort key (search rank included) rather than
+    # OFFSET, so deep pages cost the same as the first
+    products = KeysetPaginator(products, ordering, per_page=12).get_page(request.GET.get('cursor'))
     
     context = {
         'products': products,
@@ -80,9 +128,12 @@ def product_list(request):
         'search_query': search_query,
         'selected_category': category,
         'selected_product_type': product_type,
+        'selected_sort': sort,
+        'page_query': listing_query(request),
     }
     return render(request, 'bidbuygo/product_list.html', context)
 
+@cache_anonymous_page(params=('cursor',), scopes=('auctions',))
 def auction_list(request):
     """View for listing all active auctions"""
     # Get all active auction products
@@ -102,18 +153,42 @@ def auction_list(request):
         last_bid_time__lte=timezone.now() + timezone.timedelta(hours=24)
     ).order_by('last_bid_time')
     
-    paginator = Paginator(other_auctions, 12)  # Show 12 auctions per page
-    page = request.GET.get('page')
-    other_auctions = paginator.get_page(page)
+    # Show 12 auctions per page, paged by cursor rather than OFFSET
+    other_auctions = KeysetPaginator(other_auctions, ['last_bid_time'], per_page=12).get_page(request.GET.get('cursor'))
     
-    return render(request, 'bidbuygo/auction_list.html', {
+    # Auctions close without any save the cache could see
+    return page_cache.short_lived(render(request, 'bidbuygo/auction_list.html', {
         'ends_soon': ends_soon,
         'other_auctions': other_auctions
-    })
+    }))
 
+def product_validators(request, product_id):
+    """
+    ETag and Last-Modified of an anonymous visitor's product page, from the
+    product's and its category's updated_at (and an auction's time
+    remaining), read by primary key
+    """
+    if not page_cache.is_anonymous(request):
+        return None
+    row = Product.objects.filter(product_id=product_id).values_list(
+        'updated_at', 'category__updated_at', 'product_type', 'last_bid_time'
+    ).first()
+    if row is None:
+        return None
+    updated_at, category_updated_at, product_type, last_bid_time = row
+    time_remaining = BiddingService.time_remaining(last_bid_time) if product_type.lower() == 'auction' else ''
+    last_modified = max(changed for changed in (updated_at, category_updated_at) if changed)
+    return make_etag(product_id, updated_at, category_updated_at, time_remaining), last_modified
+
+@cache_anonymous_page(params=('reviews', 'review_order'), scopes=('categories', 'product:{product_id}'))
+@conditional_page(product_validators)
 def product_detail(request, product_id):
     try:
-        product = Product.objects.get(product_id=product_id)
+        # Sizes are listed on the page; reviews come a page at a time, so
+        # the queries do not grow with the number of reviews
+        product = Product.objects.select_related('category').prefetch_related('sizes').get(product_id=product_id)
+        # product_type is stored lowercase; compared like product_validators
+        is_auction = product.product_type.lower() == 'auction'
         auction_info = {
             'current_bid': 0,
             'total_bids': 0,
@@ -121,29 +196,32 @@ def product_detail(request, product_id):
             'highest_bidder': None,
             'has_ended': False
         }
-        
-        if product.product_type == 'Auction':
+        user_highest_bid = None
+        if is_auction:
             try:
                 auction_info = BiddingService.get_auction_status(product)
             except Exception as e:
-                print(f"Error getting auction status: {e}")
-                auction_info['has_ended'] = False
+                logger.warning('Error getting auction status of %s: %s', product.pk, e)
+            if request.user.is_authenticated:
+                user_highest_bid = Bidding.objects.filter(user=request.user, product=product).order_by('-bid_amt').first()
+        bid_form = BidForm()
 
-        user_highest_bid = None
-        if request.user.is_authenticated and product.product_type == 'Auction':
-            user_highest_bid = BiddingService.get_user_highest_bid(request.user, product)
-            bid_form = BidForm(initial={'max_bid': user_highest_bid.amount if user_highest_bid else None})
-        else:
-            bid_form = BidForm()
+        # Newest or most helpful reviews first
+        review_order = 'helpful' if request.GET.get('review_order') == 'helpful' else 'recent'
 
         context = {
             'product': product,
             'auction_info': auction_info,
             'user_highest_bid': user_highest_bid,
             'bid_form': bid_form,
-            'is_auction': product.product_type == 'Auction'
+            'is_auction': is_auction,
+            'reviews': ReviewService.paginator(product.pk, order=review_order).get_page(request.GET.get('reviews')),
+            'review_order': review_order,
+            'rating_summary': ReviewService.rating_summary(product),
         }
-        return render(request, 'bidbuygo/product_detail.html', context)
+        response = render(request, 'bidbuygo/product_detail.html', context)
+        # The time remaining changes without a save
+        return page_cache.short_lived(response) if is_auction else response
     except Product.DoesNotExist:
         messages.error(request, 'Product not found')
         return redirect('bidbuygo:home')
@@ -151,6 +229,26 @@ def product_detail(request, product_id):
         messages.error(request, f'Error loading product: {str(e)}')
         return redirect('bidbuygo:home')
 
+def product_reviews(request, product_id):
+    """JSON page of a product's reviews, newest or most helpful (?order=helpful) first, for the "More reviews" button"""
+    page = ReviewService.paginator(product_id, order=request.GET.get('order')).get_page(request.GET.get('cursor'))
+    return JsonResponse({
+        'reviews': [ReviewService.as_json(review) for review in page],
+        **page.as_dict()
+    })
+
+@login_required
+def vote_review(request, review_id):
+    """Count the user's "helpful" vote on someone else's review, once (JSON)"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Invalid request method'}, status=405)
+    review = get_object_or_404(ProductReview.objects.only('id', 'user_id', 'product_id', 'helpful_votes'), id=review_id)
+    if review.user_id == request.user.id:
+        return JsonResponse({'error': 'You cannot vote for your own review'}, status=400)
+    counted = ReviewService.vote_helpful(review, request.user)
+    # With write-behind on, the stored count may not include this vote yet
+    return JsonResponse({'counted': counted, 'helpful_votes': review.helpful_votes + counted})
+
 @login_required
 def add_to_cart(request, product_id):
     try:
@@ -261,10 +359,9 @@ def remove_from_cart(request, product_id):
 def view_cart(request):
     try:
         cart, created = Cart.objects.get_or_create(user=request.user)
-        cart_items = CartItem.objects.filter(cart=cart).select_related('product')
         
-        # Calculate total price using the cart's total_price property
-        cart_total = cart.total_price
+        # Line totals and the grand total come from a single query
+        cart_items, cart_total = CartService.price_cart(cart)
         
         context = {
             'cart_items': cart_items,
@@ -278,45 +375,28 @@ def view_cart(request):
 def register_email(request):
     if request.method == 'POST':
         email = request.POST.get('email')
-        print(f"DEBUG: Registration attempt for email: {email}")  # Debug print
+        logger.debug('Registration attempt for %s', email)
         
         # Check if email already exists in verified users
         if User.objects.filter(email=email).exists():
-            print(f"DEBUG: Email {email} already registered")  # Debug print
+            logger.debug('%s is already registered', email)
             messages.error(request, 'This email is already registered. Please sign in instead or use a different email address.')
             return redirect('bidbuygo:register_email')
         
         # Generate 6-digit OTP
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
-        print(f"DEBUG: Generated OTP: {otp}")  # Debug print
         
-        # Delete any existing unverified user with this email
-        UnverifiedUser.objects.filter(email=email).delete()
+        # Replace any pending registration for this email
+        otp_store.get_store('registration').issue(email, otp, timedelta(minutes=10))
         
-        # Create new unverified user
-        unverified_user = UnverifiedUser.objects.create(
-            email=email,
-            otp=otp,
-            expires_at=timezone.now() + timedelta(minutes=10)
+        # Queue the OTP email; run_mail_worker sends it
+        MailService.enqueue(
+            'Your OTP for Email Verification',
+            f'Your OTP is: {otp}. It will expire in 10 minutes.',
+            [email],
+            from_email=settings.EMAIL_HOST_USER
         )
-        print(f"DEBUG: Created unverified user record")  # Debug print
-        
-        # Send OTP email
-        from django.conf import settings
-        print(f"DEBUG: Attempting to send email from {settings.EMAIL_HOST_USER} to {email}")  # Debug print
-        try:
-            send_mail(
-                'Your OTP for Email Verification',
-                f'Your OTP is: {otp}. It will expire in 10 minutes.',
-                settings.EMAIL_HOST_USER,
-                [email],
-                fail_silently=False,
-            )
-            print("DEBUG: Email sent successfully")  # Debug print
-        except Exception as e:
-            print(f"DEBUG: Error sending email: {str(e)}")  # Debug print
-            messages.error(request, 'Error sending OTP. Please try again.')
-            return redirect('bidbuygo:register_email')
+        logger.debug('Queued the registration OTP for %s', email)
         
         messages.success(request, 'OTP sent to your email')
         return redirect('bidbuygo:verify_email', email=email)
@@ -326,32 +406,28 @@ def register_email(request):
 def verify_email(request, email):
     if request.method == 'POST':
         otp = request.POST.get('otp')
-        try:
-            unverified_user = UnverifiedUser.objects.get(email=email)
-            
-            if unverified_user.is_expired():
-                messages.error(request, 'OTP has expired. Please request a new one.')
-                return redirect('bidbuygo:register_email')
-            
-            if unverified_user.otp != otp:
-                messages.error(request, 'Invalid OTP')
-                return redirect('bidbuygo:verify_email', email=email)
-            
-            # Mark as verified and redirect to password setup
-            unverified_user.is_verified = True
-            unverified_user.save()
-            return redirect('bidbuygo:set_password', email=email)
-            
-        except UnverifiedUser.DoesNotExist:
+        result = otp_store.get_store('registration').check(email, otp)
+        
+        if result == otp_store.EXPIRED:
+            messages.error(request, 'OTP has expired. Please request a new one.')
+            return redirect('bidbuygo:register_email')
+        
+        if result == otp_store.INVALID:
+            messages.error(request, 'Invalid OTP')
+            return redirect('bidbuygo:verify_email', email=email)
+        
+        if result == otp_store.MISSING:
             messages.error(request, 'Invalid email or OTP expired')
             return redirect('bidbuygo:register_email')
+        
+        # Verified: continue to password setup
+        return redirect('bidbuygo:set_password', email=email)
     
     return render(request, 'bidbuygo/verify_email.html', {'email': email})
 
 def set_password(request, email):
-    try:
-        unverified_user = UnverifiedUser.objects.get(email=email, is_verified=True)
-    except UnverifiedUser.DoesNotExist:
+    registrations = otp_store.get_store('registration')
+    if not registrations.is_verified(email):
         messages.error(request, 'Please verify your email first')
         return redirect('bidbuygo:register_email')
     
@@ -390,8 +466,8 @@ def set_password(request, email):
             password=password
         )
         
-        # Delete the unverified user
-        unverified_user.delete()
+        # The registration is complete
+        registrations.discard(email)
         
         # Automatically log in the user
         login(request, user)
@@ -439,22 +515,19 @@ def place_bid(request, product_id):
                 return redirect('bidbuygo:place_bid', product_id=product_id)
             
             try:
-                # Create new bid
-                bid = Bidding.objects.create(
-            user=request.user,
-            product=product,
-                    bid_amt=bid_amt,
-                    bid_time=timezone.now(),
-                    bid_status='pending'
+                # Only strictly higher bids can take the lead, even when
+                # several bidders submit at the same moment
+                BiddingService.place_bid(
+                    request.user, product, bid_amt,
+                    auto_bid_limit=form.cleaned_data['auto_bid_limit'],
+                    min_increment=Decimal('0.01')
                 )
                 
-                # Update product's current bid and last bid time
-                product.current_bid = bid_amt
-                product.last_bid_time = bid.bid_time
-                product.save()
-                
                 # Redirect to success page
                 return redirect('bidbuygo:bid_success', product_id=product_id)
+            except ValidationError as e:
+                messages.warning(request, e.messages[0])
+                return redirect('bidbuygo:place_bid', product_id=product_id)
             except Exception as e:
                 messages.error(request, f'Error placing bid: {str(e)}')
                 return redirect('bidbuygo:place_bid', product_id=product_id)
@@ -462,7 +535,7 @@ def place_bid(request, product_id):
         form = BidForm()
     
     # Get bid history sorted by bid amount
-    bid_history = Bidding.objects.filter(product=product).order_by('-bid_amt')
+    bid_history = Bidding.objects.filter(product=product).select_related('user').order_by('-bid_amt')
     
     context = {
         'product': product,
@@ -486,14 +559,86 @@ def bid_success(request, product_id):
     }
     return render(request, 'bidbuygo/bid_success.html', context)
 
+def auction_status_validators(request, product_id):
+    """
+    ETag and Last-Modified of an auction's status: every bid and the
+    auction's end move updated_at; the time remaining moves by itself
+    """
+    row = Product.objects.filter(product_id=product_id).values_list('updated_at', 'last_bid_time').first()
+    if row is None:
+        return None
+    updated_at, last_bid_time = row
+    return make_etag(product_id, updated_at, BiddingService.time_remaining(last_bid_time)), updated_at
+
+@conditional_page(auction_status_validators)
 def get_auction_status(request, product_id):
+    """Current state of an auction, polled by bidding pages (JSON)"""
     product = get_object_or_404(Product, product_id=product_id)
     try:
         status = BiddingService.get_auction_status(product)
+        # The same for every visitor: bids without their bidders
+        status.pop('highest_bidder', None)
+        status['top_bids'] = [bidder['bid_amt'] for bidder in status.pop('top_bidders', [])]
         return JsonResponse(status)
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=400)
 
+# Seconds between keep-alive comments on an idle auction stream
+AUCTION_STREAM_KEEPALIVE = 15
+
+async def auction_stream(request, product_id):
+    """
+    Server-Sent Events stream of bid, extended and ended events for an auction
+
+    Watchers are fed from the in-process broker, so the database is read
+    when a watcher connects and never per event. Serve through the ASGI
+    application (mysite/asgi.py); under WSGI every watcher holds a thread.
+    """
+    if not await Product.objects.filter(product_id=product_id, product_type='auction').aexists():
+        raise Http404('Auction not found')
+
+    broker = auction_events.get_broker()
+
+    async def events():
+        # Subscribed before the snapshot is read, so a bid committed in
+        # between is in the queue; those the snapshot already counts are
+        # skipped by their bid count
+        queue = broker.subscribe(product_id)
+        try:
+            product = await Product.objects.annotate(total_bids=Count('bidding')).aget(product_id=product_id)
+            ends_at = product.last_bid_time + AUCTION_IDLE_TIMEOUT if product.last_bid_time else None
+            snapshot = {
+                'event': 'snapshot',
+                'product_id': product.pk,
+                'current_bid': str(product.current_bid or product.price),
+                'total_bids': product.total_bids,
+                'auction_status': product.auction_status,
+                'ends_at': ends_at.isoformat() if ends_at else None,
+            }
+            yield auction_events.format_sse(snapshot)
+            if product.auction_status == 'Ended':
+                return
+            while True:
+                try:
+                    event = await asyncio.wait_for(queue.get(), AUCTION_STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                if event['event'] == 'bid' and event['total_bids'] <= product.total_bids:
+                    continue
+                if event['event'] == 'extended' and ends_at and datetime.fromisoformat(event['ends_at']) <= ends_at:
+                    continue
+                yield auction_events.format_sse(event)
+                if event['event'] == 'ended':
+                    return
+        finally:
+            broker.unsubscribe(product_id, queue)
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @login_required
 def add_review(request, product_id):
     product = get_object_or_404(Product, product_id=product_id)
@@ -511,7 +656,7 @@ def add_review(request, product_id):
     # Check if user has purchased this product
     has_purchased = Order.objects.filter(
         user=request.user,
-        product=product,
+        items__product=product,
         status='PAID'
     ).exists()
     
@@ -788,12 +933,9 @@ def create_payment(request, order_id):
         print(f"Order amount: {order.amount}")
         
         # Create a PaymentIntent with the order amount and currency
-        intent = stripe.PaymentIntent.create(
+        intent = get_gateway('stripe').create_payment_intent(
             amount=int(order.amount * 100),  # Convert to cents
             currency='inr',
-            automatic_payment_methods={
-                'enabled': True,
-            },
             metadata={
                 'order_id': order.id,
                 'user_id': request.user.id
@@ -816,12 +958,10 @@ def stripe_webhook(request):
     sig_header = request.META['HTTP_STRIPE_SIGNATURE']
     
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, settings.STRIPE_WEBHOOK_SECRET
-        )
+        event = get_gateway('stripe').construct_event(payload, sig_header)
     except ValueError as e:
         return JsonResponse({'error': str(e)}, status=400)
-    except stripe.error.SignatureVerificationError as e:
+    except InvalidSignature as e:
         return JsonResponse({'error': str(e)}, status=400)
     
     if event['type'] == 'payment_intent.succeeded':
@@ -857,13 +997,10 @@ def initiate_refund(request, transaction_id):
         transaction = get_object_or_404(Transaction, id=transaction_id)
         
         # Create refund
-        refund_data = {
-            'payment_id': transaction.payment_id,
-            'amount': int(transaction.amount * 100),  # Amount in paise
-            'speed': 'normal'
-        }
-        
-        refund = client.payment.refund(transaction.payment_id, refund_data)
+        refund = get_gateway('razorpay').refund(
+            transaction.payment_id,
+            int(transaction.amount * 100)  # Amount in paise
+        )
         
         # Update transaction status
         transaction.status = 'REFUNDED'
@@ -887,7 +1024,8 @@ def checkout(request):
         return redirect('bidbuygo:login')
     
     cart = Cart.objects.filter(user=request.user).first()
-    if not cart or not cart.items.exists():
+    cart_items, cart_total = CartService.price_cart(cart) if cart else ([], Decimal('0.00'))
+    if not cart_items:
         messages.warning(request, 'Your cart is empty.')
         return redirect('bidbuygo:cart')
     
@@ -895,85 +1033,21 @@ def checkout(request):
         form = OrderForm(request.POST)
         if form.is_valid():
             try:
-                # Get form data
-                full_name = form.cleaned_data['full_name']
-                phone_number = form.cleaned_data['phone_number']
-                address_line1 = form.cleaned_data['address_line1']
-                address_line2 = form.cleaned_data['address_line2']
-                city = form.cleaned_data['city']
-                state = form.cleaned_data['state']
-                postal_code = form.cleaned_data['postal_code']
-                country = form.cleaned_data['country']
-
-                # Calculate total amount
-                total_amount = cart.total_price
-                
-                # Start transaction
-                with transaction.atomic():
-                    # Create order
-                    order = Order.objects.create(
-                        order_id=str(uuid.uuid4())[:8],
-                        user=request.user,
-                        amount=total_amount,
-                        status='PENDING',
-                        payment_method='COD',
-                        full_name=full_name,
-                        phone_number=phone_number,
-                        address_line1=address_line1,
-                        address_line2=address_line2,
-                        city=city,
-                        state=state,
-                        postal_code=postal_code,
-                        country=country
-                    )
-                    
-                    # Create order items and update stock
-                    for cart_item in cart.items.all():
-                        # Create order item
-                        OrderItem.objects.create(
-                            order=order,
-                            product=cart_item.product,
-                            quantity=cart_item.quantity,
-                            price=cart_item.product.price,
-                            size=cart_item.size
-                        )
-                        
-                        # Check stock availability
-                        product_size = ProductSize.objects.select_for_update().get(
-                            product=cart_item.product, 
-                            size=cart_item.size
-                        )
-                        
-                        if product_size.stock < cart_item.quantity:
-                            raise ValidationError(
-                                f"Sorry, only {product_size.stock} items available for {cart_item.product.product_name} in size {cart_item.size}"
-                            )
-                        
-                        # Update stock
-                        product_size.stock -= cart_item.quantity
-                        product_size.save()
-                        
-                        if product_size.stock <= 0:
-                            cart_item.product.is_available = False
-                            cart_item.product.save()
-                    
-                    # Create transaction record for COD
-                    Transaction.objects.create(
-                        order=order,
-                        amount=total_amount,
-                        status='SUCCESS',
-                        payment_id=f'COD-{order.order_id}'
-                    )
-                    
-                    # Clear the cart
-                    cart.items.all().delete()
-                    cart.delete()
-                    
-                    messages.success(request, 'Order placed successfully!')
-                    return redirect('bidbuygo:order_success', order_id=order.order_id)
+                shipping = {
+                    field: form.cleaned_data[field]
+                    for field in ('full_name', 'phone_number', 'address_line1', 'address_line2',
+                                  'city', 'state', 'postal_code', 'country')
+                }
+
+                # Stock is locked, checked and decremented for the whole
+                # cart at once
+                order = CheckoutService.place_cod_order(request.user, cart, shipping)
+
+                messages.success(request, 'Order placed successfully!')
+                return redirect('bidbuygo:order_success', order_id=order.order_id)
                     
             except ValidationError as e:
-                messages.error(request, str(e))
+                messages.error(request, e.messages[0])
                 return redirect('bidbuygo:cart')
             except Exception as e:
                 messages.error(request, f'Error placing order: {str(e)}')
@@ -984,13 +1058,15 @@ def checkout(request):
     context = {
         'form': form,
         'cart': cart,
+        'cart_items': cart_items,
+        'cart_total': cart_total,
     }
     return render(request, 'bidbuygo/checkout.html', context)
 
 @login_required
 def order_success(request, order_id):
     try:
-        order = Order.objects.get(order_id=order_id, user=request.user)
+        order = Order.objects.prefetch_related('items__product').get(order_id=order_id, user=request.user)
         context = {
             'order': order,
             'page_title': 'Order Success'
@@ -1058,23 +1134,14 @@ def send_otp(request):
         # Generate 6-digit OTP
         otp = ''.join([str(random.randint(0, 9)) for _ in range(6)])
         
-        # Delete any existing OTPs for this email
-        OTP.objects.filter(email=email).delete()
+        # Replace any existing OTP for this email
+        otp_store.get_store('email').issue(email, otp, timedelta(minutes=5))
         
-        # Create new OTP
-        otp_obj = OTP.objects.create(
-            email=email,
-            otp=otp,
-            expires_at=timezone.now() + timedelta(minutes=5)
-        )
-        
-        # Send email
-        send_mail(
+        # Queue the email; run_mail_worker sends it
+        MailService.enqueue(
             'Your OTP for Email Verification',
             f'Your OTP is: {otp}. It will expire in 5 minutes.',
-            'your-email@example.com',  # Replace with your email
-            [email],
-            fail_silently=False,
+            [email]
         )
         
         return JsonResponse({'status': 'success', 'message': 'OTP sent successfully'})
@@ -1085,22 +1152,18 @@ def verify_otp(request):
         email = request.POST.get('email')
         otp = request.POST.get('otp')
         
-        try:
-            otp_obj = OTP.objects.get(email=email, otp=otp)
-            
-            if otp_obj.is_expired():
-                return JsonResponse({'status': 'error', 'message': 'OTP has expired'})
-            
-            if otp_obj.is_verified:
-                return JsonResponse({'status': 'error', 'message': 'OTP already verified'})
-            
-            otp_obj.is_verified = True
-            otp_obj.save()
-            
-            return JsonResponse({'status': 'success', 'message': 'Email verified successfully'})
-            
-        except OTP.DoesNotExist:
+        result = otp_store.get_store('email').check(email, otp)
+        
+        if result == otp_store.EXPIRED:
+            return JsonResponse({'status': 'error', 'message': 'OTP has expired'})
+        
+        if result == otp_store.ALREADY_VERIFIED:
+            return JsonResponse({'status': 'error', 'message': 'OTP already verified'})
+        
+        if result != otp_store.VERIFIED:
             return JsonResponse({'status': 'error', 'message': 'Invalid OTP'})
+        
+        return JsonResponse({'status': 'success', 'message': 'Email verified successfully'})
     
     return JsonResponse({'status': 'error', 'message': 'Invalid request method'})
 
@@ -1110,6 +1173,8 @@ def email_verification(request):
 def check_email(request):
     if request.method == 'GET':
         email = request.GET.get('email')
-        is_taken = User.objects.filter(email=email).exists()
+        # Most addresses typed are free, and the filter answers those
+        # without a query
+        is_taken = registered_emails.is_registered(email)
         return JsonResponse({'is_taken': is_taken})
     return JsonResponse({'error': 'Invalid request'}, status=400)
\ No newline at end of file
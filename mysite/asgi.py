@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Live auction streams (bidbuygo:auction_stream) are async views and should be
+served through this application, e.g. ``uvicorn mysite.asgi:application``,
+so that idle watchers do not each hold a worker thread.
 """
 
 import os
@@ -46,6 +46,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so session and authentication queries are counted too
+    'bidbuygo.query_budget.QueryBudgetMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,13 +82,92 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+# SQLite tuned for concurrent requests, run on every new connection. WAL
+# (below) lets readers work while one connection writes; synchronous=NORMAL
+# only syncs at checkpoints (a power cut can lose the last commits, a crashed
+# process cannot); the memory map, page cache and in-memory temp tables
+# keep hot pages off the disk.
+SQLITE_PRAGMAS = {
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Negative: in KiB rather than pages
+    'cache_size': -64 * 1024,
+    'temp_store': 'MEMORY',
 }
 
+# The database file; the default is the demo database committed with the
+# project. The journal mode, unlike the other pragmas, is stored in the file,
+# so WAL is only switched on for a database of its own (SQLITE_PATH): any
+# manage.py run would otherwise rewrite the committed file.
+DEMO_DATABASE = BASE_DIR / 'db.sqlite3'
+SQLITE_PATH = Path(os.getenv('SQLITE_PATH', DEMO_DATABASE))
+if SQLITE_PATH != DEMO_DATABASE:
+    SQLITE_PRAGMAS = {'journal_mode': 'WAL', **SQLITE_PRAGMAS}
+
+# SQLite by default. DB_ENGINE=postgresql uses the server given by the DB_*
+# variables (psycopg 3 with psycopg_pool, see requirements.txt).
+DB_ENGINE = os.getenv('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.getenv('DB_NAME', 'bidbuygo'),
+            'USER': os.getenv('DB_USER', 'bidbuygo'),
+            'PASSWORD': os.getenv('DB_PASSWORD', ''),
+            # A directory here means a Unix socket
+            'HOST': os.getenv('DB_HOST', 'localhost'),
+            'PORT': os.getenv('DB_PORT', '5432'),
+            'OPTIONS': {},
+            # .iterator() scans (the email filter, the auction scheduler)
+            # stream through server-side cursors; they do not survive a
+            # transaction-pooling PgBouncer, so turn them off behind one
+            'DISABLE_SERVER_SIDE_CURSORS': os.getenv('DB_DISABLE_SERVER_SIDE_CURSORS') == '1',
+            'TEST': {
+                'NAME': os.getenv('DB_TEST_NAME', 'test_bidbuygo'),
+            },
+        }
+    }
+    if int(os.getenv('DB_POOL_MAX_SIZE', '10')):
+        # Each worker process keeps min_size to max_size connections open
+        # and lends one to each request (Django needs CONN_MAX_AGE 0 here)
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '2')),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+            # Seconds a request waits for a free connection
+            'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+        }
+    else:
+        # DB_POOL_MAX_SIZE=0: persistent connections instead (behind PgBouncer)
+        DATABASES['default']['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', '600'))
+        DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': SQLITE_PATH,
+            # Seconds a worker keeps its connection (and its pragmas and page
+            # cache) between requests; 0 reconnects on every request
+            'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', '600')),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # busy_timeout: seconds a write waits for the lock before
+                # "database is locked"
+                'timeout': 20,
+                # Every transaction takes the write lock at BEGIN, so writers
+                # (bids, checkouts) queue on the busy timeout instead of failing
+                # when a read lock cannot be upgraded
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # File-backed so threaded tests see real SQLite locking instead of
+            # the shared-cache table locks of an in-memory database
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -146,6 +227,23 @@ STRIPE_PUBLISHABLE_KEY = os.getenv('STRIPE_PUBLISHABLE_KEY', 'your_publishable_k
 STRIPE_SECRET_KEY = os.getenv('STRIPE_SECRET_KEY', 'your_secret_key')
 STRIPE_WEBHOOK_SECRET = os.getenv('STRIPE_WEBHOOK_SECRET', 'your_webhook_secret')
 
+# Razorpay Settings
+RAZORPAY_KEY_ID = os.getenv('RAZORPAY_KEY_ID', 'your_key_id')
+RAZORPAY_KEY_SECRET = os.getenv('RAZORPAY_KEY_SECRET', 'your_key_secret')
+
+# Payment gateways (bidbuygo.services.payment_gateways). Each SDK is imported
+# the first time its gateway is used, not when a worker starts.
+PAYMENT_GATEWAYS = {
+    'stripe': {
+        'BACKEND': 'bidbuygo.services.payment_gateways.StripeGateway',
+        'OPTIONS': {'secret_key': STRIPE_SECRET_KEY, 'webhook_secret': STRIPE_WEBHOOK_SECRET},
+    },
+    'razorpay': {
+        'BACKEND': 'bidbuygo.services.payment_gateways.RazorpayGateway',
+        'OPTIONS': {'key_id': RAZORPAY_KEY_ID, 'key_secret': RAZORPAY_KEY_SECRET},
+    },
+}
+
 AUTH_USER_MODEL = 'bidbuygo.User'
 
 # Email Settings
@@ -156,3 +254,66 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')  # Your Gmail address
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # Your Gmail app password
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')  # Same as EMAIL_HOST_USER
+
+# Cache. Without CACHE_REDIS_URL each worker process has its own LocMemCache,
+# which only sees that worker's invalidations: the cart badge count is then
+# cached for seconds instead of an hour (see bidbuygo.caching). Redis needs
+# the redis package.
+if os.getenv('CACHE_REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('CACHE_REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# OTP storage (bidbuygo.services.otp_store). CacheOTPStore needs a cache
+# shared by every worker; the database store's expired rows are removed by
+# manage.py purge_expired_otps.
+OTP_STORE = {
+    'BACKEND': os.getenv('OTP_STORE_BACKEND', 'bidbuygo.services.otp_store.DatabaseOTPStore'),
+    'OPTIONS': {},
+}
+
+# Query budgets (bidbuygo.query_budget). The middleware logs requests that
+# run more queries than their view's budget or repeat one query shape
+# REPEAT_THRESHOLD times (an N+1); ENFORCE raises instead of logging.
+QUERY_BUDGET = {
+    'ENABLED': DEBUG,
+    'ENFORCE': False,
+    'REPEAT_THRESHOLD': 3,
+}
+
+# Review "helpful" votes (bidbuygo.services.vote_buffer). With WRITE_BEHIND
+# each process adds votes up in memory and writes them every FLUSH_INTERVAL
+# seconds (or once MAX_PENDING reviews are waiting) instead of one UPDATE
+# per vote.
+HELPFUL_VOTES = {
+    'WRITE_BEHIND': os.getenv('HELPFUL_VOTES_WRITE_BEHIND') == '1',
+    'FLUSH_INTERVAL': 2.0,
+    'MAX_PENDING': 500,
+}
+
+# Anonymous page cache (bidbuygo.services.page_cache). Invalidation only
+# reaches the cache it is written to, so the cache is only used when the
+# default cache is one every worker shares (CACHE_REDIS_URL), not
+# LocMemCache. PAGE_CACHE_ENABLED=1 turns it on regardless, e.g. for a
+# single worker process.
+PAGE_CACHE = {
+    'ENABLED': True if os.getenv('PAGE_CACHE_ENABLED') == '1' else None,
+    'TIMEOUT': 10 * 60,
+    'SHORT_TIMEOUT': 5,
+}
+
+# Live auction events (bidbuygo.services.auction_events). LocalBroker only
+# reaches watchers in the same process; use RedisBroker with several workers.
+AUCTION_EVENTS_BACKEND = os.getenv('AUCTION_EVENTS_BACKEND', 'bidbuygo.services.auction_events.LocalBroker')
+AUCTION_EVENTS_OPTIONS = {}
+if os.getenv('AUCTION_EVENTS_REDIS_URL'):
+    AUCTION_EVENTS_OPTIONS['url'] = os.getenv('AUCTION_EVENTS_REDIS_URL')